@@ -1,13 +1,25 @@
 from truthdiscovery.algorithm.average_log import AverageLog
+from truthdiscovery.algorithm.backends import (
+    BaseBackend,
+    DenseBackend,
+    MemoryMappedBackend,
+    SparseBackend,
+    ThreadedBackend
+)
 from truthdiscovery.algorithm.base import (
     BaseAlgorithm,
     BaseIterativeAlgorithm,
+    IterationInfo,
     PriorBelief
 )
+from truthdiscovery.algorithm.components import ComponentParallel
+from truthdiscovery.algorithm.eigen import SolverMode
 from truthdiscovery.algorithm.investment import Investment
+from truthdiscovery.algorithm.planner import CostModel, Planner
 from truthdiscovery.algorithm.pooled_investment import PooledInvestment
+from truthdiscovery.algorithm.run_context import RunContext
 from truthdiscovery.algorithm.sums import Sums
 from truthdiscovery.algorithm.unboundedsums import UnboundedSums
 from truthdiscovery.algorithm.truth_finder import TruthFinder
 from truthdiscovery.algorithm.voting import MajorityVoting
-from truthdiscovery.algorithm.crh import CRH
+from truthdiscovery.algorithm.crh import CRH, CRHLoss
@@ -1,6 +1,7 @@
 import numpy as np
 
 from truthdiscovery.algorithm.base import BaseIterativeAlgorithm
+from truthdiscovery.algorithm.eigen import SolverMode, use_eigensolver
 
 
 class AverageLog(BaseIterativeAlgorithm):
@@ -9,32 +10,94 @@ class AverageLog(BaseIterativeAlgorithm):
 
     Similar to Sums (and uses the same belief update step), but updates source
     trust as average claim belief weighted by log(number of claims).
+
+    As for :any:`Sums`, power iteration is used by default, and the eigensolver
+    must be requested with the ``solver`` parameter
     """
-    def _run(self, data):
+    max_normalised = True
+    solver = SolverMode.POWER
+
+    def __init__(self, *args, solver=None, **kwargs):
+        """
+        :param solver: value from :any:`SolverMode` enumeration to specify how
+                       the fixed point is found (optional). The default is
+                       power iteration
+        """
+        if solver is not None:
+            self.solver = solver
+        super().__init__(*args, **kwargs)
+
+    def update_belief(self, trust, backend, out=None):
+        """
+        Compute belief from trust in the same way as :any:`Sums`
+
+        :param trust:   numpy array of trust values
+        :param backend: :any:`BaseBackend` for the dataset
+        :param out:     numpy array to write the result to (optional)
+        :return:        numpy array of belief values
+        """
+        belief = backend.transpose(trust, out=out)
+        belief /= backend.max(belief)
+        return belief
+
+    def _run(self, data, context):
+        backend = self.get_backend(data, context)
         trust = np.zeros((data.num_sources,))
-        belief = self.get_prior_beliefs(data)
-        self.log(data, trust, belief)
+        belief = self.get_prior_beliefs(data, backend)
+        context.restore(trust, belief)
+        yield trust, belief
 
         # Pre-compute the number of claims made by each source and log
         # weighting, since this is used in each iteration and does not change.
         # Note that the number of claims made by s_i is the sum of the i-th row
         # of the claims matrix, so we multiply by [1 ... 1].T to get the counts
         # for all sources in one operation
-        claim_counts = data.sc @ np.ones((data.num_claims,))
+        claim_counts = backend.claims_per_source()
 
         weights = np.log(claim_counts) / claim_counts
 
-        while not self.iterator.finished():
+        if use_eigensolver(self.solver, context.iterator, data):
+            # Trust is an eigenvector of W sc sc^T, where W is the diagonal
+            # matrix of weights. This is not symmetric, but has the same
+            # eigenvalues as the symmetric W^(1/2) sc sc^T W^(1/2), whose
+            # eigenvectors u give those of the original as W^(1/2) u
+            root_w = np.sqrt(weights)
+            trust_scale = root_w
+            if data.source_weights is not None:
+                # With duplicate sources merged the operator is W sc sc^T V,
+                # where V is the diagonal matrix of source weights (which the
+                # backend applies in transpose products). The symmetric form
+                # is then (WV)^(1/2) sc sc^T (WV)^(1/2), and trust is
+                # (W/V)^(1/2) u
+                root_v = np.sqrt(data.source_weights)
+                trust_scale = root_w / root_v
+                root_w = root_w * root_v
+            trust, belief = self.run_eigensolver(
+                context, data, backend,
+                lambda t: backend.forward(
+                    backend.transpose(t, col_scale=trust_scale),
+                    row_scale=root_w
+                ),
+                backend.forward(belief, row_scale=root_w),
+                weights=trust_scale
+            )
+            yield trust, belief
+            # The eigensolver's tolerance is not measured in the same way as
+            # the iterator's, so finish with power iteration from the
+            # eigenvector until the iterator's criterion is met
+
+        new_trust = np.empty((data.num_sources,))
+        while not context.iterator.finished():
             # Entry-wise multiplication
-            new_trust = weights * (data.sc @  belief)
-            belief = data.sc.T @ new_trust
+            backend.forward(belief, row_scale=weights, out=new_trust)
+            self.update_belief(new_trust, backend, out=belief)
 
             # Normalise as with sums
-            new_trust = new_trust / max(new_trust)
-            belief = belief / max(belief)
+            new_trust /= backend.max(new_trust)
+            new_trust, belief = self.accelerate(context, new_trust, belief)
 
-            self.iterator.compare(new_trust, trust)
-            trust = new_trust
-            self.log(data, trust, belief)
+            context.compare(new_trust, trust)
+            trust, new_trust = new_trust, trust
+            yield trust, belief
 
         return trust, belief
@@ -0,0 +1,328 @@
+import functools
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from truthdiscovery.utils import spmv
+from truthdiscovery.utils.out_of_core import DiskCSRMatrix
+from truthdiscovery.utils.spmv import ParallelSparseMatrix, RowBlocks
+
+
+class BaseBackend:
+    """
+    Base class for execution backends, which perform the linear algebra used by
+    algorithms on a particular dataset. Algorithms only access the source-claim
+    matrix, mutual exclusion and implication through a backend, so that the
+    storage and execution strategy can be changed without modifying
+    algorithms.
+
+    Sub-classes must implement :meth:`_forward` and :meth:`_transpose`, and
+    may override other methods where a more efficient implementation is
+    available.
+
+    Methods which produce a vector accept an optional ``out`` array to write
+    the result to, so that algorithms can re-use buffers between iterations
+    instead of allocating new arrays (see :meth:`workspace`).
+    """
+    #: Input/output statistics recorded by the backend (if any), as a list of
+    #: :any:`IOStats` tuples
+    io_stats = None
+
+    def __init__(self, data):
+        """
+        :param data: :any:`Dataset` object
+        """
+        self.data = data
+        self.num_sources = data.num_sources
+        self.num_claims = data.num_claims
+        self.source_weights = data.source_weights
+        self._workspace = {}
+
+    @classmethod
+    def configure(cls, **kwargs):
+        """
+        :return: a callable which creates a backend of this class for a
+                 dataset with the given keyword arguments, for use as the
+                 ``backend`` parameter of an algorithm
+        """
+        return functools.partial(cls, **kwargs)
+
+    def workspace(self, name, size):
+        """
+        Return a buffer for temporary values. The buffer for each name is
+        allocated on first use and returned again by later calls, so its
+        contents are arbitrary
+
+        :param name: name identifying the buffer
+        :param size: the number of entries
+        :return:     numpy array of floats
+        """
+        buf = self._workspace.get(name)
+        if buf is None or buf.shape != (size,):
+            buf = np.empty((size,))
+            self._workspace[name] = buf
+        return buf
+
+    def _forward(self, vec, out=None):
+        """
+        :return: the product of the source-claim matrix with a claim vector,
+                 written to ``out`` if given
+        """
+        raise NotImplementedError("Must be implemented in child classes")
+
+    def _transpose(self, vec, out=None):
+        """
+        :return: the product of the transpose of the source-claim matrix with a
+                 source vector, written to ``out`` if given
+        """
+        raise NotImplementedError("Must be implemented in child classes")
+
+    def forward(self, vec, row_scale=None, col_scale=None, out=None):
+        """
+        Compute ``diag(row_scale) @ sc @ diag(col_scale) @ vec``, i.e. the
+        product of the source-claim matrix, with rows and columns optionally
+        scaled, and a vector of claim values
+
+        :param vec:       numpy array of claim values
+        :param row_scale: numpy array of source values to scale rows by
+                          (optional)
+        :param col_scale: numpy array of claim values to scale columns by
+                          (optional)
+        :param out:       numpy array to write the result to (optional). This
+                          must not be the same array as ``vec``
+        :return:          numpy array of source values
+        """
+        if col_scale is not None:
+            vec = np.multiply(col_scale, vec,
+                              out=self.workspace("claim_scale", len(vec)))
+        out = self._forward(vec, out)
+        if row_scale is not None:
+            out = np.multiply(row_scale, out, out=out)
+        return out
+
+    def transpose(self, vec, row_scale=None, col_scale=None, out=None):
+        """
+        As :meth:`forward` for the transpose of the source-claim matrix, which
+        maps source values to claim values. ``row_scale`` scales rows of the
+        transpose (i.e. claims) and ``col_scale`` scales columns (i.e.
+        sources).
+
+        For datasets with merged duplicate sources (see
+        :meth:`Dataset.compress_sources`), columns are also scaled by the
+        source weights, so that the value for each source is counted once for
+        each of the sources it stands for
+        """
+        if self.source_weights is not None:
+            if col_scale is None:
+                col_scale = self.source_weights
+            else:
+                col_scale = np.multiply(
+                    col_scale, self.source_weights,
+                    out=self.workspace("weighted_source_scale", len(vec))
+                )
+        if col_scale is not None:
+            # Separate from the buffer used by forward, since the lengths
+            # differ and each would otherwise reallocate the other
+            vec = np.multiply(col_scale, vec,
+                              out=self.workspace("source_scale", len(vec)))
+        out = self._transpose(vec, out)
+        if row_scale is not None:
+            out = np.multiply(row_scale, out, out=out)
+        return out
+
+    def claims_per_source(self):
+        """
+        :return: numpy array of the number of claims made by each source
+        """
+        return self.forward(np.ones((self.num_claims,)))
+
+    def sources_per_claim(self):
+        """
+        :return: numpy array of the number of sources making each claim
+        """
+        return self.transpose(np.ones((self.num_sources,)))
+
+    def variable_sums(self, vec, out=None):
+        """
+        :return: for each claim, the sum of ``vec`` over claims for the same
+                 variable (see :meth:`Dataset.variable_sums`), written to
+                 ``out`` if given
+        """
+        return self.data.variable_sums(vec, out=out)
+
+    def implication(self, vec, out=None):
+        """
+        :return: the product of the transpose of the implication matrix with a
+                 vector of claim values, i.e. for each claim the sum of values
+                 for other claims weighted by their implication for it. This is
+                 written to ``out`` if given
+        """
+        if out is None:
+            return self.data.imp.T @ vec
+        return spmv.matvec(self.data.imp.T, vec, out)
+
+    def max(self, vec):
+        """
+        :return: the largest entry in a source or claim vector
+        """
+        return np.max(vec)
+
+    def sum(self, vec):
+        """
+        :return: the sum of the entries in a source or claim vector
+        """
+        return np.sum(vec)
+
+    def end_iteration(self, iteration):
+        """
+        Called by algorithms at the end of each iteration
+
+        :param iteration: the number of iterations completed
+        """
+
+    def close(self):
+        """
+        Release any resources held by the backend
+        """
+        self._workspace = {}
+
+
+class SparseBackend(BaseBackend):
+    """
+    Backend using scipy sparse matrices, or any objects which support products
+    with numpy arrays via the ``@`` operator (e.g. :any:`ParallelSparseMatrix`
+    or the operators of an execution engine)
+    """
+    def __init__(self, data, sc=None, sc_t=None, engine=None):
+        """
+        :param data:   :any:`Dataset` object
+        :param sc:     object to use for products with the source-claim
+                       matrix (optional)
+        :param sc_t:   object to use for products with its transpose
+                       (optional)
+        :param engine: execution engine to close when the backend is closed
+                       (optional)
+        """
+        super().__init__(data)
+        self.sc = data.sc if sc is None else sc
+        self.sc_t = data.sc.T if sc_t is None else sc_t
+        self.engine = engine
+
+    @property
+    def io_stats(self):
+        return getattr(self.engine, "io_stats", None)
+
+    def _forward(self, vec, out=None):
+        if out is None:
+            return self.sc @ vec
+        return spmv.matvec(self.sc, vec, out)
+
+    def _transpose(self, vec, out=None):
+        if out is None:
+            return self.sc_t @ vec
+        return spmv.matvec(self.sc_t, vec, out)
+
+    def end_iteration(self, iteration):
+        if hasattr(self.engine, "end_iteration"):
+            self.engine.end_iteration(iteration)
+
+    def close(self):
+        super().close()
+        if self.engine is not None:
+            self.engine.close()
+            self.engine = None
+
+
+class DenseBackend(BaseBackend):
+    """
+    Backend storing the source-claim matrix as a dense numpy array. This uses
+    more memory than :any:`SparseBackend`, but products are faster for small or
+    dense datasets.
+
+    For datasets stored as dense arrays (see :any:`Dataset`), the dataset's
+    arrays are used directly, and per-variable sums and implication products
+    are also dense
+    """
+    def __init__(self, data):
+        super().__init__(data)
+        if data.sc_dense is not None:
+            self.sc = data.sc_dense
+        else:
+            self.sc = data.sc.toarray()
+        # Keep a contiguous copy of the transpose so that both products
+        # traverse memory in order
+        self.sc_t = np.ascontiguousarray(self.sc.T)
+        self.mut_ex = data.mut_ex_dense
+        self.imp = data.imp_dense
+
+    def _forward(self, vec, out=None):
+        return np.matmul(self.sc, vec, out=out)
+
+    def _transpose(self, vec, out=None):
+        return np.matmul(self.sc_t, vec, out=out)
+
+    def variable_sums(self, vec, out=None):
+        if self.mut_ex is None:
+            return super().variable_sums(vec, out=out)
+        return np.matmul(self.mut_ex, vec, out=out)
+
+    def implication(self, vec, out=None):
+        if self.imp is None:
+            return super().implication(vec, out=out)
+        return np.matmul(self.imp.T, vec, out=out)
+
+
+class ThreadedBackend(SparseBackend):
+    """
+    Backend evaluating sparse products on a thread pool (see
+    :any:`ParallelSparseMatrix`). Unlike the ``threads`` parameter of
+    algorithms, products are always split between threads, regardless of the
+    size of the dataset
+    """
+    threads = os.cpu_count() or 1
+
+    def __init__(self, data, threads=None):
+        """
+        :param data:    :any:`Dataset` object
+        :param threads: the number of threads to use (optional). The default is
+                        the number of CPUs
+        """
+        sc = ParallelSparseMatrix(data.sc, threads or self.threads)
+        super().__init__(data, sc, sc.T)
+
+
+class MemoryMappedBackend(SparseBackend):
+    """
+    Backend storing the CSR arrays of the source-claim matrix and its transpose
+    in files which are memory-mapped, so that the operating system pages them
+    into memory as needed, and may evict them under memory pressure. The files
+    are written block by block (see :meth:`DiskCSRMatrix.write`), so neither
+    matrix is copied in memory
+    """
+    def __init__(self, data, directory=None):
+        """
+        :param data:      :any:`Dataset` object
+        :param directory: directory to write files to (optional). If not given,
+                          a temporary directory is used and removed when the
+                          backend is closed
+        """
+        self._temp_dir = None
+        if directory is None:
+            self._temp_dir = tempfile.mkdtemp(prefix="truthdiscovery-")
+            directory = self._temp_dir
+        sc, sc_t = (
+            DiskCSRMatrix.write(mat, os.path.join(directory, name))
+            .memory_map()
+            for name, mat in zip(("sc", "sc_t"), RowBlocks.from_dataset(data))
+        )
+        super().__init__(data, sc, sc_t)
+
+    def close(self):
+        super().close()
+        self.sc = None
+        self.sc_t = None
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
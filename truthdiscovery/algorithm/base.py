@@ -1,12 +1,40 @@
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+import functools
 import inspect
 import time
 
 import numpy as np
 
-from truthdiscovery.exceptions import EmptyDatasetError
-from truthdiscovery.output import Result
-from truthdiscovery.utils.iterator import FixedIterator
+from truthdiscovery.algorithm.backends import BaseBackend, SparseBackend
+from truthdiscovery.algorithm.eigen import leading_eigenvector
+from truthdiscovery.algorithm.run_context import RunContext
+from truthdiscovery.exceptions import (
+    ConvergenceError,
+    EmptyDatasetError,
+    RunCancelledError
+)
+from truthdiscovery.output import History, Result, TrustModel
+from truthdiscovery.utils.cancellation import CancellationToken
+from truthdiscovery.utils.checkpoint import Checkpoint
+from truthdiscovery.utils.iterator import (
+    ConvergenceIterator,
+    FixedIterator,
+    StopReason
+)
+from truthdiscovery.utils import spmv
+
+
+#: Information about the latest iteration of a run, passed to hooks (see
+#: :meth:`BaseIterativeAlgorithm.add_hook`). ``distance`` is the convergence
+#: distance for iterators that measure one (and None otherwise), and
+#: ``trust`` and ``belief`` are read-only views of the current vectors if the
+#: hook requested them (and None otherwise)
+IterationInfo = namedtuple("IterationInfo", [
+    "iteration", "time_taken", "distance", "trust", "belief"
+])
 
 
 class PriorBelief(Enum):
@@ -26,6 +54,10 @@ class BaseAlgorithm:
     """
     Base class for truth discovery algorithms
     """
+    #: Callable which takes a :any:`Dataset` and returns a
+    #: :any:`BaseBackend`, or None to use :any:`SparseBackend`
+    backend = None
+
     def run(self, data):
         """
         Run the algorithm on the given data
@@ -39,6 +71,13 @@ class BaseAlgorithm:
             raise EmptyDatasetError("Cannot run algorithm on empty dataset")
         # Real work must be performed in child classes
 
+    def get_backend(self, data):
+        """
+        :param data: :any:`Dataset` object
+        :return:     a :any:`BaseBackend` to perform computations on ``data``
+        """
+        return (self.backend or SparseBackend)(data)
+
     @classmethod
     def get_parameter_names(cls):
         """
@@ -59,22 +98,217 @@ class BaseAlgorithm:
 class BaseIterativeAlgorithm(BaseAlgorithm):
     """
     Base class for functionality common to algorithms that iteratively compute
-    trust and belief
+    trust and belief.
+
+    Algorithm objects hold configuration only: the state of each run is kept
+    in a :any:`RunContext`, so an algorithm object may be shared between
+    threads and used for concurrent runs. Hooks should not be added or
+    removed while runs are in progress.
     """
     iterator = None
     priors = PriorBelief.FIXED
-    results_log = None
+    accelerator = None
+    threads = None
+    processes = 1
+    workers = None
+    out_of_core = None
+    compress_duplicates = False
+    #: True if results are unchanged when sources making identical claims are
+    #: merged (see ``compress_duplicates``)
+    supports_compression = True
+    #: True if an ``accelerator`` may be used (see :meth:`accelerate`)
+    supports_acceleration = True
+    #: :any:`RunContext` of the most recently started run in this process, or
+    #: None
+    last_context = None
+    #: True if trust and belief are normalised at each iteration so that the
+    #: largest entries are 1
+    max_normalised = False
+    #: True if the results are rankings of the scores, so that sources or
+    #: claims whose scores should be equal must be computed exactly the same
+    uses_ranking = False
+    #: Smallest factor by which extrapolation may shrink a positive trust or
+    #: belief value (see :meth:`accelerate`)
+    accel_min_ratio = 0.1
+    #: Phases of a run for which the time taken is recorded (see
+    #: :any:`Result`)
+    PHASES = ("setup", "iterations", "convergence", "materialise", "total")
 
-    def __init__(self, iterator=None, priors=None):
+    def __init__(self, iterator=None, priors=None, accelerator=None,
+                 threads=None, processes=None, workers=None,
+                 out_of_core=None, backend=None, compress_duplicates=None):
         """
-        :param iterator: :any:`Iterator` object to control when iteration stops
-                         (optional)
-        :param priors:   value from :any:`PriorBelief` enumeration to specify
-                         which prior belief values are used (optional)
+        :param iterator:    :any:`Iterator` object to control when iteration
+                            stops (optional)
+        :param priors:      value from :any:`PriorBelief` enumeration to
+                            specify which prior belief values are used
+                            (optional)
+        :param accelerator: :any:`Accelerator` object to extrapolate trust and
+                            belief between iterations (optional)
+        :param threads:     number of threads to use for sparse matrix-vector
+                            products (optional)
+        :param processes:   number of worker processes to use for sparse
+                            matrix-vector products, with matrices and vectors
+                            in shared memory (optional)
+        :param workers:     list of ``(host, port)`` addresses of workers (see
+                            :any:`run_worker`) to distribute sparse
+                            matrix-vector products over (optional). The
+                            secret shared with the workers is read from the
+                            environment (see :any:`get_secret`)
+        :param out_of_core: if True, or the path to a directory, sparse
+                            matrices are written to disk and streamed in
+                            chunks for each product (optional)
+        :param backend:     callable which takes a :any:`Dataset` and returns
+                            a :any:`BaseBackend` object, e.g. a backend class
+                            (optional). This takes precedence over
+                            ``threads``, ``processes``, ``workers`` and
+                            ``out_of_core``. If none of these are given, a
+                            :any:`Planner` chooses a backend for each dataset
+        :param compress_duplicates: if True, sources which make exactly the
+                            same claims are merged before running (see
+                            :meth:`Dataset.compress_sources`), and trust is
+                            copied back to each source afterwards (optional)
+        :raises ValueError: if ``compress_duplicates`` is True and the
+                            algorithm does not support compression, or if
+                            ``accelerator`` is given and the algorithm does
+                            not support acceleration
         """
         self.iterator = iterator or self.get_default_iterator()
         if priors is not None:
             self.priors = priors
+        if accelerator is not None:
+            if not self.supports_acceleration:
+                raise ValueError(
+                    "{} does not support acceleration"
+                    .format(type(self).__name__)
+                )
+            self.accelerator = accelerator
+        if threads is not None:
+            self.threads = int(threads)
+        if processes is not None:
+            self.processes = int(processes)
+        if workers is not None:
+            self.workers = workers
+        if out_of_core is not None:
+            self.out_of_core = out_of_core
+        if backend is not None:
+            self.backend = backend
+        if compress_duplicates is not None:
+            if compress_duplicates and not self.supports_compression:
+                raise ValueError(
+                    "{} does not support compression of duplicate sources"
+                    .format(type(self).__name__)
+                )
+            self.compress_duplicates = compress_duplicates
+        self.hooks = []
+
+    def _get_last(self, name):
+        if self.last_context is None:
+            return None
+        return getattr(self.last_context, name)
+
+    @property
+    def io_stats(self):
+        """
+        Input/output statistics for each iteration of the most recent run, if
+        recorded by the backend (e.g. with ``out_of_core`` set), as a list of
+        :any:`IOStats` tuples
+        """
+        return self._get_last("io_stats")
+
+    @property
+    def run_metadata(self):
+        """
+        Information about how the most recent run was executed, as included in
+        the ``metadata`` of its :any:`Result`
+        """
+        return self._get_last("metadata")
+
+    @property
+    def results_log(self):
+        """
+        List of the partial :any:`Result` objects produced by the most recent
+        run, if it was started with ``run_iter(data, keep_log=True)``, or None
+        otherwise (including for :meth:`run_iter` without ``keep_log``, so that
+        streaming does not hold on to every state).
+
+        This is kept for compatibility: the states are recorded in a
+        :any:`History` and only converted to results when this is accessed, so
+        pass a :any:`History` to :meth:`run` instead to control what is
+        recorded
+        """
+        history = self._get_last("results_history")
+        if history is None:
+            return None
+        return list(history.results())
+
+    @property
+    def run_timings(self):
+        """
+        Seconds spent in each phase of the most recent run, as included in the
+        ``timings`` of its :any:`Result`
+        """
+        return self._get_last("timings")
+
+    @property
+    def stop_reason(self):
+        """
+        Value from the :any:`StopReason` enumeration for the most recent run
+        """
+        return self._get_last("stop_reason")
+
+    def add_hook(self, hook, arrays=False):
+        """
+        Register a function to be called with an :any:`IterationInfo` tuple
+        for the initial state and after each iteration of every run. If the
+        function returns True, the run is stopped and the current state is
+        used as its result.
+
+        :param hook:   the function to call
+        :param arrays: if True, include read-only views of the trust and
+                       belief vectors in the information passed to the
+                       function. These must be copied if they are to be
+                       kept
+        """
+        self.hooks.append((hook, arrays))
+
+    def remove_hook(self, hook):
+        """
+        Remove a function registered with :meth:`add_hook`
+
+        :raises ValueError: if the function is not registered
+        """
+        for i, (registered, _) in enumerate(self.hooks):
+            if registered is hook:
+                del self.hooks[i]
+                return
+        raise ValueError("Hook is not registered")
+
+    def call_hooks(self, context, trust, belief):
+        """
+        Call the registered hooks with information about the current state
+
+        :param context: :any:`RunContext` for the run
+        :return: True if any hook requested that the run stops
+        """
+        info = IterationInfo(
+            iteration=context.iterator.it_count,
+            time_taken=time.time() - context.start_time,
+            distance=getattr(context.iterator, "current_distance", None),
+            trust=None,
+            belief=None
+        )
+        views = None
+        stop = False
+        for hook, arrays in self.hooks:
+            if arrays and views is None:
+                views = info._replace(trust=trust.view(),
+                                      belief=belief.view())
+                views.trust.flags.writeable = False
+                views.belief.flags.writeable = False
+            if hook(views if arrays else info):
+                stop = True
+        return stop
 
     def get_default_iterator(self):
         """
@@ -85,80 +319,746 @@ class BaseIterativeAlgorithm(BaseAlgorithm):
         """
         return FixedIterator(20)
 
-    def get_prior_beliefs(self, data):
+    # Note: execution engines are imported when needed, since they require
+    # Python 3.8
+    def get_backend(self, data, context=None):
+        """
+        Create the backend for a run. If ``self.backend`` is set it is used to
+        create the backend. Otherwise a :any:`SparseBackend` is used, with
+        products evaluated as follows. If ``self.workers`` is set, products are
+        evaluated by a :any:`DistributedEngine`. If ``self.out_of_core`` is
+        set, they are evaluated by an :any:`OutOfCoreEngine`, using a temporary
+        directory if ``self.out_of_core`` is True, and otherwise reusing any
+        matrices left in the directory by a run on the same dataset. If
+        ``self.processes`` is greater than 1 and the dataset is large enough,
+        they are evaluated by a :any:`SharedMemoryEngine`. Otherwise products
+        use ``self.threads`` threads if set, and if not a :any:`Planner`
+        chooses the backend. Dense products are not considered if the
+        algorithm or its iterator uses rankings of the scores.
+
+        If ``context`` is given, the backend is stored in it and closed when
+        the run finishes, and a description of the backend (and the plan, if a
+        planner was used) is stored in its ``metadata``.
+
+        :param data:    :any:`Dataset` object
+        :param context: :any:`RunContext` for the run (optional)
+        :return:        a :any:`BaseBackend` object
+        """
+        if context is not None:
+            context.close_backend()
+            context.check_cancelled()
+        engine = None
+        if self.backend is not None:
+            backend = self.backend(data)
+        elif self.workers:
+            from truthdiscovery.utils.distributed import DistributedEngine
+            engine = DistributedEngine(spmv.RowBlocks.from_dataset(data),
+                                       self.workers)
+        elif self.out_of_core:
+            from truthdiscovery.utils.out_of_core import OutOfCoreEngine
+            directory = key = None
+            if self.out_of_core is not True:
+                # Matrices left in the directory by an earlier run on the
+                # same dataset are reused
+                directory = self.out_of_core
+                key = data.fingerprint()
+            engine = OutOfCoreEngine(spmv.RowBlocks.from_dataset(data),
+                                     directory, key=key)
+        elif (self.processes > 1
+              and data.sc.nnz >= spmv.PARALLEL_NNZ_THRESHOLD):
+            from truthdiscovery.utils.shared import SharedMemoryEngine
+            engine = SharedMemoryEngine((data.sc, data.sc.T), self.processes)
+
+        if engine is not None:
+            backend = SparseBackend(data, *engine.operators, engine=engine)
+        elif self.backend is None and (self.threads or self.processes > 1):
+            sc = spmv.parallel_operator(data.sc, self.threads)
+            backend = SparseBackend(data, sc, sc.T)
+        elif self.backend is None:
+            from truthdiscovery.algorithm.planner import Planner
+            iterator = self.iterator if context is None else context.iterator
+            strategies = None
+            if self.uses_ranking or iterator.uses_ranking:
+                # BLAS may round the products for identical rows of a dense
+                # matrix differently, which splits tied scores and changes
+                # their ranking from one iteration to the next
+                strategies = [name for name in Planner.STRATEGIES
+                              if name != "dense"]
+            backend = Planner(strategies=strategies)(data)
+        if context is not None:
+            context.backend = backend
+            context.metadata = {"backend": type(backend).__name__}
+            plan = getattr(backend, "plan", None)
+            if plan is not None:
+                context.metadata["plan"] = plan.to_dict()
+            # Creating the backend may take a long time for large datasets
+            context.check_cancelled()
+        return backend
+
+    def get_prior_beliefs(self, data, backend=None):
         """
         :param data:        input data as a :any:`Dataset` object
+        :param backend:     :any:`BaseBackend` object to use (optional)
         :return:            a numpy array of prior belief values for claims, in
                             claim ID order
         :raises ValueError: if ``self.prior`` is not an item from the
                             :any:`PriorBelief` enumeration
         """
+        backend = backend or SparseBackend(data)
         if self.priors == PriorBelief.FIXED:
             return np.full((data.num_claims,), 0.5)
 
         if self.priors == PriorBelief.VOTED:
-            source_counts = data.sc.T @ np.ones((data.num_sources,))
-            return source_counts / (data.mut_ex @ source_counts)
+            source_counts = backend.sources_per_claim()
+            return source_counts / backend.variable_sums(source_counts)
 
         if self.priors == PriorBelief.COUNT:
-            source_counts = data.sc.T @ np.ones((data.num_sources,))
-            return source_counts
+            return backend.sources_per_claim()
 
         if self.priors == PriorBelief.UNIFORM:
-            return 1 / (data.mut_ex @ np.ones((data.num_claims,)))
+            return 1 / backend.variable_sums(np.ones((data.num_claims,)))
 
         raise ValueError(
             "Invalid prior belief type: '{}'".format(self.priors)
         )
 
-    def run(self, data):
+    def run(self, data, history=None, cancel=None, checkpointer=None):
+        """
+        Run the algorithm on the given data
+
+        :param data:         input data as a :any:`Dataset` object
+        :param history:      :any:`History` object to record trust and belief
+                             at each iteration in (optional)
+        :param cancel:       :any:`CancellationToken` to stop the run
+                             (optional)
+        :param checkpointer: :any:`Checkpointer` to periodically save the
+                             state of the run with (optional)
+        :return: the results as a :any:`Result` tuple
+
+        :raises EmptyDatasetError: if the dataset contains no claims
+        :raises RunCancelledError: if the run is cancelled with ``cancel``
+        """
+        context = self.create_context(cancel)
+        return self._run_context(data, context, history, checkpointer)
+
+    def resume(self, checkpoint, data, history=None, cancel=None,
+               checkpointer=None):
+        """
+        Continue a run from a checkpoint, as if it had not been interrupted.
+        The algorithm must have the same parameters, iterator and accelerator
+        as the one which created the checkpoint.
+
+        :param checkpoint:   :any:`Checkpoint` object, or the path to a
+                             checkpoint file
+        :param data:         the :any:`Dataset` the checkpoint was created
+                             from
+        :param history:      :any:`History` object to record trust and belief
+                             at each remaining iteration in (optional)
+        :param cancel:       :any:`CancellationToken` to stop the run
+                             (optional)
+        :param checkpointer: :any:`Checkpointer` to save further checkpoints
+                             with (optional)
+        :return: the results as a :any:`Result` tuple. The number of
+                 iterations includes those before the checkpoint, but the
+                 times only cover the resumed run
+
+        :raises ValueError: if the checkpoint does not match the algorithm or
+                            dataset
+        """
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint.load(checkpoint)
+        self.validate_checkpoint(checkpoint, data)
+        context = self.create_context(cancel)
+        context.iterator.set_state(checkpoint.iterator_state)
+        if context.accelerator is not None:
+            context.accelerator.set_state(checkpoint.accelerator_state)
+            context.accel_input = checkpoint.accel_input
+            if checkpoint.accel_state:
+                context.set_accel_state(checkpoint.accel_state)
+        context.resume_state = (checkpoint.trust, checkpoint.belief)
+        return self._run_context(data, context, history, checkpointer)
+
+    def get_result_params(self):
+        """
+        :return: a dict of the parameters that affect the results of a run, as
+                 stored in checkpoints and trust models. Parameters which only
+                 affect how products are computed (e.g. ``threads``) are not
+                 included, and the iterator and accelerator are stored
+                 separately. ``compress_duplicates`` is also excluded, since
+                 compression does not change the trust of any source
+        """
+        excluded = {"iterator", "accelerator", "threads", "processes",
+                    "workers", "out_of_core", "backend",
+                    "compress_duplicates"}
+        params = {}
+        for name in sorted(self.get_parameter_names() - excluded):
+            value = getattr(self, name, None)
+            if isinstance(value, Enum):
+                value = value.value
+            params[name] = value
+        return params
+
+    def create_checkpoint(self, context, data, trust, belief):
+        """
+        :return: a :any:`Checkpoint` for the current state of a run
+        """
+        accelerator = context.accelerator
+        # Trust in a checkpoint is stored per group of duplicate sources when
+        # compression is enabled, so unlike in trust models the setting must
+        # match when resuming
+        params = self.get_result_params()
+        params["compress_duplicates"] = self.compress_duplicates
+        return Checkpoint(
+            algorithm=type(self).__name__,
+            params=params,
+            fingerprint=data.fingerprint(),
+            trust=trust,
+            belief=belief,
+            iterator_state=context.iterator.get_state(),
+            accelerator=(None if accelerator is None
+                         else type(accelerator).__name__),
+            accelerator_state=(None if accelerator is None
+                               else accelerator.get_state()),
+            accel_input=context.accel_input,
+            accel_state=(None if accelerator is None
+                         else context.get_accel_state())
+        )
+
+    def validate_checkpoint(self, checkpoint, data):
+        """
+        Check that a run on the given data can be resumed from a checkpoint
+
+        :raises ValueError: if the checkpoint was created by a different
+                            algorithm, with different parameters or
+                            accelerator, or from a different dataset
+        """
+        params = dict(checkpoint.params)
+        if (params.pop("compress_duplicates", False)
+                != self.compress_duplicates):
+            raise ValueError("Duplicate source compression differs from "
+                             "checkpoint")
+        self._check_params("Checkpoint", checkpoint.algorithm, params)
+        accelerator = None
+        if self.accelerator is not None:
+            accelerator = type(self.accelerator).__name__
+        if checkpoint.accelerator != accelerator:
+            raise ValueError("Accelerator differs from checkpoint")
+        if checkpoint.fingerprint != data.fingerprint():
+            raise ValueError("Checkpoint was created from a different dataset")
+
+    def _check_params(self, name, algorithm, params):
+        """
+        Check that the name of an algorithm class and its parameters, as
+        stored in a checkpoint or trust model, match this algorithm
+
+        :param name: description of where the parameters are stored, for
+                     error messages
+        :raises ValueError: if the algorithm or parameters differ
+        """
+        if algorithm != type(self).__name__:
+            raise ValueError(
+                "{} was created by {}, not {}".format(
+                    name, algorithm, type(self).__name__
+                )
+            )
+        own_params = self.get_result_params()
+        if params != own_params:
+            changed = sorted(
+                param for param in set(params) | set(own_params)
+                if params.get(param) != own_params.get(param)
+            )
+            raise ValueError(
+                "Parameters differ from {}: {}".format(
+                    name.lower(), ", ".join(changed)
+                )
+            )
+
+    def get_trust_model(self, result):
+        """
+        :param result: :any:`Result` from a run of this algorithm
+        :return:       a :any:`TrustModel` holding the trust scores from
+                       ``result`` and the parameters of this algorithm
+        """
+        return TrustModel(type(self).__name__, self.get_result_params(),
+                          dict(result.trust))
+
+    def infer(self, model, data, unknown_trust=None):
+        """
+        Score the claims in new data using source trust learned in a previous
+        run, by applying a single belief update step of the algorithm (see
+        :meth:`update_belief`) instead of iterating
+
+        :param model:         :any:`TrustModel` from :meth:`get_trust_model`,
+                              or the path to a saved trust model
+        :param data:          input data as a :any:`Dataset` object
+        :param unknown_trust: trust value for sources which do not appear in
+                              the model (optional; see
+                              :meth:`TrustModel.get_trust_vector`)
+        :return: the results as a :any:`Result` object, with the trust used
+                 for each source in ``data`` and the resulting belief
+
+        :raises ValueError: if the model was created by a different algorithm
+                            or with different parameters
+        :raises EmptyDatasetError: if the dataset contains no claims
+        :raises NotImplementedError: if the algorithm does not support
+                                     inference
+        """
+        start_time = time.time()
         super().run(data)
-        self.iterator.reset()
-        self.start_time = time.time()
-        self.results_log = None
-        trust, belief = self._run(data)
-        end_time = time.time()
+        if not isinstance(model, TrustModel):
+            model = TrustModel.load(model)
+        self._check_params("Trust model", model.algorithm, model.params)
+        trust = model.get_trust_vector(data, unknown_trust)
+        # Batches of new claims are usually small, so the planner is not
+        # consulted
+        backend = (self.backend or SparseBackend)(data)
+        try:
+            belief = self.update_belief(trust, backend)
+        finally:
+            backend.close()
         return Result(
             trust=data.get_source_trust_dict(trust),
             belief=data.get_belief_dict(belief),
-            time_taken=end_time - self.start_time,
-            iterations=self.iterator.it_count
+            time_taken=time.time() - start_time
         )
 
-    def run_iter(self, data):
+    def update_belief(self, trust, backend, out=None):
+        """
+        Compute belief in claims from source trust, as in an iteration of the
+        algorithm
+
+        :param trust:   numpy array of trust values
+        :param backend: :any:`BaseBackend` for the dataset
+        :param out:     numpy array to write the result to (optional)
+        :return:        numpy array of belief values
+        """
+        raise NotImplementedError(
+            "Inference is not supported by {}".format(type(self).__name__)
+        )
+
+    def _run_context(self, data, context, history=None, checkpointer=None):
+        """
+        Perform a run with the given :any:`RunContext`, and return the
+        results as a :any:`Result` object
+        """
+        steps = self.iterate(data, history=history, context=context,
+                             checkpointer=checkpointer)
+        while True:
+            try:
+                next(steps)
+            except StopIteration as stop:
+                trust, belief = stop.value
+                break
+        end_time = time.time()
+
+        start = time.perf_counter()
+        trust_dict = data.get_source_trust_dict(trust)
+        belief_dict = data.get_belief_dict(belief)
+        end = time.perf_counter()
+        context.timings["materialise"] = end - start
+        context.timings["total"] = end - context.perf_start
+        return Result(
+            trust=trust_dict,
+            belief=belief_dict,
+            time_taken=end_time - context.start_time,
+            iterations=context.iterator.it_count,
+            metadata=context.metadata,
+            timings=context.timings,
+            stop_reason=context.stop_reason
+        )
+
+    def run_iter(self, data, cancel=None, keep_log=False):
         """
         Return a generator of partial :any:`Result` objects as the algorithm
-        iterates
+        iterates. Each result is produced as soon as its iteration is computed,
+        so the run can be stopped early by closing the generator (or breaking
+        out of a loop over it), or with a :any:`CancellationToken` ``cancel``.
+
+        :param keep_log: if True, also record each state so that the results
+                         are available from :attr:`results_log` afterwards.
+                         Memory then grows with the number of iterations
+        """
+        context = self.create_context(cancel)
+        if keep_log:
+            context.results_history = History()
+        steps = self.iterate(data, history=context.results_history,
+                             context=context)
+        for trust, belief in steps:
+            yield Result(
+                trust=data.get_source_trust_dict(trust),
+                belief=data.get_belief_dict(belief),
+                time_taken=time.time() - context.start_time,
+                iterations=context.iterator.it_count,
+                metadata=context.metadata,
+                timings=dict(context.timings,
+                             total=time.perf_counter() - context.perf_start)
+            )
+
+    async def run_async(self, data, executor=None, history=None):
+        """
+        Run the algorithm in an executor without blocking the event loop, for
+        use with asyncio. Cancelling the task awaiting the result cancels the
+        run: with a thread executor the run stops at the next cancellation
+        check (see :any:`CancellationToken`) and its buffers are released
+        before the task finishes.
+
+        With a :any:`ProcessPoolExecutor`, the run takes place on a copy of
+        the algorithm in a worker process, so :attr:`last_context` is not set
+        on this object, and a run which has already started cannot be
+        cancelled.
+
+        :param data:     input data as a :any:`Dataset` object
+        :param executor: :any:`concurrent.futures.Executor` to run the
+                         algorithm in (default: the event loop's default
+                         executor)
+        :param history:  :any:`History` object to record trust and belief at
+                         each iteration in (optional; not supported with
+                         process executors)
+        :return: the results as a :any:`Result` tuple
+        """
+        loop = asyncio.get_running_loop()
+        if isinstance(executor, ProcessPoolExecutor):
+            # Cancellation tokens cannot be shared between processes
+            return await loop.run_in_executor(
+                executor, functools.partial(self.run, data, history=history)
+            )
+        token = CancellationToken()
+        return await self._run_in_executor(
+            loop, executor, token,
+            functools.partial(self.run, data, history=history, cancel=token)
+        )
+
+    async def run_iter_async(self, data, executor=None):
+        """
+        Asynchronous version of :meth:`run_iter`, for use with ``async for``.
+        Each iteration is computed in ``executor``, which must be a thread
+        executor (default: the event loop's default executor), and control
+        returns to the event loop between iterations. The run is cancelled if
+        the task iterating over the results is cancelled, or if the loop is
+        exited early
+        """
+        loop = asyncio.get_running_loop()
+        token = CancellationToken()
+        results = self.run_iter(data, cancel=token)
+        try:
+            while True:
+                res = await self._run_in_executor(loop, executor, token,
+                                                  next, results, None)
+                if res is None:
+                    break
+                yield res
+        finally:
+            results.close()
+
+    @classmethod
+    async def _run_in_executor(cls, loop, executor, token, func, *args):
+        """
+        Call a function in an executor and return its result. If the awaiting
+        task is cancelled, ``token`` is cancelled and the call is allowed to
+        finish (so that the run's resources are released) before the
+        cancellation is propagated
+        """
+        future = loop.run_in_executor(executor, func, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            token.cancel()
+            try:
+                await future
+            except RunCancelledError:
+                pass
+            raise
+
+    def create_context(self, cancel=None):
+        """
+        Create the :any:`RunContext` for a new run, and record it as
+        :attr:`last_context`
+
+        :param cancel: :any:`CancellationToken` for the run (optional)
+        :return:       a :any:`RunContext` object
+        """
+        context = RunContext(self, cancel)
+        self.last_context = context
+        return context
+
+    def iterate(self, data, history=None, cancel=None, context=None,
+                checkpointer=None):
+        """
+        Run the algorithm as a generator which yields a tuple ``(trust,
+        belief)`` of numpy arrays for the initial state and after each
+        iteration, and returns the final tuple when iteration finishes.
+
+        The arrays may be modified in place by later iterations, so must be
+        copied if they are to be kept. The backend is closed when the
+        generator finishes or is closed. Hooks registered with
+        :meth:`add_hook` are called before each tuple is yielded.
+
+        :param data:    input data as a :any:`Dataset` object
+        :param history: :any:`History` object to record trust and belief at
+                        each iteration in (optional)
+        :param cancel:  :any:`CancellationToken` which is checked before each
+                        iteration and during setup (optional)
+        :param context: :any:`RunContext` to use for the run (default: a new
+                        context created with :meth:`create_context`)
+        :param checkpointer: :any:`Checkpointer` to periodically save the
+                             state of the run with (optional)
+        :raises EmptyDatasetError: if the dataset contains no claims
+        :raises RunCancelledError: if the run is cancelled with ``cancel``.
+                                   The backend and its buffers are released
+                                   before the error is raised
         """
         super().run(data)
-        self.iterator.reset()
-        self.start_time = time.time()
-        self.results_log = []
-        _t, _b = self._run(data)
-        yield from self.results_log
+        if context is None:
+            context = self.create_context(cancel)
+        if history is not None:
+            history.start(data)
+        if checkpointer is not None:
+            checkpointer.start(context.iterator.it_count)
+        timings = context.timings
+        run_data = data
+        if self.compress_duplicates:
+            start = time.perf_counter()
+            run_data, source_map = data.compress_sources()
+            if run_data is not data:
+                context.source_map = source_map
+            timings["setup"] += time.perf_counter() - start
+        steps = self._run(run_data, context)
+        # Time until the initial state is yielded is spent on setup, and the
+        # remaining time in _run on iterations (excluding convergence checks,
+        # which are timed separately)
+        phase = "setup"
+        try:
+            while True:
+                context.check_cancelled()
+                resumed = time.perf_counter()
+                convergence = timings["convergence"]
+                try:
+                    trust, belief = next(steps)
+                    finished = False
+                except StopIteration as stop:
+                    trust, belief = stop.value
+                    finished = True
+                timings[phase] += (time.perf_counter() - resumed
+                                   - (timings["convergence"] - convergence))
+                phase = "iterations"
+                if finished:
+                    break
+                if context.backend is not None:
+                    context.backend.end_iteration(context.iterator.it_count)
+                # Checkpoints hold the state of the run itself, but everything
+                # else sees trust for all sources
+                full_trust = context.expand(trust)
+                # Hooks are only called if there are any, to avoid overhead
+                stopped = bool(self.hooks) and self.call_hooks(
+                    context, full_trust, belief
+                )
+                if history is not None:
+                    history.record(context.iterator.it_count,
+                                   time.time() - context.start_time,
+                                   full_trust, belief, final=stopped)
+                if (checkpointer is not None
+                        and checkpointer.is_due(context.iterator.it_count)):
+                    checkpointer.save(
+                        self.create_checkpoint(context, data, trust, belief)
+                    )
+                yield full_trust, belief
+                if stopped:
+                    break
+        finally:
+            steps.close()
+            context.release()
+
+        if context.stop_reason is None:
+            context.stop_reason = (context.iterator.get_stop_reason()
+                                   or StopReason.STOPPED)
+        if context.source_map is not None:
+            trust = context.expand(trust)
+            context.metadata = dict(context.metadata or {},
+                                    compressed_sources=run_data.num_sources)
+        if context.accelerator is not None:
+            context.metadata = dict(context.metadata or {},
+                                    acceleration=dict(context.accel_stats))
+        if history is not None:
+            history.record(context.iterator.it_count,
+                           time.time() - context.start_time, trust, belief,
+                           final=True)
+        return trust, belief
+
+    def accelerate(self, context, trust, belief):
+        """
+        Apply the accelerator (if any) to the trust and belief vectors produced
+        by the latest iteration.
+
+        For algorithms that normalise trust and belief so that the largest
+        entries are 1, the extrapolated vectors are normalised in the same way.
+        Extrapolations are safeguarded so that acceleration cannot make a run
+        diverge:
+
+        * if extrapolation produces non-finite values, an invalid state (see
+          :meth:`is_valid_state`), or shrinks any positive entry below
+          ``accel_min_ratio`` times its plain value, the plain iterate is used
+          instead
+        * if the residual of the fixed-point map at an extrapolated state is
+          larger than at the plain iterate it replaced, the extrapolation is
+          reverted: the iteration computed from it is discarded and the plain
+          iterate is used instead. Reverting also suspends extrapolation for a
+          number of iterations which doubles each time, so an accelerator
+          that does not help costs only a few iterations
+
+        Discarded iterations are still counted in the iterator, and hence in
+        ``Result.iterations``. The numbers of extrapolations accepted,
+        rejected and reverted are stored under ``acceleration`` in the
+        ``metadata`` of the result.
+
+        :param context: :any:`RunContext` for the run
+        :param trust:   numpy array of trust values from the latest iteration
+        :param belief:  numpy array of belief values from the latest iteration
+        :return:        a tuple ``(trust, belief)`` to use for the next
+                        iteration
+        """
+        accelerator = context.accelerator
+        if accelerator is None:
+            return trust, belief
+
+        plain = np.concatenate((trust, belief))
+        if context.accel_input is None:
+            context.accel_input = plain
+            return trust, belief
+
+        # Residual of the fixed-point map at the latest input
+        residual = np.linalg.norm(plain - context.accel_input)
+        if context.accel_fallback is not None:
+            # The latest input was extrapolated: keep it only if it is closer
+            # to the fixed point than the plain iterate it replaced
+            fallback = context.accel_fallback
+            context.accel_fallback = None
+            if residual > context.accel_residual:
+                self._reject_extrapolation(context)
+                context.accel_stats["reverted"] += 1
+                np.copyto(trust, fallback[:len(trust)])
+                np.copyto(belief, fallback[len(trust):])
+                context.accel_input = fallback
+                return trust, belief
+            context.accel_stats["accepted"] += 1
+        context.accel_residual = residual
+
+        if context.accel_wait > 0:
+            context.accel_wait -= 1
+            context.accel_input = plain
+            return trust, belief
+
+        extrapolated = accelerator.extrapolate(context.accel_input, plain)
+        acc_trust, acc_belief = np.split(extrapolated, [len(trust)])
+        if self.max_normalised:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                acc_trust = acc_trust / np.max(acc_trust)
+                acc_belief = acc_belief / np.max(acc_belief)
+
+        candidate = np.concatenate((acc_trust, acc_belief))
+        positive = plain > 0
+        valid = (
+            np.all(np.isfinite(candidate))
+            # Extrapolation must not introduce new zeros, or push entries
+            # towards zero
+            and np.all(candidate[positive]
+                       >= self.accel_min_ratio * plain[positive])
+            and self.is_valid_state(acc_trust, acc_belief)
+        )
+        if not valid:
+            self._reject_extrapolation(context, backoff=False)
+            context.accel_input = plain
+            return trust, belief
+
+        if not np.array_equal(candidate, plain):
+            context.accel_fallback = plain
+        context.accel_input = candidate
+        return acc_trust, acc_belief
+
+    def _reject_extrapolation(self, context, backoff=True):
+        """
+        Discard the accelerator's history after a rejected extrapolation. If
+        ``backoff`` is True, also only use plain iterations for a while: the
+        number of plain iterations doubles with each such rejection, so that
+        acceleration costs at most a few iterations when it does not help
+        """
+        context.accelerator.reset()
+        context.accel_stats["rejected"] += 1
+        if backoff:
+            context.accel_backoff *= 2
+            context.accel_wait = context.accel_backoff
 
-    def _run(self, data):
+    def is_valid_state(self, trust, belief):
+        """
+        Check whether trust and belief vectors are valid input to an iteration
+        of the algorithm. Sub-classes may override this to impose further
+        restrictions.
+
+        :return: True if all trust and belief values are non-negative, and
+                 False otherwise
+        """
+        return np.all(trust >= 0) and np.all(belief >= 0)
+
+    def run_eigensolver(self, context, data, backend, matvec, v0,
+                        weights=None):
+        """
+        Compute the fixed point of the trust and belief updates directly with
+        an eigensolver, instead of by power iteration.
+
+        The number of operator products evaluated is recorded as the number of
+        iterations, since each is equivalent in cost to one iteration, and the
+        iteration limit of a :any:`ConvergenceIterator` applies to the number
+        of products. The eigensolver's tolerance is relative to the leading
+        eigenvalue rather than a distance between iterates, so algorithms
+        should continue with power iteration from the result until the
+        iterator's own criterion is met.
+
+        :param context: :any:`RunContext` for the run
+        :param data:    :any:`Dataset` object
+        :param backend: :any:`BaseBackend` object
+        :param matvec:  function computing the symmetric trust update operator
+                        applied to a numpy array
+        :param v0:      starting vector for the eigensolver
+        :param weights: if not None, a numpy array ``w`` such that trust is
+                        ``w`` multiplied entry-wise by the eigenvector
+        :return: a tuple ``(trust, belief)`` normalised as in power iteration
+        """
+        tol, limit = 0, None
+        if isinstance(context.iterator, ConvergenceIterator):
+            tol, limit = context.iterator.threshold, context.iterator.limit
+        products = 0
+
+        def limited_matvec(vec):
+            nonlocal products
+            context.check_cancelled()
+            if limit is not None and products >= limit:
+                raise ConvergenceError(
+                    "Did not converge in {} iterations".format(limit)
+                )
+            products += 1
+            return matvec(vec)
+
+        vec, num_products = leading_eigenvector(
+            limited_matvec, data.num_sources, v0=v0, tol=tol
+        )
+        trust = vec if weights is None else weights * vec
+        belief = backend.transpose(trust)
+        trust = trust / backend.max(trust)
+        belief = belief / backend.max(belief)
+
+        context.iterator.it_count = num_products
+        return trust, belief
+
+    def _run(self, data, context):
         """
         Internal method for running the algorithm, to avoid including
-        boilerplate code in each subclass
+        boilerplate code in each subclass. This is a generator, which yields
+        a tuple ``(trust, belief)`` for the initial state and at the end of
+        each iteration (see :meth:`iterate`)
 
-        :param data: :any:`Dataset` object
+        :param data:    :any:`Dataset` object
+        :param context: :any:`RunContext` holding the state of the run
         :return: a tuple ``(trust, belief)``, where ``trust`` is a numpy
                  array of source trusts, and ``belief`` is a numpy array of
                  claim beliefs, both ordered as in the input data
         """
         raise NotImplementedError("Must be implemented in child classes")
-
-    def log(self, data, trust, belief):
-        """
-        If logging is enabled, append the given trust and belief scores to the
-        log
-        """
-        if self.results_log is not None:
-            res = Result(
-                trust=data.get_source_trust_dict(trust),
-                belief=data.get_belief_dict(belief),
-                time_taken=time.time() - self.start_time,
-                iterations=self.iterator.it_count
-            )
-            self.results_log.append(res)
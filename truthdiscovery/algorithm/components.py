@@ -0,0 +1,146 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+
+from truthdiscovery.algorithm.base import BaseAlgorithm
+from truthdiscovery.output import Result
+from truthdiscovery.utils.iterator import StopReason
+
+
+def _run_on_component(alg, data):
+    """
+    Run an algorithm on a single component. This is a module-level function
+    so that it can be sent to worker processes
+    """
+    return alg.run(data)
+
+
+class ComponentParallel(BaseAlgorithm):
+    """
+    Run an algorithm separately on each connected component of a dataset, in
+    a pool of worker processes, and merge the results.
+
+    Trust and belief never flow between connected components, so for most
+    algorithms the scores within a component are the same as for a run on the
+    whole dataset *up to normalisation*:
+
+    * Sums, AverageLog, Investment and PooledInvestment divide trust and belief
+      by their maximum values at each iteration. The updates are homogeneous,
+      so these divisions only rescale each component by a positive constant:
+      ratios between scores in the same component are unaffected. When run per
+      component, the most trusted source (and most believed claim) in *every*
+      component has score 1. On the whole dataset, only the component
+      containing the global maximum keeps this scale; in the others, scores
+      shrink geometrically relative to it as iteration continues, so that
+      comparing scores across components mainly reflects the number of
+      iterations performed.
+
+    * TruthFinder performs no normalisation, so its scores are identical.
+
+    * CRH normalises using sums over all sources, and UnboundedSums rescales
+      and ranks using global maxima, so their results are not separable.
+
+    Recovering the whole-dataset scale for the max-normalised algorithms would
+    require the normalising constants from every iteration of every component,
+    so scores from different components should not be compared with each
+    other for these algorithms.
+
+    Note that when iterating until convergence, each component stops as soon
+    as *it* has converged, so iteration counts and scores may differ slightly
+    from a whole-dataset run. See :meth:`merge` for how the iteration count,
+    stop reason, timings and metadata of the components are combined.
+    """
+    def __init__(self, algorithm, processes=None, chunksize=None):
+        """
+        :param algorithm: :any:`BaseAlgorithm` object to run on each component
+        :param processes: the number of worker processes (default: number of
+                          CPUs). If 1, components are run sequentially in the
+                          current process
+        :param chunksize: number of components to send to a worker at a time
+                          (default: chosen so that each worker receives around
+                          four chunks)
+        """
+        self.algorithm = algorithm
+        self.processes = processes
+        self.chunksize = chunksize
+
+    def run(self, data):
+        super().run(data)
+        start_time = time.time()
+        perf_start = time.perf_counter()
+
+        components = [data.get_sub_dataset(source_ids)
+                      for source_ids in data.get_connected_components()]
+        if self.processes == 1:
+            results = [_run_on_component(self.algorithm, comp)
+                       for comp in components]
+        else:
+            workers = self.processes or os.cpu_count() or 1
+            chunksize = self.chunksize or max(
+                1, len(components) // (4 * workers)
+            )
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    _run_on_component,
+                    [self.algorithm] * len(components),
+                    components,
+                    chunksize=chunksize
+                ))
+
+        merged = self.merge(results)
+        merged.time_taken = time.time() - start_time
+        if merged.timings:
+            merged.timings["total"] = time.perf_counter() - perf_start
+        return merged
+
+    def merge(self, results):
+        """
+        Combine results for disjoint components into a single :any:`Result`:
+
+        * the number of iterations is the maximum over all components
+        * the stop reason is shared by all components if they agree.
+          Otherwise it is the first reason other than
+          :any:`StopReason.CONVERGED`, since the run as a whole has only
+          converged if every component has
+        * timings for each phase are summed over components, so measure the
+          total time spent by all workers. The ``total`` time is replaced with
+          the elapsed time of the whole run by :meth:`run`
+        * metadata records the number of ``components``. Items with the same
+          value for every component are copied, and the rest are collected in
+          ``component_metadata``, a list of the metadata of each component
+        """
+        trust = {}
+        belief = {}
+        iterations = None
+        timings = {}
+        stop_reasons = []
+        for res in results:
+            trust.update(res.trust)
+            belief.update(res.belief)
+            if res.iterations is not None:
+                iterations = max(iterations or 0, res.iterations)
+            for phase, seconds in res.timings.items():
+                timings[phase] = timings.get(phase, 0) + seconds
+            if res.stop_reason is not None:
+                stop_reasons.append(res.stop_reason)
+
+        stop_reason = None
+        if stop_reasons:
+            unfinished = [reason for reason in stop_reasons
+                          if reason != StopReason.CONVERGED]
+            stop_reason = unfinished[0] if unfinished else stop_reasons[0]
+
+        all_metadata = [res.metadata for res in results]
+        metadata = {"components": len(results)}
+        differs = False
+        for key in sorted(set().union(*all_metadata)):
+            values = [meta.get(key) for meta in all_metadata]
+            if all(val == values[0] for val in values):
+                metadata[key] = values[0]
+            else:
+                differs = True
+        if differs:
+            metadata["component_metadata"] = all_metadata
+        return Result(trust=trust, belief=belief, time_taken=None,
+                      iterations=iterations, metadata=metadata,
+                      timings=timings, stop_reason=stop_reason)
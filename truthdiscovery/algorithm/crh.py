@@ -1,39 +1,220 @@
+from enum import Enum
+
 import numpy as np
 
+from truthdiscovery.algorithm.backends import SparseBackend
 from truthdiscovery.algorithm.base import BaseIterativeAlgorithm
 
 
+class CRHLoss(Enum):
+    """
+    Enumeration of loss functions for :any:`CRH`, which determine how values
+    are compared and how truths are estimated
+    """
+    #: Values are categorical: the loss for a claim is its squared distance
+    #: from the belief distribution for its variable
+    CATEGORICAL = "categorical"
+    #: Values are numeric: the loss is the absolute deviation from the truth,
+    #: normalised by the standard deviation of claimed values for the
+    #: variable, and truths are weighted medians
+    ABSOLUTE = "absolute"
+    #: Values are numeric: the loss is the squared deviation from the truth,
+    #: normalised by the standard deviation of claimed values for the
+    #: variable, and truths are weighted means
+    SQUARED = "squared"
+
+
 class CRH(BaseIterativeAlgorithm):
     """
     An instance of the CRH algorithm from Yaliang Li et. al.
     """
     eps = 1e-5
+    loss = CRHLoss.CATEGORICAL
+    # Trust is normalised by sums over sources, and continuous losses visit
+    # each source's claims individually, so merging duplicate sources changes
+    # the results
+    supports_compression = False
 
-    def __init__(self, *args, eps=None, **kwargs):
+    def __init__(self, *args, eps=None, loss=None, **kwargs):
         """
         :param: eps: A small positive constant used to ensure arguments to
                      logarithms are positive, and to avoid potential division
                      by zero
+        :param loss: value from :any:`CRHLoss` enumeration to specify whether
+                     values are treated as categorical or continuous
+                     (optional)
         """
         if eps is not None:
             self.eps = eps
+        if loss is not None:
+            self.loss = loss
         super().__init__(*args, **kwargs)
 
-    def _run(self, data):
+    def _run(self, data, context):
+        if self.loss == CRHLoss.CATEGORICAL:
+            return (yield from self._run_categorical(data, context))
+        if self.loss in (CRHLoss.ABSOLUTE, CRHLoss.SQUARED):
+            return (yield from self._run_continuous(data, context))
+        raise ValueError("Invalid loss function: '{}'".format(self.loss))
+
+    def _run_categorical(self, data, context):
+        backend = self.get_backend(data, context)
         trust = np.zeros((data.num_sources,))
-        belief = ((data.sc.T @ np.ones((data.num_sources,)))
-                  / data.num_sources)
-        i = np.eye(data.num_claims)
-        while not self.iterator.finished():
-            t = np.tile(belief, (data.num_claims, 1))
-            y = (t - i) ** 2
-            z = data.mut_ex.toarray() * y
-            alpha = self.eps + data.sc @ z @ np.ones((data.num_claims,))
-            new_trust = self.eps - np.log(alpha / np.sum(alpha))
-            belief = (data.sc.T @ new_trust) / np.sum(new_trust)
-
-            self.iterator.compare(trust, new_trust)
+        belief = backend.sources_per_claim() / data.num_sources
+        context.restore(trust, belief)
+        yield trust, belief
+
+        new_trust = np.empty((data.num_sources,))
+        alpha = backend.workspace("alpha", data.num_sources)
+        squares = backend.workspace("squares", data.num_claims)
+        loss = backend.workspace("loss", data.num_claims)
+        while not context.iterator.finished():
+            # The loss for a claim j is the squared distance between the belief
+            # vector for its variable and the indicator vector of j, i.e.
+            #   sum_{k ~ j} (belief[k] - [j = k]) ** 2
+            #     = sum_{k ~ j} belief[k] ** 2 - 2 * belief[j] + 1
+            # where k ~ j means claims k and j are for the same variable. This
+            # is computed with per-variable sums, so that memory and time are
+            # linear in the number of claims
+            backend.variable_sums(np.square(belief, out=squares), out=loss)
+            loss -= np.multiply(2, belief, out=squares)
+            loss += 1
+
+            backend.forward(loss, out=alpha)
+            alpha += self.eps
+            alpha /= backend.sum(alpha)
+            np.subtract(self.eps, np.log(alpha, out=alpha), out=new_trust)
+
+            backend.transpose(new_trust, out=belief)
+            belief /= backend.sum(new_trust)
+            new_trust, belief = self.accelerate(context, new_trust, belief)
+
+            context.compare(trust, new_trust)
+            trust, new_trust = new_trust, trust
+            yield trust, belief
+
+        return trust, belief
+
+    def _run_continuous(self, data, context):
+        """
+        Run CRH on numeric values. Belief in a claim is ``exp(-loss)``, where
+        ``loss`` is the normalised deviation of its value from the estimated
+        truth for its variable. Claims whose value equals the truth therefore
+        have belief 1. The truths themselves can be obtained with
+        :meth:`get_truths`.
+        """
+        backend = self.get_backend(data, context)
+        values = data.get_claim_values()
+        spread = self.get_variable_spread(data, values, backend)
+        # Claims sorted by variable and then by value, for weighted medians.
+        # This is independent of the weights, so is only computed once
+        order = np.lexsort((values, data.claim_var_ids))
+
+        trust = np.ones((data.num_sources,))
+        # Belief is determined by trust, so only trust is restored
+        context.restore(trust)
+        truths = self.estimate_truths(data, values, trust, order, backend)
+        loss = self.get_claim_losses(data, values, truths, spread)
+        belief = np.exp(-loss)
+        yield trust, belief
+
+        while not context.iterator.finished():
+            alpha = self.eps + backend.forward(loss)
+            new_trust = self.eps - np.log(alpha / backend.sum(alpha))
+            truths = self.estimate_truths(data, values, new_trust, order,
+                                          backend)
+            loss = self.get_claim_losses(data, values, truths, spread)
+            belief = np.exp(-loss)
+            new_trust, belief = self.accelerate(context, new_trust, belief)
+
+            context.compare(trust, new_trust)
             trust = new_trust
-            self.log(data, trust, belief)
+            yield trust, belief
 
         return trust, belief
+
+    def get_truths(self, data, results):
+        """
+        Compute the estimated truth for each variable in continuous mode
+
+        :param data:    :any:`Dataset` object the results were obtained from
+        :param results: a :any:`Result` object from running this algorithm
+        :return: a dict of the form ``{var_label: truth, ...}``
+        """
+        trust = np.array([
+            results.trust[data.source_ids.inverse[s_id]]
+            for s_id in range(data.num_sources)
+        ])
+        values = data.get_claim_values()
+        order = np.lexsort((values, data.claim_var_ids))
+        truths = self.estimate_truths(data, values, trust, order)
+        return {
+            data.var_ids.inverse[var_id]: truth
+            for var_id, truth in enumerate(truths)
+        }
+
+    def estimate_truths(self, data, values, trust, order, backend=None):
+        """
+        :param data:    :any:`Dataset` object
+        :param values:  numpy array of numeric claim values
+        :param trust:   numpy array of source weights
+        :param order:   claim IDs sorted by variable and then by value
+        :param backend: :any:`BaseBackend` object to use (optional)
+        :return: a numpy array of truths for each variable: the weighted
+                 median for :any:`CRHLoss.ABSOLUTE`, or weighted mean for
+                 :any:`CRHLoss.SQUARED`
+        """
+        backend = backend or SparseBackend(data)
+        # The total weight behind each claim
+        weights = backend.transpose(trust)
+
+        if self.loss == CRHLoss.SQUARED:
+            totals = np.bincount(data.claim_var_ids, weights=weights,
+                                 minlength=data.num_variables)
+            weighted = np.bincount(data.claim_var_ids,
+                                   weights=weights * values,
+                                   minlength=data.num_variables)
+            return weighted / totals
+
+        # Weighted median: cumulative sums of weights are taken over all
+        # claims in sorted order, so that the weight of the claims in each
+        # variable up to a given claim is the difference between two entries.
+        # The median for a variable is the first value whose cumulative weight
+        # reaches half of the variable's total weight
+        sorted_vars = data.claim_var_ids[order]
+        starts = np.searchsorted(sorted_vars, np.arange(data.num_variables))
+        ends = np.append(starts[1:], len(order))
+        cum_weights = np.concatenate(([0], np.cumsum(weights[order])))
+        base = cum_weights[starts]
+        targets = base + (cum_weights[ends] - base) / 2
+        idx = np.searchsorted(cum_weights[1:], targets)
+        idx = np.clip(idx, starts, ends - 1)
+        return values[order][idx]
+
+    def get_claim_losses(self, data, values, truths, spread):
+        """
+        :return: a numpy array of the normalised loss for each claim
+        """
+        deviation = values - truths[data.claim_var_ids]
+        if self.loss == CRHLoss.SQUARED:
+            return deviation ** 2 / spread[data.claim_var_ids]
+        return np.abs(deviation) / spread[data.claim_var_ids]
+
+    @classmethod
+    def get_variable_spread(cls, data, values, backend=None):
+        """
+        :return: a numpy array of the standard deviation of claimed values for
+                 each variable (counting each source's claim separately), with
+                 zeros replaced by 1 to avoid division by zero
+        """
+        backend = backend or SparseBackend(data)
+        counts = backend.sources_per_claim()
+        var_counts = np.bincount(data.claim_var_ids, weights=counts,
+                                 minlength=data.num_variables)
+        means = np.bincount(data.claim_var_ids, weights=counts * values,
+                            minlength=data.num_variables) / var_counts
+        sq_dev = counts * (values - means[data.claim_var_ids]) ** 2
+        std = np.sqrt(np.bincount(data.claim_var_ids, weights=sq_dev,
+                                  minlength=data.num_variables) / var_counts)
+        std[std == 0] = 1
+        return std
@@ -0,0 +1,103 @@
+from enum import Enum
+
+import numpy as np
+from scipy.sparse.linalg import ArpackNoConvergence, LinearOperator, eigsh
+
+from truthdiscovery.exceptions import ConvergenceError
+from truthdiscovery.utils.iterator import ConvergenceIterator
+
+
+class SolverMode(Enum):
+    """
+    Enumeration of methods for computing the fixed point of algorithms that
+    amount to finding a leading eigenvector (e.g. :any:`Sums`)
+    """
+    #: Repeatedly apply the trust and belief updates (power iteration)
+    POWER = "power"
+    #: Find the leading eigenvector with a sparse eigensolver
+    EIGEN = "eigen"
+    #: Use the eigensolver when iterating until convergence within a positive
+    #: threshold and the dataset is connected, and power iteration otherwise
+    AUTO = "auto"
+
+
+#: Problems with at most this many rows are solved with a dense eigensolver,
+#: since ARPACK cannot handle very small operators
+DENSE_SIZE_LIMIT = 2
+
+
+def leading_eigenvector(matvec, size, v0=None, tol=0, maxiter=None):
+    """
+    Find the eigenvector corresponding to the largest eigenvalue of a symmetric
+    positive semi-definite linear operator
+
+    :param matvec:  function computing the product of the operator with a
+                    numpy array
+    :param size:    the number of rows (and columns) of the operator
+    :param v0:      starting vector for the eigensolver (optional)
+    :param tol:     relative accuracy for the eigenvector (0 means machine
+                    precision)
+    :param maxiter: maximum number of Arnoldi update iterations (optional)
+    :return:        a tuple ``(vec, num_products)``, where ``vec`` is the
+                    eigenvector scaled so that its entries are non-negative,
+                    and ``num_products`` is the number of operator products
+                    evaluated
+    :raises ConvergenceError: if the eigensolver does not converge within
+                              ``maxiter`` iterations
+    """
+    num_products = 0
+
+    def counting_matvec(x):
+        nonlocal num_products
+        num_products += 1
+        return matvec(np.ravel(x))
+
+    if size <= DENSE_SIZE_LIMIT:
+        dense = np.column_stack([counting_matvec(col) for col in np.eye(size)])
+        _, vecs = np.linalg.eigh(dense)
+        vec = vecs[:, -1]
+    else:
+        if v0 is None or not np.any(v0):
+            v0 = np.ones((size,))
+        op = LinearOperator((size, size), matvec=counting_matvec,
+                            dtype=np.float64)
+        try:
+            _, vecs = eigsh(op, k=1, which="LA", v0=v0, tol=tol,
+                            maxiter=maxiter)
+        except ArpackNoConvergence:
+            raise ConvergenceError(
+                "Eigensolver did not converge in {} iterations"
+                .format(maxiter)
+            )
+        vec = vecs[:, 0]
+
+    # The leading eigenvector of a non-negative matrix can be chosen to be
+    # non-negative, but the solver may return its negation, and rounding
+    # errors may introduce tiny negative entries
+    if np.sum(vec) < 0:
+        vec = -vec
+    return np.clip(vec, 0, None), num_products
+
+
+def use_eigensolver(mode, iterator, data):
+    """
+    :param mode:     value from the :any:`SolverMode` enumeration
+    :param iterator: the :any:`Iterator` for the run
+    :param data:     the :any:`Dataset` being run on
+    :return:         True if the eigensolver should be used instead of power
+                     iteration
+    :raises ValueError: if ``mode`` is not an item from the :any:`SolverMode`
+                        enumeration
+    """
+    if mode == SolverMode.POWER:
+        return False
+    if mode == SolverMode.EIGEN:
+        return True
+    if mode == SolverMode.AUTO:
+        # The leading eigenvector is not unique if the graph of sources and
+        # claims is disconnected, so the eigensolver's result may differ from
+        # that of power iteration
+        return (isinstance(iterator, ConvergenceIterator)
+                and iterator.threshold > 0
+                and data.num_connected_components() <= 1)
+    raise ValueError("Invalid solver mode: '{}'".format(mode))
@@ -11,6 +11,10 @@ class Investment(BaseIterativeAlgorithm):
     Sources invest uniformly in their claims and receive returns; the source
     who invested most in a claim receives the most return from that claim
     """
+    max_normalised = True
+    # The non-linear growth of beliefs gives several attracting fixed points,
+    # and extrapolated iterates can move a run from one to another
+    supports_acceleration = False
     priors = PriorBelief.VOTED
     g = 1.2
 
@@ -23,48 +27,82 @@ class Investment(BaseIterativeAlgorithm):
             self.g = g
         super().__init__(*args, **kwargs)
 
-    def update_trust(self, old_trust, claim_counts, sc_mat, belief):
+    def update_trust(self, old_trust, claim_counts, backend, belief,
+                     out=None):
         """
+        :param out: numpy array to write the result to (optional)
         :return: an updated trust vector
         """
         # The amount each source has to invest in its claims
-        investment_amounts = old_trust / claim_counts
+        investment_amounts = np.divide(
+            old_trust, claim_counts,
+            out=backend.workspace("investment_amounts", len(old_trust))
+        )
         # The amount each claim receives in investment from its sources
-        claim_investments = sc_mat.T @ investment_amounts
-        if np.any(claim_investments == 0):
+        claim_investments = backend.transpose(
+            investment_amounts,
+            out=backend.workspace("claim_investments", len(belief))
+        )
+        if not np.all(claim_investments):
             raise EarlyFinishError(
                 "Investment in at least one claim has become zero"
             )
-        # Trust update can be expressed as the of entry-wise product of
-        # investment amounts and the following matrix, which is obtained
-        # by column-wise division (each column in sc is divided by the
-        # corresponding entry in claim_investments)
+        # Trust update can be expressed as the entry-wise product of
+        # investment amounts and sc with each column divided by the
+        # corresponding entry in claim_investments. Scaling the columns of sc
+        # is equivalent to scaling the vector it multiplies, which avoids
+        # building a new matrix at each iteration
+        return backend.forward(
+            belief, row_scale=investment_amounts,
+            col_scale=np.reciprocal(claim_investments, out=claim_investments),
+            out=out
+        )
 
-        # (Note: using '/' here will result in a dense numpy array: we use
-        # multiply() to get a sparse result instead)
-        mat = sc_mat.multiply(1 / claim_investments)
-        return investment_amounts * (mat @ belief)
+    def update_belief(self, trust, backend, claim_counts=None, out=None):
+        """
+        Compute belief from trust: each claim receives returns from the
+        investments of its sources, which are grown with the non-linear
+        function and normalised so that the largest belief is 1
+
+        :param trust:        numpy array of trust values
+        :param backend:      :any:`BaseBackend` for the dataset
+        :param claim_counts: numpy array of the number of claims made by each
+                             source (optional)
+        :param out:          numpy array to write the result to (optional)
+        :return:             numpy array of belief values
+        """
+        if claim_counts is None:
+            claim_counts = backend.claims_per_source()
+        belief = backend.transpose(
+            np.divide(trust, claim_counts,
+                      out=backend.workspace("returns", len(trust))),
+            out=out
+        )
+        np.power(belief, self.g, out=belief)
+        belief /= backend.max(belief)
+        return belief
 
-    def _run(self, data):
-        claim_counts = data.sc @ np.ones((data.num_claims,))
+    def _run(self, data, context):
+        backend = self.get_backend(data, context)
+        claim_counts = backend.claims_per_source()
         trust = np.ones((data.num_sources,))
-        belief = self.get_prior_beliefs(data)
-        self.log(data, trust, belief)
+        belief = self.get_prior_beliefs(data, backend)
+        context.restore(trust, belief)
+        yield trust, belief
 
-        while not self.iterator.finished():
+        new_trust = np.empty((data.num_sources,))
+        while not context.iterator.finished():
             try:
-                new_trust = self.update_trust(
-                    trust, claim_counts, data.sc, belief
-                )
+                self.update_trust(trust, claim_counts, backend, belief,
+                                  out=new_trust)
             except EarlyFinishError:
                 break
-            belief = (data.sc.T @ (new_trust / claim_counts)) ** self.g
-
-            new_trust = new_trust / max(new_trust)
-            belief = belief / max(belief)
+            self.update_belief(new_trust, backend, claim_counts, out=belief)
+            new_trust /= backend.max(new_trust)
+            new_trust, belief = self.accelerate(context, new_trust, belief)
 
-            self.iterator.compare(new_trust, trust)
-            trust = new_trust
-            self.log(data, trust, belief)
+            context.compare(new_trust, trust)
+            trust, new_trust = new_trust, trust
+            yield trust, belief
 
         return trust, belief
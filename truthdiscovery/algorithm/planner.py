@@ -0,0 +1,421 @@
+from collections import namedtuple
+import json
+import os
+import time
+
+import numpy as np
+import scipy.sparse
+
+from truthdiscovery.algorithm.backends import (
+    DenseBackend,
+    MemoryMappedBackend,
+    SparseBackend,
+    ThreadedBackend
+)
+from truthdiscovery.utils.spmv import ParallelSparseMatrix
+
+#: Summary of the size and shape of a dataset used for planning
+DatasetProfile = namedtuple("DatasetProfile", [
+    "num_sources", "num_claims", "num_variables", "nnz", "max_domain_size",
+    "mean_domain_size", "available_memory", "dense"
+])
+
+#: Estimated cost of an execution strategy: ``time`` is the estimated time in
+#: seconds per iteration, and ``memory`` the estimated number of bytes which
+#: must stay in memory for products to run at that speed. This includes the
+#: dataset's own matrix if products use it, but not matrices in memory-mapped
+#: files, which the operating system may evict and read back as needed
+Estimate = namedtuple("Estimate", ["time", "memory"])
+
+#: Seconds for which the result of :func:`get_available_memory` is reused
+MEMORY_CACHE_TIME = 1.0
+_memory_cache = {}
+
+
+def get_available_memory():
+    """
+    :return: the number of bytes of memory available on this machine, or None
+             if this cannot be determined. The value is cached for
+             ``MEMORY_CACHE_TIME`` seconds, so that planning many small runs
+             does not read it each time
+    """
+    now = time.monotonic()
+    cached = _memory_cache.get("available")
+    if cached is not None and now - cached[0] < MEMORY_CACHE_TIME:
+        return cached[1]
+    available = _read_available_memory()
+    _memory_cache["available"] = (now, available)
+    return available
+
+
+def _read_available_memory():
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class CostModel:
+    """
+    Linear model of the time taken by matrix-vector products for each execution
+    strategy. The default coefficients are typical for a modern CPU; use
+    :meth:`calibrate` to measure them on the current host
+    """
+    #: Seconds per entry of a dense product
+    dense_entry_time = 5e-10
+    #: Fixed seconds per dense product
+    dense_call_time = 2e-6
+    #: Seconds per stored entry of a sparse product
+    sparse_nnz_time = 2e-9
+    #: Fixed seconds per sparse product
+    sparse_call_time = 1e-5
+    #: Fixed seconds per product to dispatch work to a thread pool
+    thread_call_time = 1e-4
+    #: Additional seconds per stored entry for memory-mapped matrices
+    mmap_nnz_time = 1e-9
+    #: Seconds per entry for element-wise operations on vectors
+    vector_entry_time = 2e-9
+
+    COEFFICIENTS = (
+        "dense_entry_time", "dense_call_time", "sparse_nnz_time",
+        "sparse_call_time", "thread_call_time", "mmap_nnz_time",
+        "vector_entry_time"
+    )
+
+    def __init__(self, **coefficients):
+        """
+        :param coefficients: values for any of the coefficients listed in
+                             ``COEFFICIENTS`` to override the defaults
+        :raises ValueError: if an unknown coefficient is given
+        """
+        for name, value in coefficients.items():
+            if name not in self.COEFFICIENTS:
+                raise ValueError("Unknown coefficient '{}'".format(name))
+            setattr(self, name, float(value))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.COEFFICIENTS}
+
+    def save(self, path):
+        """
+        Save coefficients to a JSON file
+        """
+        with open(path, "w") as outfile:
+            json.dump(self.to_dict(), outfile, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load coefficients from a JSON file written by :meth:`save`
+        """
+        with open(path) as infile:
+            return cls(**json.load(infile))
+
+    @classmethod
+    def _time(cls, func, repeats):
+        """
+        :return: the minimum time in seconds taken by ``func()`` over a number
+                 of repeats
+        """
+        func()
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    @classmethod
+    def calibrate(cls, threads=None, size=20000, density=1e-3, repeats=5):
+        """
+        Measure the coefficients by benchmarking products on this host
+
+        :param threads: the number of threads to benchmark threaded products
+                        with (default: the number of CPUs)
+        :param size:    the number of rows and columns of the sparse matrix
+                        used for benchmarks
+        :param density: the density of the sparse matrix
+        :param repeats: the number of times each benchmark is repeated
+        :return:        a :any:`CostModel` object
+        """
+        threads = threads or os.cpu_count() or 1
+        rng = np.random.RandomState(0)
+        coefficients = {}
+
+        dense_size = 512
+        dense = rng.rand(dense_size, dense_size)
+        dense_vec = rng.rand(dense_size)
+        tiny = rng.rand(2, 2)
+        tiny_vec = rng.rand(2)
+        dense_call = cls._time(lambda: tiny @ tiny_vec, repeats)
+        dense_total = cls._time(lambda: dense @ dense_vec, repeats)
+        coefficients["dense_call_time"] = dense_call
+        coefficients["dense_entry_time"] = (
+            max(dense_total - dense_call, 0) / dense_size ** 2
+        )
+
+        # Choose random coordinates directly: scipy.sparse.random samples
+        # without replacement from all size ** 2 positions, which needs memory
+        # quadratic in size
+        nnz = max(int(size * size * density), 1)
+        sparse = scipy.sparse.csr_matrix(
+            (rng.rand(nnz),
+             (rng.randint(0, size, nnz), rng.randint(0, size, nnz))),
+            shape=(size, size)
+        )
+        sparse_vec = rng.rand(size)
+        tiny_sparse = scipy.sparse.csr_matrix(tiny)
+        sparse_call = cls._time(lambda: tiny_sparse @ tiny_vec, repeats)
+        sparse_total = cls._time(lambda: sparse @ sparse_vec, repeats)
+        per_nnz = max(sparse_total - sparse_call, 0) / sparse.nnz
+        coefficients["sparse_call_time"] = sparse_call
+        coefficients["sparse_nnz_time"] = per_nnz
+
+        parallel = ParallelSparseMatrix(sparse, threads)
+        parallel_total = cls._time(lambda: parallel @ sparse_vec, repeats)
+        coefficients["thread_call_time"] = max(
+            parallel_total - sparse.nnz * per_nnz / threads, 0
+        )
+
+        vec_a = rng.rand(size)
+        vec_b = rng.rand(size)
+        coefficients["vector_entry_time"] = (
+            cls._time(lambda: vec_a * vec_b, repeats) / size
+        )
+
+        mapped = MemoryMappedBackend(_MatrixOnly(sparse))
+        try:
+            mapped_total = cls._time(lambda: mapped.forward(sparse_vec),
+                                     repeats)
+        finally:
+            mapped.close()
+        coefficients["mmap_nnz_time"] = (
+            max(mapped_total - sparse_total, 0) / sparse.nnz
+        )
+        return cls(**coefficients)
+
+
+class _MatrixOnly:
+    """
+    Minimal stand-in for a :any:`Dataset` holding only a source-claim matrix,
+    used for calibration
+    """
+    source_weights = None
+    sc_dense = None
+
+    def __init__(self, sc):
+        self.sc = sc
+        self.num_sources, self.num_claims = sc.shape
+
+
+class Plan:
+    """
+    The execution strategy chosen by a :any:`Planner` for a dataset
+    """
+    def __init__(self, strategy, estimates, profile):
+        """
+        :param strategy:  the name of the chosen strategy
+        :param estimates: dict mapping each strategy considered to an
+                          :any:`Estimate` tuple
+        :param profile:   the :any:`DatasetProfile` used
+        """
+        self.strategy = strategy
+        self.estimates = estimates
+        self.profile = profile
+
+    def to_dict(self):
+        """
+        :return: a JSON-serialisable representation of the plan
+        """
+        return {
+            "strategy": self.strategy,
+            "estimates": {
+                name: est._asdict() for name, est in self.estimates.items()
+            },
+            "profile": self.profile._asdict()
+        }
+
+
+class Planner:
+    """
+    Choose an execution backend for a dataset by estimating the time per
+    iteration and the memory required by each strategy with a
+    :any:`CostModel`. The fastest strategy whose memory requirement fits in
+    the available memory is chosen. Products with memory-mapped matrices are
+    slower, but need little memory, so are chosen when the matrices used by
+    the other strategies do not fit.
+
+    Execution engines which need to be configured explicitly (the
+    ``processes``, ``workers`` and ``out_of_core`` parameters of an
+    algorithm) are not considered.
+
+    A planner can be used as the ``backend`` parameter of an algorithm, and is
+    used by default when no execution options are given. The plan is recorded
+    in the ``metadata`` of the algorithm's :any:`Result`.
+    """
+    #: The cost model used by planners when none is given
+    default_cost_model = CostModel()
+    #: The fraction of available memory that a backend may use
+    memory_fraction = 0.5
+    STRATEGIES = ("sparse", "dense", "threaded", "mmap")
+
+    def __init__(self, cost_model=None, threads=None, memory_limit=None,
+                 strategies=None):
+        """
+        :param cost_model:   :any:`CostModel` object (optional)
+        :param threads:      the number of threads for threaded execution
+                             (default: the number of CPUs)
+        :param memory_limit: bytes of memory backends may use (default: a
+                             fraction of the memory available when planning)
+        :param strategies:   names of the strategies which may be chosen
+                             (default: all of ``STRATEGIES``)
+        :raises ValueError: if an unknown strategy is given, or none are
+        """
+        self.cost_model = cost_model or self.default_cost_model
+        self.threads = threads or os.cpu_count() or 1
+        self.memory_limit = memory_limit
+        self.strategies = self.STRATEGIES
+        if strategies is not None:
+            unknown = set(strategies) - set(self.STRATEGIES)
+            if unknown:
+                raise ValueError(
+                    "Unknown strategies: {}".format(", ".join(sorted(unknown)))
+                )
+            if not strategies:
+                raise ValueError("At least one strategy must be given")
+            self.strategies = tuple(strategies)
+
+    def profile(self, data):
+        """
+        :param data: :any:`Dataset` object
+        :return:     a :any:`DatasetProfile` tuple for the dataset
+        """
+        domain_sizes = np.bincount(data.claim_var_ids,
+                                   minlength=data.num_variables)
+        mean_domain_size = 0.0
+        if len(domain_sizes) > 0:
+            mean_domain_size = float(np.mean(domain_sizes))
+        dense = data.sc_dense is not None
+        if dense:
+            nnz = int(np.count_nonzero(data.sc_dense))
+        else:
+            nnz = data.sc.nnz
+        return DatasetProfile(
+            num_sources=data.num_sources,
+            num_claims=data.num_claims,
+            num_variables=data.num_variables,
+            nnz=nnz,
+            max_domain_size=int(np.max(domain_sizes, initial=0)),
+            mean_domain_size=mean_domain_size,
+            available_memory=get_available_memory(),
+            dense=dense
+        )
+
+    def estimate(self, profile):
+        """
+        :param profile: :any:`DatasetProfile` tuple
+        :return: a dict mapping strategy names to :any:`Estimate` tuples
+        """
+        model = self.cost_model
+        sources, claims, nnz = (profile.num_sources, profile.num_claims,
+                                profile.nnz)
+        # Each iteration performs two products, plus element-wise operations
+        # and per-variable sums over source and claim vectors, which cost the
+        # same for all strategies
+        vector_time = 6 * (sources + claims) * model.vector_entry_time
+        sparse_product = model.sparse_call_time + nnz * model.sparse_nnz_time
+        csr_bytes = nnz * 12 + (max(sources, claims) + 1) * 8
+        # Dense strategies need the matrix and a contiguous copy of its
+        # transpose
+        dense_bytes = sources * claims * 8 * 2
+        # Memory-mapped matrices only need their row pointers in memory (and
+        # one block of rows at a time while the files are written)
+        mmap_bytes = (sources + claims + 2) * 8
+
+        estimates = {
+            "sparse": Estimate(2 * sparse_product + vector_time, csr_bytes),
+            "dense": Estimate(
+                2 * (model.dense_call_time
+                     + sources * claims * model.dense_entry_time)
+                + vector_time,
+                dense_bytes
+            ),
+            "mmap": Estimate(
+                2 * (sparse_product + nnz * model.mmap_nnz_time)
+                + vector_time,
+                mmap_bytes
+            )
+        }
+        if self.threads > 1:
+            estimates["threaded"] = Estimate(
+                2 * (model.thread_call_time + model.sparse_call_time
+                     + nnz * model.sparse_nnz_time / self.threads)
+                + vector_time,
+                # The transpose is stored separately in CSR format
+                2 * csr_bytes
+            )
+        return estimates
+
+    def get_memory_limit(self, profile):
+        if self.memory_limit is not None:
+            return self.memory_limit
+        if profile.available_memory is None:
+            return float("inf")
+        return self.memory_fraction * profile.available_memory
+
+    def plan(self, data):
+        """
+        :param data: :any:`Dataset` object
+        :return:     a :any:`Plan` object
+        """
+        profile = self.profile(data)
+        estimates = self.estimate(profile)
+        limit = self.get_memory_limit(profile)
+        candidates = [name for name in self.strategies if name in estimates]
+        if not candidates:
+            # Threaded execution is not estimated on a single CPU
+            candidates = ["sparse"]
+        feasible = [
+            name for name in candidates if estimates[name].memory <= limit
+        ]
+        # Ties are broken by the order of STRATEGIES. If no strategy fits in
+        # memory, use the one needing the least
+        if feasible:
+            strategy = min(feasible, key=lambda name: estimates[name].time)
+        else:
+            strategy = min(candidates, key=lambda name: estimates[name].memory)
+        return Plan(strategy, estimates, profile)
+
+    def get_backend_factory(self, strategy):
+        """
+        :return: a callable creating the backend for a strategy
+        """
+        if strategy == "sparse":
+            return SparseBackend
+        if strategy == "dense":
+            return DenseBackend
+        if strategy == "threaded":
+            return ThreadedBackend.configure(threads=self.threads)
+        if strategy == "mmap":
+            return MemoryMappedBackend
+        raise ValueError("Unknown strategy '{}'".format(strategy))
+
+    def __call__(self, data):
+        """
+        Plan execution for a dataset and create the chosen backend
+
+        :param data: :any:`Dataset` object
+        :return:     a :any:`BaseBackend` object, with the :any:`Plan` as its
+                     ``plan`` attribute
+        """
+        plan = self.plan(data)
+        backend = self.get_backend_factory(plan.strategy)(data)
+        backend.plan = plan
+        return backend
@@ -21,31 +21,62 @@ class PooledInvestment(Investment):
         """
         return FixedIterator(10)
 
-    def _run(self, data):
-        claim_counts = data.sc @ np.ones((data.num_claims,))
+    def update_belief(self, trust, backend, claim_counts=None, out=None):
+        """
+        Compute belief from trust: the returns each claim receives from the
+        investments of its sources are grown with the non-linear function and
+        pooled amongst claims for the same variable, and belief is normalised
+        so that the largest belief is 1
+
+        :param trust:        numpy array of trust values
+        :param backend:      :any:`BaseBackend` for the dataset
+        :param claim_counts: numpy array of the number of claims made by each
+                             source (optional)
+        :param out:          numpy array to write the result to (optional)
+        :return:             numpy array of belief values
+        """
+        if claim_counts is None:
+            claim_counts = backend.claims_per_source()
+        num_claims = backend.num_claims
+        base_returns = backend.transpose(
+            np.divide(trust, claim_counts,
+                      out=backend.workspace("returns", len(trust))),
+            out=backend.workspace("base_returns", num_claims)
+        )
+        returns = np.power(base_returns, self.g,
+                           out=backend.workspace("pooled_returns", num_claims))
+        totals = backend.variable_sums(
+            returns, out=backend.workspace("pooled_totals", num_claims)
+        )
+        np.divide(returns, totals, out=returns)
+        belief = np.multiply(base_returns, returns, out=out)
+        belief /= backend.max(belief)
+        return belief
+
+    def _run(self, data, context):
+        backend = self.get_backend(data, context)
+        claim_counts = backend.claims_per_source()
         trust = np.ones((data.num_sources,))
-        belief = self.get_prior_beliefs(data)
-        self.log(data, trust, belief)
+        belief = self.get_prior_beliefs(data, backend)
+        context.restore(trust, belief)
+        yield trust, belief
 
-        while not self.iterator.finished():
+        new_trust = np.empty((data.num_sources,))
+        while not context.iterator.finished():
             # Trust update is the same as for Investment
             try:
-                new_trust = self.update_trust(
-                    trust, claim_counts, data.sc, belief
-                )
+                self.update_trust(trust, claim_counts, backend, belief,
+                                  out=new_trust)
             except EarlyFinishError:  # pragma: no cover
                 break
             # 'Invest' trust in claims, grow with non-linear function, and
             # update belief
-            base_returns = data.sc.T @ (new_trust / claim_counts)
-            returns = base_returns ** self.g
-            belief = base_returns * (returns / (data.mut_ex @ returns))
-
-            new_trust = new_trust / max(new_trust)
-            belief = belief / max(belief)
+            self.update_belief(new_trust, backend, claim_counts, out=belief)
+            new_trust /= backend.max(new_trust)
+            new_trust, belief = self.accelerate(context, new_trust, belief)
 
-            self.iterator.compare(new_trust, trust)
-            trust = new_trust
-            self.log(data, trust, belief)
+            context.compare(new_trust, trust)
+            trust, new_trust = new_trust, trust
+            yield trust, belief
 
         return trust, belief
@@ -0,0 +1,160 @@
+import time
+
+import numpy as np
+
+
+class RunContext:
+    """
+    State of a single run of an iterative algorithm. A new context is created
+    for each run, with its own copies of the algorithm's iterator and
+    accelerator, so that one algorithm object can be used for several runs at
+    once (e.g. from a pool of threads).
+    """
+    def __init__(self, algorithm, cancel=None):
+        """
+        :param algorithm: the :any:`BaseIterativeAlgorithm` being run
+        :param cancel:    :any:`CancellationToken` for the run (optional)
+        """
+        #: Copy of the algorithm's :any:`Iterator` used for this run
+        self.iterator = algorithm.iterator.clone()
+        #: Copy of the algorithm's :any:`Accelerator` used for this run, or
+        #: None
+        self.accelerator = None
+        if algorithm.accelerator is not None:
+            self.accelerator = algorithm.accelerator.clone()
+        self.cancel_token = cancel
+        #: :any:`BaseBackend` for the run, while it is in progress
+        self.backend = None
+        #: Information about how the run was executed (see
+        #: :any:`BaseIterativeAlgorithm.get_backend`)
+        self.metadata = None
+        #: Input/output statistics recorded by the backend, if any
+        self.io_stats = None
+        #: Seconds spent in each phase of the run
+        self.timings = dict.fromkeys(algorithm.PHASES, 0.0)
+        #: Value from the :any:`StopReason` enumeration, once the run finishes
+        self.stop_reason = None
+        #: :any:`History` of the states yielded by :meth:`run_iter` with
+        #: ``keep_log`` set, for :attr:`BaseIterativeAlgorithm.results_log`,
+        #: or None
+        self.results_history = None
+        self.start_time = time.time()
+        self.perf_start = time.perf_counter()
+        # Concatenated trust and belief given to the accelerator at the
+        # previous iteration
+        self.accel_input = None
+        # Plain iterate replaced by the latest extrapolation (if any), to go
+        # back to if the extrapolation is rejected
+        self.accel_fallback = None
+        # Residual of the fixed-point map before the latest extrapolation
+        self.accel_residual = None
+        # Plain iterations remaining before extrapolating again, and the
+        # length of the next wait after a rejection
+        self.accel_wait = 0
+        self.accel_backoff = 1
+        #: Numbers of extrapolations accepted and rejected by the safeguards
+        #: in :meth:`BaseIterativeAlgorithm.accelerate`, and of iterations
+        #: discarded as a result
+        self.accel_stats = dict.fromkeys(
+            ("accepted", "rejected", "reverted"), 0
+        )
+        #: Tuple ``(trust, belief)`` of numpy arrays to start from when
+        #: resuming a run from a :any:`Checkpoint`, or None
+        self.resume_state = None
+        #: For runs with duplicate sources merged, a numpy array mapping each
+        #: source to its representative (see :meth:`Dataset.compress_sources`),
+        #: and None otherwise
+        self.source_map = None
+
+    def restore(self, trust, belief=None):
+        """
+        Overwrite the initial trust (and belief, if given) of a run with the
+        state being resumed from, if any. Algorithms call this just before
+        the initial state is yielded
+
+        :param trust:  numpy array of initial trust values
+        :param belief: numpy array of initial belief values (optional)
+        """
+        if self.resume_state is None:
+            return
+        np.copyto(trust, self.resume_state[0])
+        if belief is not None:
+            np.copyto(belief, self.resume_state[1])
+
+    def check_cancelled(self):
+        """
+        Check whether the run has been cancelled. Algorithms may call this
+        during long computations, in addition to the checks made between
+        iterations
+
+        :raises RunCancelledError: if the run has been cancelled
+        """
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+    def expand(self, trust):
+        """
+        :param trust: numpy array of trust values for the sources the
+                      algorithm is run on
+        :return:      trust values for all sources in the original dataset,
+                      which differ from ``trust`` only if duplicate sources
+                      have been merged
+        """
+        if self.source_map is None:
+            return trust
+        return trust[self.source_map]
+
+    def compare(self, obj1, obj2):
+        """
+        Compare the old and new trust vectors with the iterator, recording the
+        time taken. Vectors are expanded to all sources first (see
+        :meth:`expand`), so that iteration stops at the same point as it
+        would without merging duplicate sources
+        """
+        start = time.perf_counter()
+        self.iterator.compare(self.expand(obj1), self.expand(obj2))
+        self.timings["convergence"] += time.perf_counter() - start
+
+    def close_backend(self):
+        """
+        Close the backend for the run, if there is one
+        """
+        if self.backend is not None:
+            self.io_stats = self.backend.io_stats
+            self.backend.close()
+            self.backend = None
+
+    def release(self):
+        """
+        Release the backend and any buffers held for the run
+        """
+        self.close_backend()
+        # Discard the accelerator's history of iterates
+        if self.accelerator is not None:
+            self.accelerator.reset()
+        self.accel_input = None
+        self.accel_fallback = None
+        self.cancel_token = None
+
+    def get_accel_state(self):
+        """
+        :return: a dict of the state of the acceleration safeguards in
+                 :meth:`BaseIterativeAlgorithm.accelerate`, for checkpoints
+        """
+        return {
+            "fallback": self.accel_fallback,
+            "residual": self.accel_residual,
+            "wait": self.accel_wait,
+            "backoff": self.accel_backoff,
+            "stats": dict(self.accel_stats),
+        }
+
+    def set_accel_state(self, state):
+        """
+        Restore the state returned by :meth:`get_accel_state`
+        """
+        self.accel_fallback = state["fallback"]
+        self.accel_residual = state["residual"]
+        self.accel_wait = 0
+        self.accel_backoff = state["backoff"]
+        self.accel_stats = dict(state["stats"])
@@ -1,6 +1,7 @@
 import numpy as np
 
 from truthdiscovery.algorithm.base import BaseIterativeAlgorithm
+from truthdiscovery.algorithm.eigen import SolverMode, use_eigensolver
 
 
 class Sums(BaseIterativeAlgorithm):
@@ -8,24 +9,89 @@ class Sums(BaseIterativeAlgorithm):
     Sums, or Hubs and Authorities, algorithm.
 
     Described by Kleinberg for web pages, and adapted to truth discovery by
-    Pasternack and Roth
+    Pasternack and Roth.
+
+    Power iteration is used by default, since the eigensolver is not
+    necessarily faster, and reports matrix products rather than iterations.
+    With ``solver=SolverMode.AUTO`` the eigensolver is used for connected
+    datasets when iterating until convergence (see :any:`SolverMode`)
     """
-    def _run(self, data):
+    max_normalised = True
+    solver = SolverMode.POWER
+
+    def __init__(self, *args, solver=None, **kwargs):
+        """
+        :param solver: value from :any:`SolverMode` enumeration to specify how
+                       the fixed point is found (optional). The default is
+                       power iteration
+        """
+        if solver is not None:
+            self.solver = solver
+        super().__init__(*args, **kwargs)
+
+    def update_belief(self, trust, backend, out=None):
+        """
+        Compute belief from trust: belief in a claim is the sum of the trust
+        in its sources, normalised so that the largest belief is 1
+
+        :param trust:   numpy array of trust values
+        :param backend: :any:`BaseBackend` for the dataset
+        :param out:     numpy array to write the result to (optional)
+        :return:        numpy array of belief values
+        """
+        belief = backend.transpose(trust, out=out)
+        belief /= backend.max(belief)
+        return belief
+
+    def _run(self, data, context):
+        backend = self.get_backend(data, context)
         trust = np.zeros((data.num_sources,))
-        belief = self.get_prior_beliefs(data)
-        self.log(data, trust, belief)
+        belief = self.get_prior_beliefs(data, backend)
+        context.restore(trust, belief)
+        yield trust, belief
 
-        while not self.iterator.finished():
-            new_trust = data.sc @ belief
-            belief = data.sc.T @ new_trust
+        if use_eigensolver(self.solver, context.iterator, data):
+            # Trust is the leading eigenvector of sc sc^T (see Kleinberg)
+            if data.source_weights is None:
+                trust, belief = self.run_eigensolver(
+                    context, data, backend,
+                    lambda t: backend.forward(backend.transpose(t)),
+                    backend.forward(belief)
+                )
+            else:
+                # With duplicate sources merged the operator is sc sc^T W,
+                # where W is the diagonal matrix of source weights. This has
+                # the same eigenvalues as W^(1/2) sc sc^T W^(1/2), whose
+                # eigenvectors u give those of the original as W^(-1/2) u
+                root_w = np.sqrt(data.source_weights)
+                trust_scale = 1 / root_w
+                trust, belief = self.run_eigensolver(
+                    context, data, backend,
+                    lambda u: backend.forward(
+                        backend.transpose(u, col_scale=trust_scale),
+                        row_scale=root_w
+                    ),
+                    backend.forward(belief, row_scale=root_w),
+                    weights=trust_scale
+                )
+            yield trust, belief
+            # The eigensolver's tolerance is not measured in the same way as
+            # the iterator's, so finish with power iteration from the
+            # eigenvector until the iterator's criterion is met
 
+        # Results are written to preallocated arrays, and the arrays for the
+        # old and new trust are swapped at the end of each iteration
+        new_trust = np.empty((data.num_sources,))
+        while not context.iterator.finished():
+            backend.forward(belief, out=new_trust)
             # Trust and belief are normalised so that the largest entries in
             # each are 1; otherwise trust and belief scores grow without bound
-            new_trust = new_trust / max(new_trust)
-            belief = belief / max(belief)
+            self.update_belief(new_trust, backend, out=belief)
+            new_trust /= backend.max(new_trust)
+            new_trust, belief = self.accelerate(context, new_trust, belief)
 
-            self.iterator.compare(trust, new_trust)
-            trust = new_trust
-            self.log(data, trust, belief)
+            context.compare(trust, new_trust)
+            trust, new_trust = new_trust, trust
+            yield trust, belief
 
         return trust, belief
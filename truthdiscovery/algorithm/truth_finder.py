@@ -39,43 +39,80 @@ class TruthFinder(BaseIterativeAlgorithm):
         """
         return ConvergenceIterator(DistanceMeasures.COSINE, 0.001)
 
+    def is_valid_state(self, trust, belief):
+        """
+        Trust must also be strictly less than 1 (see :meth:`get_log_trust`)
+        """
+        return super().is_valid_state(trust, belief) and np.all(trust < 1)
+
     @classmethod
-    def get_log_trust(cls, trust):
+    def get_log_trust(cls, trust, out=None):
         """
         Return the 'tau' vector as defined in the TruthFinder paper. This
         involves taking logs to convert trust in [0, 1] to [0, +inf) to prevent
         numerical underflow
 
         :param trust: numpy array of trust values
+        :param out:   numpy array to write the result to (optional)
         :return:      tau vector
         """
-        if np.any(trust == 1):
+        distrust = np.subtract(1, trust, out=out)
+        if not np.all(distrust):
             raise EarlyFinishError(
                 "Trust has become 1 for at least one source"
             )
-        return -np.log(1 - trust)
+        return np.negative(np.log(distrust, out=distrust), out=distrust)
 
-    def _run(self, data):
-        trust = np.zeros((data.num_sources,))
+    def update_belief(self, trust, backend, out=None):
+        """
+        Compute belief from trust: belief in a claim is computed from the sum
+        of the log trust of its sources, adjusted for the influence of related
+        claims and dampened
+
+        :param trust:   numpy array of trust values
+        :param backend: :any:`BaseBackend` for the dataset
+        :param out:     numpy array to write the result to (optional)
+        :return:        numpy array of belief values
+        :raises EarlyFinishError: if the trust in any source is 1
+        """
+        source_tau = self.get_log_trust(
+            trust, out=backend.workspace("source_tau", len(trust))
+        )
+        claim_tau = backend.transpose(
+            source_tau, out=backend.workspace("claim_tau", backend.num_claims)
+        )
+        # Adjust for the influence of related claims
+        log_belief = backend.implication(
+            claim_tau, out=backend.workspace("log_belief", backend.num_claims)
+        )
+        log_belief *= self.influence_param
+        np.add(claim_tau, log_belief, out=log_belief)
+        # Belief is 1 / (1 + exp(-gamma * log_belief))
+        belief = np.multiply(-self.dampening_factor, log_belief, out=out)
+        np.exp(belief, out=belief)
+        belief += 1
+        return np.divide(1, belief, out=belief)
 
-        claim_counts = data.sc @ np.ones((data.num_claims),)
-        # As in Investment, use multiply() to make sure the result is sparse
-        a_mat = data.sc.T.multiply(1 / claim_counts).T
-        b_mat = data.sc.T + self.influence_param * (data.imp.T @ data.sc.T)
+    def _run(self, data, context):
+        backend = self.get_backend(data, context)
+        # Trust in a source is the average belief in its claims
+        claim_scale = 1 / backend.claims_per_source()
 
         trust = np.full((data.num_sources,), self.initial_trust)
         belief = np.zeros((data.num_claims,))
-        self.log(data, trust, belief)
+        context.restore(trust, belief)
+        yield trust, belief
 
-        while not self.iterator.finished():
+        new_trust = np.empty((data.num_sources,))
+        while not context.iterator.finished():
             try:
-                log_belief = b_mat @ self.get_log_trust(trust)
+                self.update_belief(trust, backend, out=belief)
             except EarlyFinishError:
                 break
-            belief = 1 / (1 + np.exp(-self.dampening_factor * log_belief))
-            new_trust = a_mat @ belief
-            self.iterator.compare(new_trust, trust)
-            trust = new_trust
-            self.log(data, trust, belief)
+            backend.forward(belief, row_scale=claim_scale, out=new_trust)
+            new_trust, belief = self.accelerate(context, new_trust, belief)
+            context.compare(new_trust, trust)
+            trust, new_trust = new_trust, trust
+            yield trust, belief
 
         return trust, belief
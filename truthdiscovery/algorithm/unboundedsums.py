@@ -10,27 +10,32 @@ class UnboundedSums(BaseIterativeAlgorithm):
     Truth Discovery" (forthcoming, at the time of writing)
     """
     priors = PriorBelief.COUNT
+    uses_ranking = True
 
     def get_default_iterator(self):
         return OrdinalConvergenceIterator()
 
-    def _run(self, data):
+    def _run(self, data, context):
+        backend = self.get_backend(data, context)
         trust = np.zeros((data.num_sources,))
-        belief = self.get_prior_beliefs(data)
-        self.log(data, trust, belief)
+        belief = self.get_prior_beliefs(data, backend)
+        context.restore(trust, belief)
+        yield trust, belief
 
-        while not self.iterator.finished():
-            new_trust = data.sc @ belief
-            belief = data.sc.T @ new_trust
-            self.iterator.compare(trust, new_trust)
-            trust = new_trust
-            if np.max(trust) > 1000:
+        new_trust = np.empty((data.num_sources,))
+        while not context.iterator.finished():
+            backend.forward(belief, out=new_trust)
+            backend.transpose(new_trust, out=belief)
+            new_trust, belief = self.accelerate(context, new_trust, belief)
+            context.compare(trust, new_trust)
+            trust, new_trust = new_trust, trust
+            if backend.max(trust) > 1000:
                 trust /= 1000
-            if np.max(belief) > 1000:
+            if backend.max(belief) > 1000:
                 belief /= 1000
-            self.log(data, trust, belief)
+            yield trust, belief
 
         # convert (potentially very large) scores to ranking vectors
-        rtrust = self.iterator.get_ranking_vector(trust)
-        rbelief = self.iterator.get_ranking_vector(belief)
+        rtrust = OrdinalConvergenceIterator.get_ranking_vector(trust)
+        rbelief = OrdinalConvergenceIterator.get_ranking_vector(belief)
         return rtrust, rbelief
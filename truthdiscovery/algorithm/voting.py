@@ -19,7 +19,7 @@ class MajorityVoting(BaseAlgorithm):
         """
         super().run(data)
         start_time = time.time()
-        claim_belief = data.sc.T @ np.ones((data.num_sources),)
+        claim_belief = self.get_backend(data).sources_per_claim()
         normalised_belief = claim_belief / np.max(claim_belief)
         end_time = time.time()
         return Result(
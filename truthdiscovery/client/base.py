@@ -5,17 +5,28 @@ from bidict import bidict
 
 from truthdiscovery.algorithm import (
     AverageLog,
+    DenseBackend,
     Investment,
     MajorityVoting,
+    MemoryMappedBackend,
+    Planner,
     PooledInvestment,
     PriorBelief,
+    SolverMode,
+    SparseBackend,
     Sums,
+    ThreadedBackend,
     UnboundedSums,
     CRH,
+    CRHLoss,
     TruthFinder
 )
 from truthdiscovery.utils import (
+    AitkenAccelerator,
+    AndersonAccelerator,
+    CombinedIterator,
     ConvergenceIterator,
+    DeadlineIterator,
     DistanceMeasures,
     filter_dict,
     FixedIterator
@@ -31,7 +42,9 @@ class OutputFields(Enum):
     BELIEF_STATS = "belief_stats"
     ITERATIONS = "iterations"
     MOST_BELIEVED = "most_believed_values"
+    STOP_REASON = "stop_reason"
     TIME = "time"
+    TIMINGS = "timings"
     TRUST = "trust"
     TRUST_STATS = "trust_stats"
 
@@ -82,20 +95,44 @@ class BaseClient:
         # Map param name to a callable to convert string to correct type
         type_mapping = {
             "iterator": self.get_iterator,
-            "priors": PriorBelief
+            "priors": PriorBelief,
+            "solver": SolverMode,
+            "loss": CRHLoss,
+            "threads": int,
+            "processes": int,
+            "accelerator": self.get_accelerator,
+            "backend": self.get_backend
         }
         type_convertor = type_mapping.get(param, float)
         return (param, type_convertor(value))
 
     def get_iterator(self, it_string, max_limit=200):
         """
-        Parse an :any:`Iterator` object from a string representation
+        Parse an :any:`Iterator` object from a string representation. Several
+        iterators may be combined with '+', in which case iteration stops when
+        any of them finishes. A deadline on its own is combined with a fixed
+        iterator for ``max_limit`` iterations
+        """
+        iterators = [self.get_single_iterator(part, max_limit)
+                     for part in it_string.split("+")]
+        # Deadlines do not limit the number of iterations
+        if all(isinstance(it, DeadlineIterator) for it in iterators):
+            iterators.append(FixedIterator(limit=max_limit))
+        if len(iterators) == 1:
+            return iterators[0]
+        return CombinedIterator(*iterators)
+
+    def get_single_iterator(self, it_string, max_limit=200):
+        """
+        Parse an :any:`Iterator` object from a string representation, not
+        including combined iterators
         """
         fixed_regex = re.compile(r"fixed-(?P<limit>\d+)$")
         convergence_regex = re.compile(
             r"(?P<measure>[^-]+)-convergence-(?P<threshold>[^-]+)"
             r"(-limit-(?P<limit>\d+))?$"  # optional limit
         )
+        deadline_regex = re.compile(r"deadline-(?P<budget>[^-]+)$")
         fixed_match = fixed_regex.match(it_string)
         if fixed_match:
             limit = int(fixed_match.group("limit"))
@@ -105,6 +142,10 @@ class BaseClient:
                 )
             return FixedIterator(limit=limit)
 
+        deadline_match = deadline_regex.match(it_string)
+        if deadline_match:
+            return DeadlineIterator(float(deadline_match.group("budget")))
+
         convergence_match = convergence_regex.match(it_string)
         if convergence_match:
             measure_str = convergence_match.group("measure")
@@ -129,6 +170,49 @@ class BaseClient:
             "invalid iterator specification '{}'".format(it_string)
         )
 
+    def get_accelerator(self, acc_string):
+        """
+        Parse an :any:`Accelerator` object from a string representation
+        """
+        if acc_string == "aitken":
+            return AitkenAccelerator()
+        anderson_match = re.match(r"anderson(-(?P<depth>\d+))?$", acc_string)
+        if anderson_match:
+            depth = anderson_match.group("depth")
+            return AndersonAccelerator(
+                depth=int(depth) if depth is not None else None
+            )
+        raise ValueError(
+            "invalid accelerator specification '{}'".format(acc_string)
+        )
+
+    def get_backend(self, backend_string):
+        """
+        Parse a backend for algorithms from a string representation
+
+        :return: a callable which creates a :any:`BaseBackend` for a dataset
+        """
+        backends = {
+            "auto": Planner(),
+            "sparse": SparseBackend,
+            "dense": DenseBackend,
+            "mmap": MemoryMappedBackend
+        }
+        if backend_string in backends:
+            return backends[backend_string]
+        threaded_match = re.match(r"threaded(-(?P<threads>\d+))?$",
+                                  backend_string)
+        if threaded_match:
+            threads = threaded_match.group("threads")
+            if threads is None:
+                return ThreadedBackend
+            if int(threads) < 1:
+                raise ValueError("Number of threads must be positive")
+            return ThreadedBackend.configure(threads=int(threads))
+        raise ValueError(
+            "invalid backend specification '{}'".format(backend_string)
+        )
+
     def get_algorithm_object(self, alg_cls, param_dict):
         """
         Instantiate an algorithm object
@@ -173,6 +257,13 @@ class BaseClient:
             if field == OutputFields.ITERATIONS:
                 out[field.value] = results.iterations
 
+            if field == OutputFields.TIMINGS:
+                out[field.value] = results.timings
+
+            if field == OutputFields.STOP_REASON:
+                reason = results.stop_reason
+                out[field.value] = reason.value if reason is not None else None
+
             if field == OutputFields.TRUST:
                 out[field.value] = results.trust
 
@@ -76,7 +76,14 @@ class CommandLineClient(BaseClient):
                 the format 'fixed-<N>' for fixed N iterations, or
                 '<measure>-convergence-<threshold>[-limit-<N>]' for convergence
                 in 'measure' within 'threshold', up to an optional maximum
-                number 'limit' iterations.
+                number 'limit' iterations, or 'deadline-<seconds>' to stop
+                when a time budget is used up. Iterators can be combined with
+                '+' to stop when any of them finishes, e.g.
+                'l2-convergence-0.001+deadline-0.5'. For 'accelerator', use
+                'aitken' or 'anderson[-<depth>]'. For 'solver' and 'loss', see
+                the SolverMode and CRHLoss enumerations for valid values.
+                'threads' and 'processes' must be integers. For 'backend', use
+                'auto', 'sparse', 'dense', 'mmap' or 'threaded[-<threads>]'.
             """),
             dest="alg_params",
             metavar="PARAM",
@@ -4,7 +4,7 @@ import json
 from flask import Flask, render_template, request, jsonify
 
 from truthdiscovery.algorithm import BaseIterativeAlgorithm
-from truthdiscovery.client.base import BaseClient
+from truthdiscovery.client.base import BaseClient, OutputFields
 from truthdiscovery.exceptions import ConvergenceError, EmptyDatasetError
 from truthdiscovery.input import MatrixDataset
 from truthdiscovery.output import Result, ResultDiff
@@ -124,6 +124,8 @@ class WebClient(BaseClient):
         Optional parameters:
         * 'parameters'
         * 'previous_results'
+        * 'timings': if given, include the time spent in each phase of the
+          run in the output
 
         Responses are JSON objects of the form
         ``{"ok": True, "data": ...}``
@@ -145,6 +147,10 @@ class WebClient(BaseClient):
         except ValueError as ex:
             return jsonify(ok=False, error=str(ex)), 400
 
+        fields = [f for f in OutputFields if f != OutputFields.TIMINGS]
+        if request.args.get("timings"):
+            fields.append(OutputFields.TIMINGS)
+
         messages = []
         all_output = {}
         for alg_label in alg_labels:
@@ -169,7 +175,7 @@ class WebClient(BaseClient):
             except EmptyDatasetError as ex:
                 return jsonify(ok=False, error=str(ex)), 400
 
-            output = self.get_output_obj(results)
+            output = self.get_output_obj(results, output_fields=fields)
 
             # Construct a graph and/or animation
             output["imagery"] = {}
@@ -0,0 +1,120 @@
+"""
+Script to measure the memory allocated and the time taken per iteration by the
+iterative algorithms.
+
+Memory is measured with tracemalloc, so Python >= 3.9 is required (for
+``tracemalloc.reset_peak``). Temporary arrays created during an iteration show
+up in the peak memory use above that at the start of the iteration. Small
+Python objects created for each iteration (such as the information given to
+hooks) are also counted, so a few hundred bytes per iteration is expected even
+when no arrays are allocated.
+"""
+from collections import OrderedDict
+from functools import partial
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from truthdiscovery.input import SyntheticData
+from truthdiscovery.algorithm import (
+    AverageLog,
+    CRH,
+    Investment,
+    PooledInvestment,
+    Sums,
+    TruthFinder
+)
+from truthdiscovery.utils import FixedIterator
+
+NUM_SOURCES = 1000
+NUM_VARIABLES = 1000
+CLAIM_PROBABILITY = 0.1
+DOMAIN_SIZE = 4
+ITERATIONS = 50
+
+ALGORITHMS = OrderedDict({
+    "sums": Sums,
+    "average.log": AverageLog,
+    "investment": Investment,
+    "Pooled Investment": PooledInvestment,
+    # With the default parameters, trust reaches 1 within a few iterations
+    # for data of this size
+    "TruthFinder": partial(TruthFinder, dampening_factor=0.03),
+    "CRH": CRH
+})
+
+
+def measure_time(algorithm_cls, data, iterations):
+    """
+    :return: seconds per iteration
+    """
+    def run(num_iterations):
+        alg = algorithm_cls(iterator=FixedIterator(num_iterations))
+        start = time.perf_counter()
+        alg.run(data)
+        return time.perf_counter() - start
+
+    # Take the difference between a long and short run to exclude set up
+    # costs
+    run(iterations)
+    return (run(iterations + 1) - run(1)) / iterations
+
+
+def measure_memory(algorithm_cls, data, iterations):
+    """
+    Trace memory allocations with :mod:`tracemalloc` (which numpy reports
+    array data allocations to) during a run, using a hook to take
+    measurements between iterations.
+
+    :return: tuple (transient, retained) of the mean number of bytes per
+             iteration allocated above the memory in use at the start of the
+             iteration, and the mean growth in memory in use
+    """
+    samples = []
+
+    def hook(info):
+        samples.append(tracemalloc.get_traced_memory())
+        tracemalloc.reset_peak()
+
+    alg = algorithm_cls(iterator=FixedIterator(iterations + 1))
+    alg.add_hook(hook)
+    tracemalloc.start()
+    try:
+        alg.run(data)
+    finally:
+        tracemalloc.stop()
+    # The first iteration is skipped, since buffers may be allocated when
+    # they are first used
+    transient = [peak - prev_current for (prev_current, _), (_, peak)
+                 in zip(samples[1:], samples[2:])]
+    retained = [current - prev_current for (prev_current, _), (current, _)
+                in zip(samples[1:], samples[2:])]
+    return sum(transient) / iterations, sum(retained) / iterations
+
+
+def main():
+    print("generating dataset...", file=sys.stderr)
+    trust = np.random.RandomState(0).uniform(size=(NUM_SOURCES,))
+    synth = SyntheticData(
+        trust,
+        num_variables=NUM_VARIABLES,
+        claim_probability=CLAIM_PROBABILITY,
+        domain_size=DOMAIN_SIZE
+    )
+    data = synth.data
+    print("sources: {}, claims: {}".format(data.num_sources, data.num_claims))
+    print("{:<20}{:>15}{:>15}{:>15}".format(
+        "algorithm", "peak KiB/iter", "kept KiB/iter", "ms/iter"
+    ))
+    for name, cls in ALGORITHMS.items():
+        transient, retained = measure_memory(cls, data, ITERATIONS)
+        seconds = measure_time(cls, data, ITERATIONS)
+        print("{:<20}{:>15.1f}{:>15.1f}{:>15.3f}".format(
+            name, transient / 1024, retained / 1024, seconds * 1000
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,7 @@ the distance between old and new trust vectors at each iteration.
 These distances are then plotted, so that the convergence (or otherwise) of
 each algorithm can be compared.
 """
-from io import StringIO
 from os import path
-import sys
 
 import matplotlib.pyplot as plt
 
@@ -47,26 +45,22 @@ def main(csv_file):
 
     # map algorithm names to list of distances over time
     distances = {}
-    iterator = ConvergenceIterator(MEASURE, 0, limit=100, debug=True)
+    iterator = ConvergenceIterator(MEASURE, 0, limit=100)
     for cls in ALGORITHMS:
         name = cls.__name__
         print("running {} using {} measure".format(name, MEASURE))
         alg = cls(iterator=iterator)
-        stdout = StringIO()
-        sys.stdout = stdout
+        distances[name] = []
+
+        def record_distance(info, dists=distances[name]):
+            if info.distance is not None:
+                dists.append(info.distance)
+
+        alg.add_hook(record_distance)
         try:
             _res = alg.run(sup.data)
         except ConvergenceError:
             pass
-        finally:
-            sys.stdout = sys.__stdout__
-
-        distances[name] = []
-        for line in stdout.getvalue().split("\n"):
-            if not line:
-                continue
-            _, dist = line.split(",")
-            distances[name].append(float(dist))
 
     max_its = max(len(dists) for dists in distances.values())
     x = range(1, max_its + 1)
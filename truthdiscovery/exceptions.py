@@ -15,3 +15,9 @@ class EmptyDatasetError(Exception):
     """
     An algorithm was run on a dataset containing no claims
     """
+
+
+class RunCancelledError(Exception):
+    """
+    A run was cancelled with a :any:`CancellationToken` before it finished
+    """
@@ -6,6 +6,7 @@ import imageio.v2 as imageio
 from truthdiscovery.graphs.backends import JsonBackend, PngBackend
 from truthdiscovery.graphs.colours import ResultsGradientColourScheme
 from truthdiscovery.graphs.draw import GraphRenderer
+from truthdiscovery.output import History
 
 
 class BaseAnimator:
@@ -50,12 +51,14 @@ class BaseAnimator:
         """
         A generator of ``buffer_cls`` objects for each frame in the animation
         """
-        # Note: must collect all results so we can get total number of
-        # iterations to work out completion percentage at each step
-        all_results = tuple(algorithm.run_iter(dataset))
-        num_iterations = len(all_results) - 1
-
-        for i, results in enumerate(all_results):
+        # Note: must record all iterations so we can get total number of
+        # iterations to work out completion percentage at each step. Results
+        # are only converted to Result objects as each frame is drawn
+        history = History()
+        algorithm.run(dataset, history=history)
+        num_iterations = len(history) - 1
+
+        for i, results in enumerate(history.results()):
             self.renderer.colours = ResultsGradientColourScheme(results)
             # Draw frame to in-memory buffer
             buf = self.buffer_cls()
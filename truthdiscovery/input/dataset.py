@@ -1,7 +1,10 @@
+import hashlib
 import itertools
 
 from bidict import bidict
+import numpy as np
 import scipy.sparse
+import scipy.sparse.csgraph
 
 
 class IDMapping(bidict):
@@ -21,6 +24,33 @@ class IDMapping(bidict):
         return self[label]
 
 
+class _SparseMatrixAttribute:
+    """
+    Descriptor for a sparse matrix attribute of a :any:`Dataset`. For datasets
+    stored as dense arrays, the sparse matrix is only created (from the dense
+    array) when it is first accessed
+    """
+    def __init__(self, name, dense_name, dtype):
+        self.name = name
+        self.dense_name = dense_name
+        self.dtype = dtype
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        mat = instance.__dict__.get(self.name)
+        if mat is None:
+            dense = getattr(instance, self.dense_name)
+            if dense is None:
+                return None
+            mat = scipy.sparse.csr_matrix(dense, dtype=self.dtype)
+            instance.__dict__[self.name] = mat
+        return mat
+
+    def __set__(self, instance, mat):
+        instance.__dict__[self.name] = mat
+
+
 class Dataset:
     """
     An object to represent a dataset upon which truth discovery will be
@@ -40,14 +70,36 @@ class Dataset:
     is true, then ``var = y`` is likely to be true. A negative value means that
     if ``var = x`` is true, then ``var = y`` is likely to be false (Yin et.
     al., 2008).
+
+    Small datasets are stored as dense numpy arrays ``sc_dense``,
+    ``mut_ex_dense`` and ``imp_dense``, which avoids the overhead of sparse
+    matrices. The sparse matrices ``sc``, ``mut_ex`` and ``imp`` are still
+    available, but are only created when first accessed.
     """
     source_ids = None
     var_ids = None
     claim_ids = None
     val_hashes = None
+    claim_var_ids = None
+
+    #: The maximum number of entries in the source-claim or mutual exclusion
+    #: matrices for a dataset to be stored as dense arrays
+    dense_threshold = 65536
+    sc_dense = None
+    mut_ex_dense = None
+    imp_dense = None
+    _fingerprint = None
+    _claim_values = None
+    #: For datasets produced by :meth:`compress_sources`, a numpy array of the
+    #: number of original sources each source stands for, and None otherwise
+    source_weights = None
+
+    sc = _SparseMatrixAttribute("sc", "sc_dense", np.float64)
+    mut_ex = _SparseMatrixAttribute("mut_ex", "mut_ex_dense", np.int64)
+    imp = _SparseMatrixAttribute("imp", "imp_dense", np.float64)
 
     def __init__(self, triples, allow_multiple=False,
-                 implication_function=None):
+                 implication_function=None, cancel=None):
         """
         :param triples:        iterable of ``(source_label, var_label, value)``
                                as described above
@@ -59,6 +111,9 @@ class Dataset:
                                      should take ``(var, val1, val2)`` as
                                      arguments and return an implication value
                                      in [-1, 1], or None
+        :param cancel:         (optional) :any:`CancellationToken` which is
+                               checked while computing implication values
+        :raises RunCancelledError: if cancelled with ``cancel``
         """
         self.source_ids = IDMapping()  # Map source label to integer IDs
         self.var_ids = IDMapping()     # Variable labels to IDs
@@ -81,6 +136,9 @@ class Dataset:
         # sets of claim IDs
         mut_ex_claims = {}
 
+        # Keep track of the variable ID for each claim, in claim ID order
+        claim_vars = []
+
         for source_label, var_label, val in triples:
             s_id = self.source_ids.get_id(source_label)
             var_id = self.var_ids.get_id(var_label)
@@ -99,6 +157,8 @@ class Dataset:
 
             claim = (var_id, val_hash)
             claim_id = self.claim_ids.get_id(claim)
+            if claim_id == len(claim_vars):
+                claim_vars.append(var_id)
             sc_rows.append(s_id)
             sc_cols.append(claim_id)
 
@@ -110,10 +170,71 @@ class Dataset:
         self.num_variables = len(self.var_ids)
         self.num_claims = len(self.claim_ids)
 
+        # Array mapping claim IDs to variable IDs, for per-variable operations
+        # on claim vectors (see :meth:`variable_sums`)
+        self.claim_var_ids = np.array(claim_vars, dtype=np.intp)
+
+        largest = max(self.num_sources, self.num_claims) * self.num_claims
+        if largest <= self.dense_threshold:
+            self._create_dense_matrices(sc_rows, sc_cols,
+                                        implication_function, cancel)
+        else:
+            self._create_sparse_matrices(sc_rows, sc_cols, mut_ex_claims,
+                                         implication_function, cancel)
+
+    def _get_implication(self, implication_function, j1, j2):
+        """
+        :return: the implication value from claim ``j1`` to claim ``j2``, or
+                 None
+        :raises ValueError: if the implication value is not in [-1, 1]
+        """
+        var_id, val1_hash = self.claim_ids.inverse[j1]
+        _, val2_hash = self.claim_ids.inverse[j2]
+
+        var = self.var_ids.inverse[var_id]
+        val1 = self.val_hashes.inverse[val1_hash]
+        val2 = self.val_hashes.inverse[val2_hash]
+        imp_value = implication_function(var, val1, val2)
+
+        if imp_value is not None and (imp_value < -1 or imp_value > 1):
+            raise ValueError("Implication values must be in [-1, 1]")
+        return imp_value
+
+    def _create_dense_matrices(self, sc_rows, sc_cols, implication_function,
+                               cancel=None):
+        """
+        Create the source-claim, mutual exclusion and implication matrices as
+        dense arrays
+        """
+        self.sc_dense = np.zeros((self.num_sources, self.num_claims))
+        self.sc_dense[sc_rows, sc_cols] = 1
+        self.mut_ex_dense = np.equal.outer(
+            self.claim_var_ids, self.claim_var_ids
+        ).astype(np.float64)
+        self.imp_dense = np.zeros((self.num_claims, self.num_claims))
+        if implication_function is not None:
+            for j1, j2 in zip(*np.nonzero(self.mut_ex_dense)):
+                if j1 == j2:
+                    continue
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                imp_value = self._get_implication(implication_function, j1,
+                                                  j2)
+                if imp_value is not None:
+                    self.imp_dense[j1, j2] = imp_value
+
+    def _create_sparse_matrices(self, sc_rows, sc_cols, mut_ex_claims,
+                                implication_function, cancel=None):
+        """
+        Create the source-claim, mutual exclusion and implication matrices as
+        sparse matrices
+        """
         # Create source-claim matrix: entry (i, j) is 1 if source i makes claim
         # j, and 0 otherwise
+        # Entries are stored as floats, so that products with float vectors do
+        # not need to convert the matrix each time
         self.sc = scipy.sparse.csr_matrix(
-            ([1] * len(sc_rows), (sc_rows, sc_cols)),
+            (np.ones((len(sc_rows),)), (sc_rows, sc_cols)),
             shape=(self.num_sources, self.num_claims)
         )
 
@@ -140,21 +261,13 @@ class Dataset:
             for j1, j2 in zip(*self.mut_ex.nonzero()):
                 if j1 == j2:
                     continue
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
                 # Note that claims j1 and j2 are for the same variable, since
                 # mut ex is 1 at this point
-                var_id, val1_hash = self.claim_ids.inverse[j1]
-                _, val2_hash = self.claim_ids.inverse[j2]
-
-                var = self.var_ids.inverse[var_id]
-                val1 = self.val_hashes.inverse[val1_hash]
-                val2 = self.val_hashes.inverse[val2_hash]
-                imp_value = implication_function(var, val1, val2)
-
+                imp_value = self._get_implication(implication_function, j1,
+                                                  j2)
                 if imp_value is not None:
-                    if imp_value < -1 or imp_value > 1:
-                        raise ValueError(
-                            "Implication values must be in [-1, 1]"
-                        )
                     imp_entries.append(imp_value)
                     imp_rows.append(j1)
                     imp_cols.append(j2)
@@ -169,17 +282,102 @@ class Dataset:
                 (self.num_claims, self.num_claims)
             )
 
-    def get_belief_dict(self, claim_beliefs):
+    def variable_sums(self, claim_vec, out=None):
+        """
+        Sum the entries of a claim vector over the claims for each variable.
+        This is equivalent to ``mut_ex @ claim_vec`` but does not require the
+        mutual exclusion matrix, whose size is quadratic in the number of
+        claims per variable.
+
+        :param claim_vec: numpy array of values for claims, ordered by claim ID
+        :param out:       numpy array to write the result to (optional)
+        :return: a numpy array in which the entry for each claim is the sum of
+                 ``claim_vec`` over all claims for the same variable
+        """
+        totals = np.bincount(self.claim_var_ids, weights=claim_vec,
+                             minlength=self.num_variables)
+        # Variable IDs are always in range; clipping (rather than the default
+        # of raising an error) allows numpy to write to ``out`` without an
+        # intermediate copy
+        return np.take(totals, self.claim_var_ids, out=out, mode="clip")
+
+    def fingerprint(self):
+        """
+        Compute a digest of the structure and contents of the dataset, for
+        checking that a checkpoint was created from the same data. Datasets
+        have the same fingerprint if they have the same sources, variables
+        and claims with the same IDs, and the same implication values.
+
+        :return: the fingerprint as a hexadecimal string
+        """
+        if self._fingerprint is not None:
+            return self._fingerprint
+        digest = hashlib.sha256()
+        digest.update(repr((self.num_sources, self.num_variables,
+                            self.num_claims)).encode())
+        for mat in (self.sc, self.imp):
+            mat = scipy.sparse.csr_matrix(mat)
+            mat.sort_indices()
+            for arr in (mat.indptr, mat.indices, mat.data):
+                digest.update(np.ascontiguousarray(arr, dtype=np.float64))
+        digest.update(np.ascontiguousarray(self.claim_var_ids,
+                                           dtype=np.int64))
+        labels = (
+            [self.source_ids.inverse[i] for i in range(self.num_sources)],
+            [self.var_ids.inverse[i] for i in range(self.num_variables)],
+            [self.val_hashes.inverse[self.claim_ids.inverse[i][1]]
+             for i in range(self.num_claims)]
+        )
+        digest.update(repr(labels).encode())
+        self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def get_claim_values(self):
+        """
+        :return: a read-only numpy array of the (numeric) values of claims as
+                 floats, ordered by claim ID
+        :raises ValueError: if any claimed value cannot be converted to a
+                            float
+        """
+        if self._claim_values is not None:
+            return self._claim_values
+        val_hashes = np.fromiter(
+            (self.claim_ids.inverse[j][1] for j in range(self.num_claims)),
+            dtype=np.intp, count=self.num_claims
+        )
+        # Convert each distinct value once, rather than once per claim
+        distinct = np.unique(val_hashes)
+        converted = np.empty((len(self.val_hashes),))
+        for val_hash in distinct:
+            val = self.val_hashes.inverse[val_hash]
+            try:
+                converted[val_hash] = float(val)
+            except (TypeError, ValueError):
+                raise ValueError(
+                    "Claimed value '{}' is not numeric".format(val)
+                )
+        values = converted[val_hashes]
+        values.flags.writeable = False
+        self._claim_values = values
+        return values
+
+    def get_belief_dict(self, claim_beliefs, claim_ids=None):
         """
         Convert belief in claims to belief in (var, val) pairs.
 
-        :param belief: numpy array of belief values for claims, ordered by
-                       claim ID
-        :return:       a dict of belief values for variables taking different
-                       values, in the format required for :any:`Result`
+        :param belief:    numpy array of belief values for claims, ordered by
+                          claim ID
+        :param claim_ids: sequence of the claim IDs that the entries of
+                          ``claim_beliefs`` correspond to, if not all claims
+                          (optional)
+        :return:          a dict of belief values for variables taking
+                          different values, in the format required for
+                          :any:`Result`
         """
+        if claim_ids is None:
+            claim_ids = range(len(claim_beliefs))
         var_beliefs = {}
-        for claim_id, belief_score in enumerate(claim_beliefs):
+        for claim_id, belief_score in zip(claim_ids, claim_beliefs):
             var_id, val_hash = self.claim_ids.inverse[claim_id]
             var_label = self.var_ids.inverse[var_id]
             val = self.val_hashes.inverse[val_hash]
@@ -188,42 +386,147 @@ class Dataset:
             var_beliefs[var_label][val] = belief_score
         return var_beliefs
 
-    def get_source_trust_dict(self, trust):
+    def get_source_trust_dict(self, trust, source_ids=None):
         """
-        :param trust: numpy array of source trust values, ordered by source ID
-        :return:      a dict of source trusts in the format required for
-                      :any:`Result`
+        :param trust:      numpy array of source trust values, ordered by
+                           source ID
+        :param source_ids: sequence of the source IDs that the entries of
+                           ``trust`` correspond to, if not all sources
+                           (optional)
+        :return:           a dict of source trusts in the format required for
+                           :any:`Result`
         """
+        if source_ids is None:
+            source_ids = range(len(trust))
         return {
             self.source_ids.inverse[i]: trust_val
-            for i, trust_val in enumerate(trust)
+            for i, trust_val in zip(source_ids, trust)
         }
 
-    def num_connected_components(self):
+    def get_connected_components(self):
         """
-        :return: the number of connected components in the graph representation
-                 of the dataset; that is, where sources, variables and claims
-                 are nodes, and edges connect sources to their claims and
-                 claims to their associated variables
+        Partition sources into the connected components of the graph
+        representation of the dataset; that is, where sources, variables and
+        claims are nodes, and edges connect sources to their claims and claims
+        to their associated variables
+
+        :return: a list of numpy arrays of source IDs, one for each component
         """
         # In this implementation claims must be connected to at least one
         # source, and variables to at least one claim (and in turn to a
         # source), so each connected components contains at least one source.
-        # Therefore we may consider which sources are connected to each other,
-        # and count the number of partitions.
-        #
-        # Also note that connected sources are always connected via variables,
-        # so we can iterate over sources and keep track of which variables have
-        # been seen to determine whether sources are connected
-        seen_vars = set([])
-        comps = 0
-        for row in self.sc:
-            # Work out set of IDs for variables this source claims on
-            var_ids = {self.claim_ids.inverse[j][0] for j in row.nonzero()[1]}
-            # If var_ids does not intersect with the variables seen so far,
-            # there is no path in the graph from this sources to a source we
-            # have already considered, so we are in a new component
-            if not seen_vars.intersection(var_ids):
-                comps += 1
-            seen_vars.update(var_ids)
-        return comps
+        # Sources are always connected via variables, so it is enough to
+        # consider the bipartite graph of sources and variables
+        if self.num_sources == 0:
+            return []
+        claim_var = scipy.sparse.csr_matrix(
+            (np.ones((self.num_claims,)),
+             (np.arange(self.num_claims), self.claim_var_ids)),
+            shape=(self.num_claims, self.num_variables)
+        )
+        source_var = self.sc @ claim_var
+        graph = scipy.sparse.bmat([[None, source_var], [source_var.T, None]])
+        _, labels = scipy.sparse.csgraph.connected_components(
+            graph, directed=False
+        )
+        source_labels = labels[:self.num_sources]
+        _, comp_ids = np.unique(source_labels, return_inverse=True)
+        order = np.argsort(comp_ids, kind="stable")
+        boundaries = np.cumsum(np.bincount(comp_ids))[:-1]
+        return np.split(order, boundaries)
+
+    def num_connected_components(self):
+        """
+        :return: the number of connected components in the graph representation
+                 of the dataset (see :meth:`get_connected_components`)
+        """
+        return len(self.get_connected_components())
+
+    def get_sub_dataset(self, source_ids):
+        """
+        Create a dataset consisting of the given sources, their claims, and the
+        variables those claims relate to. Claims made by other sources for
+        these variables are included, so the sources should form a union of
+        connected components for the result to be meaningful.
+
+        :param source_ids: iterable of source IDs to include
+        :return: a :any:`Dataset` object
+        """
+        source_ids = np.sort(np.asarray(source_ids, dtype=np.intp))
+        if self.sc_dense is not None:
+            claim_ids = np.flatnonzero(self.sc_dense[source_ids].any(axis=0))
+        else:
+            claim_ids = np.unique(self.sc[source_ids].indices)
+        old_var_ids, claim_var_ids = np.unique(self.claim_var_ids[claim_ids],
+                                               return_inverse=True)
+
+        sub = Dataset.__new__(Dataset)
+        sub.source_ids = IDMapping(
+            (self.source_ids.inverse[s_id], i)
+            for i, s_id in enumerate(source_ids)
+        )
+        sub.var_ids = IDMapping(
+            (self.var_ids.inverse[var_id], i)
+            for i, var_id in enumerate(old_var_ids)
+        )
+        sub.val_hashes = IDMapping()
+        sub.claim_ids = IDMapping()
+        for new_var_id, claim_id in zip(claim_var_ids, claim_ids):
+            _, val_hash = self.claim_ids.inverse[claim_id]
+            val = self.val_hashes.inverse[val_hash]
+            claim = (int(new_var_id), sub.val_hashes.get_id(val))
+            sub.claim_ids[claim] = len(sub.claim_ids)
+
+        sub.num_sources = len(source_ids)
+        sub.num_variables = len(old_var_ids)
+        sub.num_claims = len(claim_ids)
+        sub.claim_var_ids = claim_var_ids.astype(np.intp)
+        if self.sc_dense is not None:
+            sub.sc_dense = self.sc_dense[np.ix_(source_ids, claim_ids)]
+            sub.mut_ex_dense = self.mut_ex_dense[np.ix_(claim_ids, claim_ids)]
+            sub.imp_dense = self.imp_dense[np.ix_(claim_ids, claim_ids)]
+        else:
+            sub.sc = self.sc[source_ids][:, claim_ids]
+            sub.mut_ex = self.mut_ex[claim_ids][:, claim_ids]
+            sub.imp = self.imp[claim_ids][:, claim_ids]
+        return sub
+
+    def compress_sources(self):
+        """
+        Merge sources which make exactly the same claims (i.e. have identical
+        rows in the source-claim matrix), such as mirrors of the same site.
+        Sources like this always receive identical trust, so algorithms can be
+        run on the smaller dataset with each remaining source weighted by the
+        number of sources it stands for (see :any:`BaseBackend`).
+
+        :return: a tuple ``(compressed, source_map)``. ``compressed`` is a
+                 :any:`Dataset` containing the first source from each group of
+                 identical sources, with :attr:`source_weights` set to the
+                 size of each group, and all claims and variables with their
+                 original IDs. ``source_map`` is a numpy array giving the ID in
+                 ``compressed`` of the group each source belongs to. If there
+                 are no duplicate sources, the dataset itself is returned
+        """
+        if self.sc_dense is not None:
+            keys = (row.tobytes() for row in self.sc_dense)
+        else:
+            sc = self.sc
+            if not sc.has_sorted_indices:
+                sc = sc.sorted_indices()
+            keys = (
+                (sc.indices[start:end].tobytes(), sc.data[start:end].tobytes())
+                for start, end in zip(sc.indptr[:-1], sc.indptr[1:])
+            )
+        # Groups are numbered in order of their first source, so that the
+        # representatives keep the order of the original sources
+        groups = {}
+        source_map = np.fromiter(
+            (groups.setdefault(key, len(groups)) for key in keys),
+            dtype=np.intp, count=self.num_sources
+        )
+        if len(groups) == self.num_sources:
+            return self, source_map
+        _, first = np.unique(source_map, return_index=True)
+        compressed = self.get_sub_dataset(first)
+        compressed.source_weights = np.bincount(source_map).astype(np.float64)
+        return compressed, source_map
@@ -63,10 +63,10 @@ class MatrixDataset(Dataset):
                 matrix. Source and variable labels are defined as their row and
                 column numbers respectively.
         """
-        for source, row in enumerate(self.sv):
-            for var, val in enumerate(row):
-                if not ma.is_masked(val):
-                    yield (source, var, val)
+        values = ma.getdata(self.sv)
+        sources, variables = np.nonzero(~ma.getmaskarray(self.sv))
+        for source, var in zip(sources.tolist(), variables.tolist()):
+            yield (source, var, values[source, var])
 
     @classmethod
     def from_csv(cls, fileobj):
@@ -1,2 +1,4 @@
 from truthdiscovery.output.result import Result
 from truthdiscovery.output.diff import ResultDiff
+from truthdiscovery.output.history import History
+from truthdiscovery.output.trust_model import TrustModel
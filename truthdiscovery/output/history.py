@@ -0,0 +1,270 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from truthdiscovery.output.result import Result
+
+
+class History:
+    """
+    Compact record of trust and belief over the iterations of a run. Scores are
+    written to preallocated 2D numpy arrays, with one row per recorded
+    iteration, and are only converted to labelled :any:`Result` objects when
+    requested.
+
+    A history is recorded by passing it to :meth:`BaseIterativeAlgorithm.run`:
+    ::
+
+        history = History(every=10, belief=False)
+        alg.run(mydata, history=history)
+        print(history.iterations, history.trust)
+        for res in history.results():
+            print(res.trust)
+    """
+    #: Number of rows allocated before the first iteration is recorded
+    initial_capacity = 32
+
+    def __init__(self, every=1, trust=True, belief=True, top=None,
+                 directory=None):
+        """
+        :param every:     record every ``every``-th iteration. The initial and
+                          final states are always recorded
+        :param trust:     if False, do not record trust
+        :param belief:    if False, do not record belief
+        :param top:       if not None, only record the ``top`` highest trust
+                          and belief scores (and the IDs of the corresponding
+                          sources and claims) at each iteration
+        :param directory: if not None, store arrays in memory-mapped ``.npy``
+                          files in this directory, for long runs. Use True for
+                          a temporary directory, which is deleted by
+                          :meth:`close`
+        :raises ValueError: if ``every`` or ``top`` is not positive
+        """
+        if every < 1:
+            raise ValueError("'every' must be positive")
+        if top is not None and top < 1:
+            raise ValueError("'top' must be positive")
+        self.every = every
+        self.record_trust = trust
+        self.record_belief = belief
+        self.top = top
+        self.directory = directory
+        self._temp_dir = None
+        self.data = None
+        self._arrays = {}
+        self._length = 0
+
+    def start(self, data):
+        """
+        Discard any previous record and prepare to record a run
+
+        :param data: :any:`Dataset` object the run is on
+        """
+        self.close()
+        self.data = data
+        self._length = 0
+        widths = {}
+        if self.record_trust:
+            widths["trust"] = self._get_width(data.num_sources)
+        if self.record_belief:
+            widths["belief"] = self._get_width(data.num_claims)
+        specs = {"iterations": ((), np.int64), "times": ((), np.float64)}
+        for name, width in widths.items():
+            specs[name] = ((width,), np.float64)
+            if self.top is not None:
+                specs[name + "_ids"] = ((width,), np.int64)
+
+        if self.directory is True:
+            self._temp_dir = tempfile.mkdtemp()
+        elif self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+        self._arrays = {
+            name: self._allocate(name, (self.initial_capacity,) + shape,
+                                 dtype)
+            for name, (shape, dtype) in specs.items()
+        }
+
+    def _get_width(self, size):
+        """
+        :return: the number of entries recorded per iteration for vectors of
+                 length ``size``
+        """
+        if self.top is None:
+            return size
+        return min(self.top, size)
+
+    def _get_path(self, name):
+        directory = self._temp_dir or self.directory
+        if directory is None:
+            return None
+        return os.path.join(directory, "{}.npy".format(name))
+
+    def _allocate(self, name, shape, dtype):
+        path = self._get_path(name)
+        if path is None:
+            return np.empty(shape, dtype=dtype)
+        return open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+    def _grow(self):
+        """
+        Double the number of rows allocated for each array
+        """
+        for name, old in self._arrays.items():
+            shape = (2 * old.shape[0],) + old.shape[1:]
+            path = self._get_path(name)
+            if path is None:
+                new = np.empty(shape, dtype=old.dtype)
+                new[:self._length] = old[:self._length]
+            else:
+                # Write the larger array to a new file and replace the old
+                # one, since .npy files cannot be resized in place
+                new_path = path + ".tmp"
+                new = open_memmap(new_path, mode="w+", dtype=old.dtype,
+                                  shape=shape)
+                new[:self._length] = old[:self._length]
+                del old
+                os.replace(new_path, path)
+            self._arrays[name] = new
+
+    def _store(self, name, row, vec):
+        if self.top is None:
+            self._arrays[name][row] = vec
+            return
+        width = self._arrays[name].shape[1]
+        ids = np.argpartition(-vec, width - 1)[:width]
+        ids = ids[np.argsort(-vec[ids], kind="stable")]
+        self._arrays[name + "_ids"][row] = ids
+        self._arrays[name][row] = vec[ids]
+
+    def record(self, iteration, time_taken, trust, belief, final=False):
+        """
+        Record the state of a run, if required
+
+        :param iteration:  the number of iterations completed
+        :param time_taken: seconds elapsed since the run started
+        :param trust:      numpy array of source trust values
+        :param belief:     numpy array of claim belief values
+        :param final:      True if this is the final state of the run
+        """
+        last = self._length - 1
+        if last >= 0 and self._arrays["iterations"][last] == iteration:
+            # The last iteration has already been recorded. The final state
+            # may still differ from it (e.g. if the algorithm adjusts scores
+            # after iterating), so it replaces the recorded row
+            if not final:
+                return
+            row = last
+        elif iteration % self.every != 0 and not final:
+            return
+        else:
+            if self._length == self._arrays["iterations"].shape[0]:
+                self._grow()
+            row = self._length
+            self._length += 1
+        self._arrays["iterations"][row] = iteration
+        self._arrays["times"][row] = time_taken
+        if self.record_trust:
+            self._store("trust", row, trust)
+        if self.record_belief:
+            self._store("belief", row, belief)
+
+    def _get_array(self, name):
+        if name not in self._arrays:
+            return None
+        return self._arrays[name][:self._length]
+
+    @property
+    def iterations(self):
+        """
+        numpy array of the iteration number of each recorded state
+        """
+        return self._get_array("iterations")
+
+    @property
+    def times(self):
+        """
+        numpy array of the time in seconds since the start of the run at each
+        recorded state
+        """
+        return self._get_array("times")
+
+    @property
+    def trust(self):
+        """
+        2D numpy array in which row ``i`` holds the trust scores for the
+        ``i``-th recorded state (ordered by source ID, or from highest to
+        lowest if ``top`` is set), or None if trust is not recorded
+        """
+        return self._get_array("trust")
+
+    @property
+    def belief(self):
+        """
+        2D numpy array of belief scores for each recorded state, as for
+        :attr:`trust`
+        """
+        return self._get_array("belief")
+
+    @property
+    def trust_ids(self):
+        """
+        2D numpy array of the source IDs corresponding to the entries of
+        :attr:`trust` if ``top`` is set, or None otherwise
+        """
+        return self._get_array("trust_ids")
+
+    @property
+    def belief_ids(self):
+        """
+        2D numpy array of the claim IDs corresponding to the entries of
+        :attr:`belief` if ``top`` is set, or None otherwise
+        """
+        return self._get_array("belief_ids")
+
+    def __len__(self):
+        return self._length
+
+    def get_result(self, index):
+        """
+        :param index: index of a recorded state
+        :return:      a :any:`Result` object for the state. Trust or belief is
+                      empty if not recorded, and only contains the highest
+                      scores if ``top`` is set
+        """
+        if not -self._length <= index < self._length:
+            raise IndexError("History index out of range")
+        trust = {}
+        belief = {}
+        if self.record_trust:
+            ids = None if self.top is None else self.trust_ids[index]
+            trust = self.data.get_source_trust_dict(self.trust[index], ids)
+        if self.record_belief:
+            ids = None if self.top is None else self.belief_ids[index]
+            belief = self.data.get_belief_dict(self.belief[index], ids)
+        return Result(
+            trust=trust,
+            belief=belief,
+            time_taken=float(self.times[index]),
+            iterations=int(self.iterations[index])
+        )
+
+    def results(self):
+        """
+        :return: a generator of :any:`Result` objects for each recorded state
+        """
+        for index in range(self._length):
+            yield self.get_result(index)
+
+    def close(self):
+        """
+        Release the arrays, and delete the temporary directory if one was
+        used. Recorded states are no longer available after closing
+        """
+        self._arrays = {}
+        self._length = 0
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
@@ -9,7 +9,8 @@ class Result:
     """
     Object to hold the results of truth discovery.
     """
-    def __init__(self, trust, belief, time_taken, iterations=None):
+    def __init__(self, trust, belief, time_taken, iterations=None,
+                 metadata=None, timings=None, stop_reason=None):
         """
         :param trust:  a mapping of the form ``{source_label: trust_val, ..}``
                        containing trust values for sources
@@ -19,11 +20,28 @@ class Result:
         :param time_taken: seconds taken to produce these results
         :param iterations: number of iterations the algorithm ran for, or None
                            if not applicable
+        :param metadata:   dict of information about how the results were
+                           produced, e.g. the execution backend used
+                           (optional)
+        :param timings:    dict mapping phases of the run to the seconds spent
+                           in them, measured with a monotonic clock
+                           (optional). For iterative algorithms the phases
+                           are ``setup`` (creating the backend and initial
+                           state), ``iterations`` (computing updates),
+                           ``convergence`` (checking convergence),
+                           ``materialise`` (converting scores to labelled
+                           dicts) and ``total``
+        :param stop_reason: value from the :any:`StopReason` enumeration
+                            giving why iteration stopped, e.g. convergence or
+                            a deadline, or None if not applicable
         """
         self.trust = trust
         self.belief = belief
         self.time_taken = time_taken
         self.iterations = iterations
+        self.metadata = metadata or {}
+        self.timings = timings or {}
+        self.stop_reason = stop_reason
 
     def get_most_believed_values(self, var):
         """
@@ -63,7 +81,9 @@ class Result:
                 new_scores.append(copy.deepcopy(full_scores))
         new_trust, new_belief = new_scores
 
-        return Result(new_trust, new_belief, self.time_taken, self.iterations)
+        return Result(new_trust, new_belief, self.time_taken, self.iterations,
+                      copy.deepcopy(self.metadata), dict(self.timings),
+                      self.stop_reason)
 
     def _get_stats(self, scores_dict):
         """
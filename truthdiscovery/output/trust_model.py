@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+
+
+class TrustModel:
+    """
+    Source trust scores learned by a run of an algorithm, together with the
+    parameters of the algorithm. A trust model is used to score claims in new
+    data without iterating (see :meth:`BaseIterativeAlgorithm.infer`): ::
+
+        model = alg.get_trust_model(alg.run(yesterdays_data))
+        model.save("model.json")
+        ...
+        results = alg.infer(TrustModel.load("model.json"), new_data)
+
+    Trust models are stored as JSON, so source labels must be strings or
+    numbers for a model to be saved.
+    """
+    #: Version of the file format
+    VERSION = 1
+
+    def __init__(self, algorithm, params, trust):
+        """
+        :param algorithm: name of the algorithm class
+        :param params:    dict of algorithm parameters, as returned by
+                          ``get_result_params``
+        :param trust:     a mapping of the form
+                          ``{source_label: trust_val, ...}``
+        """
+        self.algorithm = algorithm
+        self.params = params
+        self.trust = trust
+
+    def get_trust_vector(self, data, unknown_trust=None):
+        """
+        :param data:          :any:`Dataset` object
+        :param unknown_trust: trust value to use for sources in ``data`` which
+                              do not appear in the model (optional). The mean
+                              trust of sources in the model is used by default
+        :return:              numpy array of trust values for the sources in
+                              ``data``, ordered by source ID
+        """
+        if unknown_trust is None:
+            unknown_trust = np.mean(list(self.trust.values()))
+        labels = data.source_ids.inverse
+        return np.fromiter(
+            (self.trust.get(labels[i], unknown_trust)
+             for i in range(data.num_sources)),
+            dtype=np.float64, count=data.num_sources
+        )
+
+    def save(self, path):
+        """
+        Write the model to a JSON file
+
+        :param path: path of the file to write
+        """
+        obj = {
+            "version": self.VERSION,
+            "algorithm": self.algorithm,
+            "params": self.params,
+            # Store labels and trust values as separate lists, since JSON
+            # object keys may only be strings
+            "sources": list(self.trust.keys()),
+            "trust": [float(val) for val in self.trust.values()],
+        }
+        with open(path, "w") as fileobj:
+            json.dump(obj, fileobj)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a model written by :meth:`save`
+
+        :param path: path of the file to read
+        :return:     a :any:`TrustModel` object
+        :raises ValueError: if the file is not a trust model in a supported
+                            format
+        """
+        with open(path) as fileobj:
+            obj = json.load(fileobj)
+        if not isinstance(obj, dict) or obj.get("version") != cls.VERSION:
+            raise ValueError("File is not a supported trust model")
+        return cls(obj["algorithm"], obj["params"],
+                   dict(zip(obj["sources"], obj["trust"])))
@@ -1,26 +1,79 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import json
 import math
+import os
 from os import path
+import socket
+import struct
+import threading
 
 import numpy as np
+import numpy.ma as ma
 import pytest
+import scipy.sparse
 
 from truthdiscovery.algorithm import (
     AverageLog,
+    BaseBackend,
     BaseIterativeAlgorithm,
+    ComponentParallel,
+    CostModel,
+    CRH,
+    CRHLoss,
+    DenseBackend,
     Investment,
     MajorityVoting,
+    MemoryMappedBackend,
+    Planner,
     PooledInvestment,
     PriorBelief,
+    SolverMode,
+    SparseBackend,
     Sums,
-    TruthFinder
+    ThreadedBackend,
+    TruthFinder,
+    UnboundedSums
+)
+from truthdiscovery.algorithm.eigen import leading_eigenvector
+from truthdiscovery.algorithm import planner as planner_module
+from truthdiscovery.algorithm.planner import DatasetProfile
+from truthdiscovery.exceptions import (
+    ConvergenceError,
+    EmptyDatasetError,
+    RunCancelledError
 )
-from truthdiscovery.exceptions import EmptyDatasetError
 from truthdiscovery.input import Dataset, MatrixDataset
+from truthdiscovery.output import History, Result, TrustModel
+from truthdiscovery.utils import spmv
+from truthdiscovery.utils.distributed import (
+    authenticate,
+    AuthenticationError,
+    DistributedEngine,
+    get_secret,
+    LocalCluster,
+    MULTIPLY,
+    recv_message,
+    RowBlocks,
+    SECRET_ENV,
+    send_message,
+    SHUTDOWN
+)
+from truthdiscovery.utils.out_of_core import DiskCSRMatrix, OutOfCoreEngine
+from truthdiscovery.utils.shared import SharedMemoryEngine
 from truthdiscovery.utils import (
+    AitkenAccelerator,
+    AndersonAccelerator,
+    CancellationToken,
+    Checkpoint,
+    Checkpointer,
+    CombinedIterator,
     ConvergenceIterator,
+    DeadlineIterator,
     DistanceMeasures,
-    FixedIterator
+    FixedIterator,
+    OrdinalConvergenceIterator,
+    StopReason
 )
 
 
@@ -62,11 +115,13 @@ class TestBase(BaseTest):
     def test_get_parameter_names(self):
         assert MajorityVoting.get_parameter_names() == set([])
         assert PooledInvestment.get_parameter_names() == {
-            "priors", "iterator", "g"
+            "priors", "iterator", "accelerator", "threads", "processes",
+            "workers", "out_of_core", "backend", "compress_duplicates", "g"
         }
         assert TruthFinder.get_parameter_names() == {
-            "priors", "iterator", "influence_param", "dampening_factor",
-            "initial_trust"
+            "priors", "iterator", "accelerator", "threads", "processes",
+            "workers", "out_of_core", "backend", "compress_duplicates",
+            "influence_param", "dampening_factor", "initial_trust"
         }
 
 
@@ -152,6 +207,76 @@ class TestSums(BaseTest):
         assert set(results.belief["z"].keys()) == {"seven"}
         assert np.isclose(results.belief["z"]["seven"], 0.87938524)
 
+    def test_solver_modes(self, data):
+        """
+        Check that the eigensolver gives the same results as power iteration,
+        and that auto mode uses it only when iterating until convergence
+        """
+        def run(solver, iterator):
+            return Sums(iterator=iterator, solver=solver).run(data)
+
+        conv_it = ConvergenceIterator(DistanceMeasures.L1, 1e-12)
+        power = run(SolverMode.POWER, conv_it)
+        eigen = run(SolverMode.EIGEN, conv_it)
+        auto = run(SolverMode.AUTO, conv_it)
+        for res in (eigen, auto):
+            for source, trust_val in power.trust.items():
+                assert np.isclose(res.trust[source], trust_val)
+            for var, beliefs in power.belief.items():
+                for val, belief_val in beliefs.items():
+                    assert np.isclose(res.belief[var][val], belief_val)
+        assert max(eigen.trust.values()) == 1
+        assert max(max(b.values()) for b in eigen.belief.values()) == 1
+
+        # Auto mode with a fixed iterator should do exactly the requested
+        # number of iterations
+        fixed = run(SolverMode.AUTO, FixedIterator(3))
+        assert fixed.iterations == 3
+        first, second, third, fourth = Sums(
+            iterator=FixedIterator(3), solver=SolverMode.AUTO
+        ).run_iter(data)
+        assert fourth.trust == fixed.trust
+
+    def test_default_solver(self):
+        """
+        Power iteration should be used by default. On a graph with two
+        identical disjoint components the leading eigenvector is not unique,
+        but power iteration from uniform priors treats both alike
+        """
+        data = Dataset([
+            ("s1", "x", 1), ("s2", "x", 1), ("s2", "y", 2),
+            ("t1", "z", 1), ("t2", "z", 1), ("t2", "w", 2),
+        ])
+        conv_it = ConvergenceIterator(DistanceMeasures.L2, 1e-8)
+        for cls in (AverageLog, Sums):
+            assert cls().solver == SolverMode.POWER
+            res = cls(iterator=conv_it).run(data)
+            assert res.trust["s1"] == res.trust["t1"]
+            assert res.trust["s2"] == res.trust["t2"]
+            assert res.belief["x"] == res.belief["z"]
+
+            # Auto mode falls back to power iteration on disconnected data
+            auto = cls(iterator=conv_it, solver=SolverMode.AUTO).run(data)
+            assert auto.trust == res.trust
+            assert auto.iterations == res.iterations
+
+    def test_eigensolver_limit(self, data):
+        """
+        The iteration limit should apply to the number of operator products
+        evaluated by the eigensolver
+        """
+        conv_it = ConvergenceIterator(DistanceMeasures.L2, 1e-15, limit=2)
+        with pytest.raises(ConvergenceError):
+            Sums(iterator=conv_it, solver=SolverMode.EIGEN).run(data)
+        conv_it = ConvergenceIterator(DistanceMeasures.L2, 1e-8, limit=100)
+        res = Sums(iterator=conv_it, solver=SolverMode.EIGEN).run(data)
+        assert res.iterations <= 100
+        assert res.stop_reason == StopReason.CONVERGED
+
+    def test_invalid_solver(self, data):
+        with pytest.raises(ValueError):
+            Sums(solver="eigen").run(data)
+
 
 class TestAverageLog(BaseTest):
     def test_basic(self, data):
@@ -192,6 +317,35 @@ class TestAverageLog(BaseTest):
         assert np.isclose(results.belief["y"]["eight"], b[2])
         assert np.isclose(results.belief["z"]["seven"], b[3])
 
+    def test_eigensolver(self):
+        data = MatrixDataset(np.array([
+            [1, 2, 3, 2, 1, 4],
+            [3, 2, 1, 2, 1, 4],
+            [2, 2, 3, 1, 1, 3],
+            [1, 1, 3, 2, 4, 4],
+            [3, 2, 3, 1, 1, 1]
+        ]))
+        conv_it = ConvergenceIterator(DistanceMeasures.L1, 1e-12)
+        power = AverageLog(iterator=conv_it, solver=SolverMode.POWER).run(data)
+        eigen = AverageLog(iterator=conv_it, solver=SolverMode.EIGEN).run(data)
+        for source, trust_val in power.trust.items():
+            assert np.isclose(eigen.trust[source], trust_val)
+        for var, beliefs in power.belief.items():
+            for val, belief_val in beliefs.items():
+                assert np.isclose(eigen.belief[var][val], belief_val)
+
+    def test_eigensolver_did_not_converge(self):
+        # Use an operator with closely spaced eigenvalues, so that the
+        # eigensolver cannot converge in a single iteration
+        diag = np.linspace(0, 1, 1000)
+        with pytest.raises(ConvergenceError):
+            leading_eigenvector(lambda x: diag * x, 1000, tol=1e-15,
+                                maxiter=1)
+
+        vec, num_products = leading_eigenvector(lambda x: diag * x, 1000)
+        assert np.argmax(vec) == 999
+        assert num_products > 0
+
 
 class TestInvestment(BaseTest):
     def test_basic(self):
@@ -523,8 +677,999 @@ class TestTruthFinder(BaseTest):
         alg = TruthFinder(iterator=it)
         res = alg.run(data)
         # Iteration should stop after only 7 iterations, instead of 100
-        assert it.it_count == 7
+        assert alg.last_context.iterator.it_count == 7
         assert res.iterations == 7
+        # The iterator given is only a prototype, and is not changed by runs
+        assert it.it_count == 0
+
+
+class TestCRH(BaseTest):
+    def get_reference_results(self, data, num_iterations, eps):
+        """
+        Run CRH using dense claims x claims matrices, as in the original
+        implementation
+        """
+        trust = np.zeros((data.num_sources,))
+        belief = (data.sc.T @ np.ones((data.num_sources,))) / data.num_sources
+        i = np.eye(data.num_claims)
+        for _ in range(num_iterations):
+            t = np.tile(belief, (data.num_claims, 1))
+            z = data.mut_ex.toarray() * (t - i) ** 2
+            alpha = eps + data.sc @ z @ np.ones((data.num_claims,))
+            trust = eps - np.log(alpha / np.sum(alpha))
+            belief = (data.sc.T @ trust) / np.sum(trust)
+        return trust, belief
+
+    def test_basic(self, data):
+        num_iterations = 10
+        crh = CRH(iterator=FixedIterator(num_iterations))
+        results = crh.run(data)
+        trust, belief = self.get_reference_results(
+            data, num_iterations, CRH.eps
+        )
+        for source, trust_val in zip(("s1", "s2", "s3"), trust):
+            assert np.isclose(results.trust[source], trust_val)
+        assert np.isclose(results.belief["x"]["one"], belief[0])
+        assert np.isclose(results.belief["y"]["nine"], belief[1])
+        assert np.isclose(results.belief["z"]["seven"], belief[2])
+        assert np.isclose(results.belief["y"]["eight"], belief[3])
+
+    def test_larger_domains(self):
+        np.random.seed(1)
+        data = MatrixDataset(np.random.randint(0, 5, size=(15, 10)))
+        results = CRH(iterator=FixedIterator(15), eps=1e-3).run(data)
+        trust, _ = self.get_reference_results(data, 15, 1e-3)
+        for source, trust_val in enumerate(trust):
+            assert np.isclose(results.trust[source], trust_val)
+
+    @pytest.fixture
+    def numeric_data(self):
+        return Dataset([
+            ("s1", "x", 10), ("s2", "x", 11), ("s3", "x", 10.5),
+            ("s4", "x", 30),
+            ("s1", "y", 1), ("s2", "y", 2), ("s3", "y", 1.5), ("s4", "y", 9),
+            ("s1", "z", 5), ("s4", "z", 0)
+        ])
+
+    def test_weighted_median(self, numeric_data):
+        crh = CRH(loss=CRHLoss.ABSOLUTE)
+        results = crh.run(numeric_data)
+        # The outlying source should be least trusted
+        assert min(results.trust, key=results.trust.get) == "s4"
+
+        truths = crh.get_truths(numeric_data, results)
+        assert truths == {"x": 10.5, "y": 1.5, "z": 5}
+        # Claims equal to the truth have belief 1
+        assert results.belief["x"][10.5] == 1
+        assert results.belief["x"][10] < 1
+        assert results.belief["x"][30] < results.belief["x"][10]
+
+    def test_weighted_median_vectorised(self):
+        """
+        Compare weighted medians computed in one pass over all variables with
+        medians computed separately for each variable
+        """
+        np.random.seed(3)
+        data = MatrixDataset(np.random.randint(0, 20, size=(12, 30)))
+        crh = CRH(loss=CRHLoss.ABSOLUTE)
+        values = data.get_claim_values()
+        order = np.lexsort((values, data.claim_var_ids))
+        trust = np.random.uniform(size=(data.num_sources,))
+        got = crh.estimate_truths(data, values, trust, order)
+
+        claim_weights = data.sc.T @ trust
+        for var_id in range(data.num_variables):
+            claims = np.where(data.claim_var_ids == var_id)[0]
+            sorted_claims = claims[np.argsort(values[claims])]
+            cum_weights = np.cumsum(claim_weights[sorted_claims])
+            median_idx = np.searchsorted(cum_weights, cum_weights[-1] / 2)
+            assert got[var_id] == values[sorted_claims[median_idx]]
+
+    def test_weighted_mean(self, numeric_data):
+        crh = CRH(loss=CRHLoss.SQUARED, iterator=FixedIterator(1))
+        results = crh.run(numeric_data)
+        trust = np.array([results.trust[s] for s in ("s1", "s2", "s3", "s4")])
+        truths = crh.get_truths(numeric_data, results)
+        exp_x = np.dot(trust, [10, 11, 10.5, 30]) / np.sum(trust)
+        assert np.isclose(truths["x"], exp_x)
+        exp_z = np.dot(trust[[0, 3]], [5, 0]) / np.sum(trust[[0, 3]])
+        assert np.isclose(truths["z"], exp_z)
+
+    def test_continuous_non_numeric(self, data):
+        with pytest.raises(ValueError):
+            CRH(loss=CRHLoss.ABSOLUTE).run(data)
+
+    def test_invalid_loss(self, data):
+        with pytest.raises(ValueError):
+            CRH(loss="absolute").run(data)
+
+
+class TestComponentParallel:
+    @pytest.fixture
+    def data(self):
+        # Three components of different sizes
+        return Dataset([
+            ("s1", "x", "one"), ("s2", "x", "two"), ("s3", "x", "one"),
+            ("s1", "y", "one"), ("s3", "y", "two"),
+            ("s4", "z", "one"), ("s5", "z", "one"), ("s5", "w", "three"),
+            ("s6", "v", "one"),
+        ])
+
+    def test_truthfinder_identical(self, data):
+        alg = TruthFinder(iterator=FixedIterator(10))
+        whole = alg.run(data)
+        for processes in (1, 2):
+            split = ComponentParallel(alg, processes=processes).run(data)
+            assert split.iterations == whole.iterations
+            assert set(split.trust) == set(whole.trust)
+            for source, trust_val in whole.trust.items():
+                assert np.isclose(split.trust[source], trust_val)
+            assert set(split.belief) == set(whole.belief)
+            for var, beliefs in whole.belief.items():
+                for val, belief_val in beliefs.items():
+                    assert np.isclose(split.belief[var][val], belief_val)
+
+    def test_sums_per_component_normalisation(self, data):
+        alg = Sums(iterator=FixedIterator(10))
+        whole = alg.run(data)
+        split = ComponentParallel(alg, processes=1).run(data)
+
+        # Each component has a source with trust 1
+        for comp in (("s1", "s2", "s3"), ("s4", "s5"), ("s6",)):
+            assert max(split.trust[s] for s in comp) == 1
+            # Ratios within the component are the same as for the whole run
+            for s in comp:
+                ratio = whole.trust[s] / max(whole.trust[t] for t in comp)
+                assert np.isclose(split.trust[s], ratio)
+
+    def test_merged_run_information(self, data):
+        alg = Sums(iterator=FixedIterator(10), backend=SparseBackend)
+        res = ComponentParallel(alg, processes=1).run(data)
+        assert res.stop_reason == StopReason.LIMIT
+        assert res.metadata == {"components": 3, "backend": "SparseBackend"}
+        assert set(res.timings) == set(Sums.PHASES)
+        assert res.timings["total"] >= res.timings["iterations"] > 0
+
+        # Components converge after different numbers of iterations
+        res = ComponentParallel(Sums(), processes=1).merge([
+            Result({"s1": 1}, {}, None, iterations=3,
+                   stop_reason=StopReason.CONVERGED,
+                   metadata={"backend": "DenseBackend"},
+                   timings={"iterations": 1, "total": 2}),
+            Result({"s2": 1}, {}, None, iterations=5,
+                   stop_reason=StopReason.LIMIT,
+                   metadata={"backend": "SparseBackend"},
+                   timings={"iterations": 3, "total": 4}),
+        ])
+        assert res.iterations == 5
+        assert res.stop_reason == StopReason.LIMIT
+        assert res.timings == {"iterations": 4, "total": 6}
+        assert res.metadata["components"] == 2
+        assert "backend" not in res.metadata
+        assert res.metadata["component_metadata"] == [
+            {"backend": "DenseBackend"}, {"backend": "SparseBackend"}
+        ]
+
+    def test_empty_dataset(self):
+        with pytest.raises(EmptyDatasetError):
+            ComponentParallel(Sums()).run(Dataset([]))
+
+
+class TestAcceleration:
+    @pytest.fixture
+    def data(self):
+        return MatrixDataset(np.array([
+            [1, 2, 3, 2, 1, 4],
+            [3, 2, 1, 2, 1, 4],
+            [2, 2, 3, 1, 1, 3],
+            [1, 1, 3, 2, 4, 4],
+            [3, 2, 3, 1, 1, 1]
+        ]))
+
+    def test_anderson_invalid_depth(self):
+        for depth in (0, -1):
+            with pytest.raises(ValueError):
+                AndersonAccelerator(depth)
+
+    @pytest.fixture
+    def random_data(self):
+        return [
+            MatrixDataset(ma.masked_values(
+                np.random.RandomState(seed).randint(0, 5, size=(30, 20)), 0
+            ))
+            for seed in range(3)
+        ]
+
+    def run_all(self, cls, data, accelerator):
+        it = ConvergenceIterator(DistanceMeasures.L2, 1e-8, limit=2000)
+        kwargs = {"iterator": it, "accelerator": accelerator}
+        if cls in (Sums, AverageLog):
+            kwargs["solver"] = SolverMode.POWER
+        return cls(**kwargs).run(data)
+
+    @pytest.mark.filterwarnings("error::RuntimeWarning")
+    def test_same_fixed_point(self, random_data):
+        """
+        Accelerated runs should converge to the same trust and belief scores
+        as un-accelerated runs, and should take at most a few more iterations
+        even for algorithms where extrapolation does not help
+        """
+        for data in random_data:
+            for cls in (Sums, AverageLog, TruthFinder):
+                plain = self.run_all(cls, data, None)
+                for acc in (AitkenAccelerator(), AndersonAccelerator(),
+                            AndersonAccelerator(2)):
+                    res = self.run_all(cls, data, acc)
+                    assert res.iterations <= plain.iterations + 12
+                    for source, trust_val in plain.trust.items():
+                        assert np.isclose(res.trust[source], trust_val,
+                                          atol=1e-6)
+                    for var, beliefs in plain.belief.items():
+                        for val, belief_val in beliefs.items():
+                            assert np.isclose(res.belief[var][val],
+                                              belief_val, atol=1e-6)
+                    stats = res.metadata["acceleration"]
+                    assert set(stats) == {"accepted", "rejected", "reverted"}
+
+    def test_anderson_faster(self, random_data):
+        """
+        Anderson acceleration should reduce the number of iterations for
+        algorithms with a well-behaved fixed point
+        """
+        for data in random_data:
+            for cls in (Sums, AverageLog):
+                plain = self.run_all(cls, data, None)
+                res = self.run_all(cls, data, AndersonAccelerator())
+                assert res.iterations < plain.iterations
+                assert res.metadata["acceleration"]["accepted"] > 0
+
+    def test_reverted(self, random_data):
+        """
+        Extrapolations which move away from the fixed point should be reverted
+        and counted in the metadata
+        """
+        res = self.run_all(TruthFinder, random_data[0],
+                           AndersonAccelerator())
+        stats = res.metadata["acceleration"]
+        assert stats["reverted"] > 0
+        assert stats["reverted"] <= stats["rejected"]
+
+    def test_unsupported(self):
+        for cls in (Investment, PooledInvestment):
+            with pytest.raises(ValueError):
+                cls(accelerator=AndersonAccelerator())
+
+    def test_normalisation_preserved(self, data):
+        alg = Sums(accelerator=AndersonAccelerator(2))
+        for res in alg.run_iter(data):
+            if res.iterations > 0:
+                assert np.isclose(max(res.trust.values()), 1)
+
+    def test_reset_between_runs(self, data):
+        acc = AndersonAccelerator(3)
+        alg = Sums(accelerator=acc)
+        res1 = alg.run(data)
+        res2 = alg.run(data)
+        assert res1.trust == res2.trust
+        assert res1.belief == res2.belief
+
+
+class TestBackends:
+    @pytest.fixture
+    def data(self):
+        return Dataset([
+            ("s1", "x", 1), ("s1", "y", 4), ("s1", "z", 7),
+            ("s2", "x", 1), ("s2", "y", 5),
+            ("s3", "x", 2), ("s3", "z", 7), ("s3", "w", 3),
+            ("s4", "y", 6),
+        ], implication_function=lambda var, v1, v2: 1 / (1 + abs(v1 - v2)))
+
+    @pytest.fixture
+    def backends(self, tmpdir):
+        return [
+            SparseBackend, DenseBackend, ThreadedBackend,
+            ThreadedBackend.configure(threads=2), MemoryMappedBackend,
+            MemoryMappedBackend.configure(directory=str(tmpdir))
+        ]
+
+    def test_operations(self, data, backends):
+        rng = np.random.RandomState(5)
+        claim_vec = rng.rand(data.num_claims)
+        source_vec = rng.rand(data.num_sources)
+        claim_scale = rng.rand(data.num_claims)
+        source_scale = rng.rand(data.num_sources)
+
+        sc = data.sc.toarray()
+        exp_forward = sc @ claim_vec
+        exp_scaled_forward = (
+            source_scale * (sc @ (claim_scale * claim_vec))
+        )
+        exp_transpose = sc.T @ source_vec
+        exp_scaled_transpose = (
+            claim_scale * (sc.T @ (source_scale * source_vec))
+        )
+        exp_var_sums = data.mut_ex.toarray() @ claim_vec
+        exp_imp = data.imp.toarray().T @ claim_vec
+
+        for backend_factory in backends:
+            backend = backend_factory(data)
+            assert isinstance(backend, BaseBackend)
+            assert np.allclose(backend.forward(claim_vec), exp_forward)
+            assert np.allclose(
+                backend.forward(claim_vec, row_scale=source_scale,
+                                col_scale=claim_scale),
+                exp_scaled_forward
+            )
+            assert np.allclose(backend.transpose(source_vec), exp_transpose)
+            assert np.allclose(
+                backend.transpose(source_vec, row_scale=claim_scale,
+                                  col_scale=source_scale),
+                exp_scaled_transpose
+            )
+            assert np.array_equal(backend.claims_per_source(), [3, 2, 3, 1])
+            assert np.array_equal(backend.sources_per_claim(),
+                                  sc.sum(axis=0))
+            assert np.allclose(backend.variable_sums(claim_vec),
+                               exp_var_sums)
+            assert np.allclose(backend.implication(claim_vec), exp_imp)
+            assert backend.max(claim_vec) == np.max(claim_vec)
+            assert np.isclose(backend.sum(claim_vec), np.sum(claim_vec))
+            backend.close()
+
+    def test_out_buffers(self, data, backends):
+        rng = np.random.RandomState(7)
+        claim_vec = rng.rand(data.num_claims)
+        source_vec = rng.rand(data.num_sources)
+        claim_scale = rng.rand(data.num_claims)
+        source_scale = rng.rand(data.num_sources)
+
+        for backend_factory in backends:
+            backend = backend_factory(data)
+            source_out = np.empty((data.num_sources,))
+            claim_out = np.empty((data.num_claims,))
+            calls = [
+                (backend.forward, (claim_vec,), {}, source_out),
+                (backend.forward, (claim_vec,),
+                 {"row_scale": source_scale, "col_scale": claim_scale},
+                 source_out),
+                (backend.transpose, (source_vec,), {}, claim_out),
+                (backend.transpose, (source_vec,),
+                 {"row_scale": claim_scale, "col_scale": source_scale},
+                 claim_out),
+                (backend.variable_sums, (claim_vec,), {}, claim_out),
+                (backend.implication, (claim_vec,), {}, claim_out)
+            ]
+            for func, args, kwargs, out in calls:
+                exp = func(*args, **kwargs)
+                got = func(*args, out=out, **kwargs)
+                assert got is out
+                assert np.allclose(out, exp)
+            # Workspace buffers are re-used between calls
+            buf = backend.workspace("test", 3)
+            assert buf.shape == (3,)
+            assert backend.workspace("test", 3) is buf
+            backend.close()
+
+    def test_base_backend(self, data):
+        backend = BaseBackend(data)
+        with pytest.raises(NotImplementedError):
+            backend.forward(np.ones((data.num_claims,)))
+        with pytest.raises(NotImplementedError):
+            backend.transpose(np.ones((data.num_sources,)))
+
+    def test_dense_dataset(self, data, monkeypatch):
+        rng = np.random.RandomState(6)
+        claim_vec = rng.rand(data.num_claims)
+        backend = DenseBackend(data)
+        # Arrays from dense datasets should be used directly
+        assert backend.sc is data.sc_dense
+        assert backend.mut_ex is data.mut_ex_dense
+
+        monkeypatch.setattr(Dataset, "dense_threshold", 0)
+        sparse_data = Dataset([
+            ("s1", "x", 1), ("s1", "y", 4), ("s1", "z", 7),
+            ("s2", "x", 1), ("s2", "y", 5),
+            ("s3", "x", 2), ("s3", "z", 7), ("s3", "w", 3),
+            ("s4", "y", 6),
+        ], implication_function=lambda var, v1, v2: 1 / (1 + abs(v1 - v2)))
+        sparse_backend = DenseBackend(sparse_data)
+        assert sparse_backend.mut_ex is None
+        assert np.allclose(backend.variable_sums(claim_vec),
+                           sparse_backend.variable_sums(claim_vec))
+        assert np.allclose(backend.implication(claim_vec),
+                           sparse_backend.implication(claim_vec))
+
+        for cls in (Sums, Investment, TruthFinder, CRH):
+            dense_res = cls().run(data)
+            sparse_res = cls().run(sparse_data)
+            for source, trust_val in sparse_res.trust.items():
+                assert np.isclose(dense_res.trust[source], trust_val)
+            for var, beliefs in sparse_res.belief.items():
+                for val, belief_val in beliefs.items():
+                    assert np.isclose(dense_res.belief[var][val], belief_val)
+
+    def test_memory_mapped_cleanup(self, data):
+        backend = MemoryMappedBackend(data)
+        directory = backend._temp_dir
+        assert sorted(os.listdir(directory)) == ["sc", "sc_t"]
+        # Arrays should be views of the mapped files, not copies
+        for arr in (backend.sc.data, backend.sc_t.indices):
+            while not isinstance(arr, np.memmap):
+                assert isinstance(arr, np.ndarray)
+                arr = arr.base
+        assert (backend.sc_t != data.sc.T).nnz == 0
+        backend.close()
+        assert not path.exists(directory)
+
+    def test_algorithms(self, data, backends):
+        algorithms = [
+            Sums(), AverageLog(), Investment(), PooledInvestment(),
+            TruthFinder(iterator=FixedIterator(20)), CRH(), UnboundedSums(),
+            MajorityVoting()
+        ]
+        for alg in algorithms:
+            exp = alg.run(data)
+            for backend_factory in backends:
+                alg.backend = backend_factory
+                res = alg.run(data)
+                assert res.iterations == exp.iterations
+                for source, trust_val in exp.trust.items():
+                    assert np.isclose(res.trust[source], trust_val)
+                for var, beliefs in exp.belief.items():
+                    for val, belief_val in beliefs.items():
+                        assert np.isclose(res.belief[var][val], belief_val)
+            alg.backend = None
+
+
+class TestPlanner:
+    @pytest.fixture
+    def data(self):
+        return Dataset([
+            ("s1", "x", 1), ("s1", "y", 4), ("s1", "z", 7),
+            ("s2", "x", 1), ("s2", "y", 5),
+            ("s3", "x", 2), ("s3", "z", 7), ("s3", "w", 3),
+            ("s4", "y", 6),
+        ])
+
+    def get_profile(self, num_sources, num_claims, nnz, memory=None):
+        return DatasetProfile(
+            num_sources=num_sources, num_claims=num_claims,
+            num_variables=num_claims // 2, nnz=nnz, max_domain_size=2,
+            mean_domain_size=2.0, available_memory=memory, dense=False
+        )
+
+    def test_profile(self, data):
+        profile = Planner().profile(data)
+        assert profile.num_sources == 4
+        assert profile.num_claims == 7
+        assert profile.num_variables == 4
+        assert profile.nnz == 9
+        assert profile.max_domain_size == 3
+        assert np.isclose(profile.mean_domain_size, 7 / 4)
+        assert profile.dense
+
+    def test_choice(self):
+        planner = Planner(threads=1)
+        # Small datasets: dense products are cheapest
+        small = planner.estimate(self.get_profile(10, 20, 40))
+        assert set(small.keys()) == {"sparse", "dense", "mmap"}
+        assert min(small, key=lambda name: small[name].time) == "dense"
+
+        # Large sparse datasets: dense products are slower and need more
+        # memory
+        large = planner.estimate(self.get_profile(10 ** 5, 10 ** 6, 10 ** 6))
+        assert large["dense"].time > large["sparse"].time
+        assert large["dense"].memory == 2 * 8 * 10 ** 11
+        assert large["sparse"].memory == 12 * 10 ** 6 + 8 * (10 ** 6 + 1)
+        # Memory-mapped matrices are slower but need the least memory
+        assert large["mmap"].time > large["sparse"].time
+        assert large["mmap"].memory == 8 * (11 * 10 ** 5 + 2)
+
+        # Threads are only worthwhile for large datasets
+        threaded = Planner(threads=8)
+        small = threaded.estimate(self.get_profile(10, 20, 40))
+        assert small["threaded"].time > small["sparse"].time
+        large = threaded.estimate(self.get_profile(10 ** 5, 10 ** 6, 10 ** 8))
+        assert large["threaded"].time < large["sparse"].time
+
+    def test_plan(self, data):
+        plan = Planner(threads=1).plan(data)
+        assert plan.strategy == "dense"
+        assert plan.profile.nnz == 9
+        plan_dict = plan.to_dict()
+        assert plan_dict["strategy"] == "dense"
+        exp_strategies = {"sparse", "dense", "mmap"}
+        assert set(plan_dict["estimates"].keys()) == exp_strategies
+        # Dense products use the matrix and its transpose
+        sparse_memory = 9 * 12 + 8 * 8
+        assert plan_dict["estimates"]["dense"]["memory"] == 2 * 4 * 7 * 8
+        assert plan_dict["estimates"]["sparse"]["memory"] == sparse_memory
+        assert plan_dict["estimates"]["mmap"]["memory"] == 13 * 8
+        # Results should be JSON serialisable
+        json.dumps(plan_dict)
+
+        # Dense matrices are ruled out if they do not fit in memory
+        plan = Planner(threads=1, memory_limit=200).plan(data)
+        assert plan.strategy == "sparse"
+        # Memory-mapped matrices are used if the matrix does not fit
+        plan = Planner(threads=1, memory_limit=150).plan(data)
+        assert plan.strategy == "mmap"
+        # If nothing fits, the strategy using the least memory is chosen
+        plan = Planner(threads=1, memory_limit=0).plan(data)
+        assert plan.strategy == "mmap"
+        plan = Planner(threads=1, memory_limit=0,
+                       strategies=["sparse", "dense"]).plan(data)
+        assert plan.strategy == "sparse"
+
+        backend = Planner(threads=1)(data)
+        assert isinstance(backend, DenseBackend)
+        assert backend.plan.strategy == "dense"
+
+    def test_default_planner(self, data):
+        res = Sums().run(data)
+        assert res.metadata["backend"] == "DenseBackend"
+        assert res.metadata["plan"]["strategy"] == "dense"
+
+        # Explicit execution options bypass the planner
+        for alg in (Sums(threads=1), Sums(backend=SparseBackend)):
+            res = alg.run(data)
+            assert res.metadata == {"backend": "SparseBackend"}
+
+        # Planners can be given explicitly
+        alg = Sums(backend=Planner(threads=1, memory_limit=0))
+        res = alg.run(data)
+        assert res.metadata["backend"] == "MemoryMappedBackend"
+        assert res.metadata["plan"]["strategy"] == "mmap"
+        assert res.trust == pytest.approx(Sums().run(data).trust)
+
+    def test_available_memory(self, monkeypatch):
+        reads = []
+
+        def read():
+            reads.append(1)
+            return 1000
+        monkeypatch.setattr(planner_module, "_memory_cache", {})
+        monkeypatch.setattr(planner_module, "_read_available_memory", read)
+        assert planner_module.get_available_memory() == 1000
+        assert planner_module.get_available_memory() == 1000
+        assert len(reads) == 1
+        monkeypatch.setattr(planner_module, "MEMORY_CACHE_TIME", 0)
+        planner_module.get_available_memory()
+        assert len(reads) == 2
+
+    def test_strategies(self, data):
+        plan = Planner(threads=1, strategies=["sparse", "mmap"]).plan(data)
+        assert plan.strategy == "sparse"
+        with pytest.raises(ValueError):
+            Planner(strategies=["sparse", "gpu"])
+        with pytest.raises(ValueError):
+            Planner(strategies=[])
+
+    def test_ranking(self):
+        # Sources are duplicated, so many trust scores are tied. Dense
+        # products may round identical rows differently and split the ties,
+        # so that rankings never settle
+        rng = np.random.RandomState(0)
+        tuples = []
+        for source in range(13):
+            for var in range(50):
+                if rng.rand() < 0.5:
+                    val = rng.randint(3)
+                    tuples.extend(
+                        ("s{}_{}".format(source, copy), var, val)
+                        for copy in range(3)
+                    )
+        data = Dataset(tuples)
+        assert Planner().plan(data).strategy == "dense"
+        limit = CombinedIterator(OrdinalConvergenceIterator(),
+                                 FixedIterator(200))
+        exp = UnboundedSums(iterator=limit, backend=SparseBackend).run(data)
+        assert exp.iterations < 200
+        res = UnboundedSums(iterator=limit).run(data)
+        assert res.metadata["backend"] != "DenseBackend"
+        assert res.iterations == exp.iterations
+        assert res.trust == exp.trust
+
+        # Other algorithms avoid dense products with ranking-based iterators
+        res = Sums(iterator=limit).run(data)
+        assert res.metadata["backend"] != "DenseBackend"
+        res = Sums().run(data)
+        assert res.metadata["backend"] == "DenseBackend"
+
+    def test_cost_model(self, tmpdir):
+        model = CostModel(sparse_nnz_time=1, dense_call_time=2)
+        assert model.sparse_nnz_time == 1
+        assert model.dense_call_time == 2
+        assert model.dense_entry_time == CostModel.dense_entry_time
+
+        filepath = str(tmpdir.join("model.json"))
+        model.save(filepath)
+        loaded = CostModel.load(filepath)
+        assert loaded.to_dict() == model.to_dict()
+
+        with pytest.raises(ValueError):
+            CostModel(not_a_coefficient=4)
+
+    def test_calibrate(self):
+        model = CostModel.calibrate(threads=2, size=1000, density=0.01,
+                                    repeats=1)
+        for name, value in model.to_dict().items():
+            assert value >= 0, name
+        assert model.sparse_nnz_time > 0
+        assert model.dense_entry_time > 0
+
+
+class TestParallelProducts:
+    @pytest.fixture
+    def matrix(self):
+        rng = np.random.RandomState(1)
+        return scipy.sparse.random(
+            300, 200, density=0.05, format="csr", random_state=rng
+        )
+
+    def test_row_blocks(self, matrix):
+        for num_blocks in (1, 3, 8, 1000):
+            blocks = spmv.ParallelSparseMatrix.get_row_blocks(
+                matrix, num_blocks
+            )
+            assert len(blocks) <= min(num_blocks, matrix.shape[0])
+            assert blocks[0][0] == 0
+            assert blocks[-1][1] == matrix.shape[0]
+            for (_, end, _), (start, _, _) in zip(blocks[:-1], blocks[1:]):
+                assert end == start
+            stacked = scipy.sparse.vstack([block for _, _, block in blocks])
+            assert (stacked != matrix).nnz == 0
+
+    def test_products_identical(self, matrix):
+        vec = np.random.RandomState(2).rand(200)
+        tvec = np.random.RandomState(3).rand(300)
+        for threads in (1, 2, 7):
+            par = spmv.ParallelSparseMatrix(matrix, threads)
+            assert np.array_equal(par @ vec, matrix @ vec)
+            assert np.array_equal(par.T @ tvec, matrix.T.tocsr() @ tvec)
+            assert par.T.T is par
+
+        with pytest.raises(ValueError):
+            spmv.ParallelSparseMatrix(matrix, 0)
+
+    def test_matvec(self, matrix):
+        rng = np.random.RandomState(4)
+        vec = rng.rand(200)
+        tvec = rng.rand(300)
+        out = np.full((300,), np.nan)
+        assert spmv.matvec(matrix, vec, out) is out
+        assert np.allclose(out, matrix @ vec)
+        # Column-oriented and integer matrices
+        out_t = np.full((200,), np.nan)
+        spmv.matvec(matrix.T, tvec, out_t)
+        assert np.allclose(out_t, matrix.T @ tvec)
+        int_matrix = (matrix > 0.5).astype(int)
+        spmv.matvec(int_matrix, vec, out)
+        assert np.allclose(out, int_matrix @ vec)
+        # Dense arrays and parallel matrices
+        spmv.matvec(matrix.toarray(), vec, out)
+        assert np.allclose(out, matrix @ vec)
+        spmv.matvec(spmv.ParallelSparseMatrix(matrix, 3), vec, out)
+        assert np.allclose(out, matrix @ vec)
+
+    def test_parallel_operator(self, matrix):
+        assert spmv.parallel_operator(matrix, None) is matrix
+        assert spmv.parallel_operator(matrix, 1) is matrix
+        # Matrix is below the size threshold
+        assert spmv.parallel_operator(matrix, 4) is matrix
+
+    def test_algorithms_deterministic(self, monkeypatch):
+        data_path = path.join(
+            path.abspath(path.dirname(__file__)), "regression", "data.csv"
+        )
+        with open(data_path) as csv_file:
+            data = MatrixDataset.from_csv(csv_file)
+        monkeypatch.setattr(spmv, "PARALLEL_NNZ_THRESHOLD", 0)
+
+        for cls in (Sums, AverageLog, Investment, PooledInvestment, CRH,
+                    TruthFinder):
+            serial = cls(iterator=FixedIterator(10),
+                         backend=SparseBackend).run(data)
+            for threads in (2, 5):
+                alg = cls(iterator=FixedIterator(10), threads=threads)
+                assert isinstance(alg.get_backend(data).sc,
+                                  spmv.ParallelSparseMatrix)
+                res = alg.run(data)
+                assert res.trust == serial.trust
+                assert res.belief == serial.belief
+
+            alg = cls(iterator=FixedIterator(10), processes=2)
+            res = alg.run(data)
+            assert res.trust == serial.trust
+            assert res.belief == serial.belief
+            # Workers should have been stopped at the end of the run
+            assert alg.last_context.backend is None
+
+    def test_shared_memory_engine(self, matrix):
+        vec = np.random.RandomState(2).rand(200)
+        tvec = np.random.RandomState(3).rand(300)
+        # Use more processes than there are rows in the second matrix
+        small = scipy.sparse.csr_matrix(np.ones((2, 300)))
+        with SharedMemoryEngine([matrix, matrix.T, small], 3) as engine:
+            fwd, trans, small_op = engine.operators
+            assert fwd.shape == (300, 200)
+            for _ in range(3):
+                assert np.array_equal(fwd @ vec, matrix @ vec)
+                assert np.array_equal(trans @ tvec, matrix.T.tocsr() @ tvec)
+                assert np.array_equal(small_op @ tvec, small @ tvec)
+            workers = engine.workers
+        assert not any(proc.is_alive() for proc in workers)
+        # Closing again should have no effect
+        engine.close()
+
+        with pytest.raises(ValueError):
+            SharedMemoryEngine([matrix], 0)
+
+    def test_messages(self):
+        arrays = [
+            np.arange(5, dtype=np.int32),
+            np.random.RandomState(1).rand(3, 4),
+            np.array([], dtype=np.float64)
+        ]
+        sock1, sock2 = socket.socketpair()
+        with sock1, sock2:
+            send_message(sock1, 7, -3, arrays)
+            command, arg, received = recv_message(sock2)
+        assert (command, arg) == (7, -3)
+        assert len(received) == len(arrays)
+        for arr, recv_arr in zip(arrays, received):
+            assert recv_arr.dtype == arr.dtype
+            assert np.array_equal(recv_arr, arr)
+
+    def test_message_limits(self):
+        sock1, sock2 = socket.socketpair()
+        with sock1, sock2:
+            # Sizes are checked before the array is received
+            send_message(sock1, 7, 0, [np.ones((100,))])
+            with pytest.raises(ValueError):
+                recv_message(sock2, max_bytes=799)
+        for header in (
+            # Object arrays cannot be sent
+            struct.pack("!iiI", 7, 0, 1)
+            + struct.pack("!16sIQ", b"|O", 1, 8) + struct.pack("!Q", 1),
+            # Size inconsistent with shape
+            struct.pack("!iiI", 7, 0, 1)
+            + struct.pack("!16sIQ", b"<f8", 1, 2 ** 40)
+            + struct.pack("!Q", 1),
+            # Too many arrays
+            struct.pack("!iiI", 7, 0, 2 ** 31),
+        ):
+            sock1, sock2 = socket.socketpair()
+            with sock1, sock2:
+                sock1.sendall(header)
+                with pytest.raises(ValueError):
+                    recv_message(sock2)
+
+    def test_authentication(self):
+        for secret in ("abc", b"abc"):
+            sock1, sock2 = socket.socketpair()
+            with sock1, sock2:
+                server = threading.Thread(
+                    target=authenticate, args=(sock1, b"abc", True)
+                )
+                server.start()
+                authenticate(sock2, get_secret(secret), False)
+                server.join()
+
+        errors = []
+
+        def serve():
+            try:
+                authenticate(sock1, b"abc", True)
+            except AuthenticationError as ex:
+                errors.append(ex)
+                sock1.close()
+
+        sock1, sock2 = socket.socketpair()
+        with sock1, sock2:
+            server = threading.Thread(target=serve)
+            server.start()
+            with pytest.raises(ConnectionError):
+                authenticate(sock2, b"wrong", False)
+            server.join()
+        assert len(errors) == 1
+
+    def test_distributed_secret(self, matrix, monkeypatch):
+        monkeypatch.delenv(SECRET_ENV, raising=False)
+        with pytest.raises(ValueError):
+            get_secret()
+        with LocalCluster(1, secret="abc") as cluster:
+            with pytest.raises(ValueError):
+                DistributedEngine([matrix], cluster.addresses)
+            with pytest.raises(AuthenticationError):
+                DistributedEngine([matrix], cluster.addresses, secret="xyz")
+            # Unauthenticated commands are ignored, and the worker keeps
+            # serving other coordinators
+            with socket.create_connection(cluster.addresses[0]) as sock:
+                sock.sendall(b"\0" * 32)
+                try:
+                    send_message(sock, SHUTDOWN)
+                except OSError:
+                    pass
+            with DistributedEngine([matrix], cluster.addresses,
+                                   secret="abc") as engine:
+                vec = np.ones((200,))
+                assert np.array_equal(engine.operators[0] @ vec,
+                                      matrix @ vec)
+
+    def test_row_blocks_from_dataset(self):
+        rng = np.random.RandomState(4)
+        dense = MatrixDataset(ma.masked_values(
+            rng.randint(0, 4, size=(20, 15)), 0
+        ))
+        sparse = MatrixDataset(ma.masked_values(
+            rng.randint(0, 4, size=(300, 250)), 0
+        ))
+        assert dense.sc_dense is not None
+        assert sparse.sc_dense is None
+        for data in (dense, sparse):
+            forward, transpose = RowBlocks.from_dataset(data)
+            expected = (data.sc.toarray(), data.sc.T.toarray())
+            for blocks, exp in zip((forward, transpose), expected):
+                assert blocks.shape == exp.shape
+                assert np.array_equal(blocks.row_nnz,
+                                      np.count_nonzero(exp, axis=1))
+                for start, end in ((0, 3), (3, exp.shape[0]), (5, 5)):
+                    block = blocks.get_rows(start, end)
+                    assert block.dtype == np.float64
+                    assert np.array_equal(block.toarray(), exp[start:end])
+
+    def test_distributed(self, matrix):
+        vec = np.random.RandomState(2).rand(200)
+        tvec = np.random.RandomState(3).rand(300)
+        small = scipy.sparse.csr_matrix(np.ones((2, 300)))
+        data_path = path.join(
+            path.abspath(path.dirname(__file__)), "regression", "data.csv"
+        )
+        with open(data_path) as csv_file:
+            data = MatrixDataset.from_csv(csv_file)
+
+        with LocalCluster(3) as cluster:
+            with DistributedEngine([matrix, matrix.T, small],
+                                   cluster.addresses) as engine:
+                fwd, trans, small_op = engine.operators
+                for _ in range(3):
+                    assert np.array_equal(fwd @ vec, matrix @ vec)
+                    assert np.array_equal(trans @ tvec,
+                                          matrix.T.tocsr() @ tvec)
+                    assert np.array_equal(small_op @ tvec, small @ tvec)
+                # Errors in workers should be reported
+                sock = engine.sockets[0]
+                send_message(sock, MULTIPLY, 5, [np.ones((3,))])
+                with pytest.raises(RuntimeError):
+                    engine._receive(sock)
+
+            # Workers can be reused by later runs
+            for cls in (Sums, Investment, TruthFinder):
+                serial = cls(iterator=FixedIterator(10),
+                             backend=SparseBackend).run(data)
+                alg = cls(iterator=FixedIterator(10),
+                          workers=cluster.addresses)
+                res = alg.run(data)
+                assert res.trust == serial.trust
+                assert res.belief == serial.belief
+                assert alg.last_context.backend is None
+
+        with pytest.raises(ValueError):
+            DistributedEngine([matrix], [])
+
+    def test_disk_matrix(self, matrix, tmpdir):
+        vec = np.random.RandomState(2).rand(200)
+        disk_mat = DiskCSRMatrix.write(matrix, str(tmpdir), chunk_nnz=100)
+        assert disk_mat.shape == (300, 200)
+        assert disk_mat.num_chunks == -(-matrix.nnz // 100)
+
+        # Matrix should be readable from the directory alone
+        disk_mat = DiskCSRMatrix(str(tmpdir))
+        disk_mat.prefetch = 1
+        assert np.array_equal(disk_mat @ vec, matrix @ vec)
+        assert disk_mat.bytes_read == (
+            matrix.data.nbytes + matrix.indices.nbytes
+        )
+        assert np.array_equal(disk_mat @ vec, matrix @ vec)
+        assert disk_mat.bytes_read == 2 * (
+            matrix.data.nbytes + matrix.indices.nbytes
+        )
+
+        # Stopping part way through should not leave the reader thread
+        # waiting
+        chunks = disk_mat.iter_chunks()
+        next(chunks)
+        chunks.close()
+
+    def test_disk_matrix_from_dataset(self, tmpdir):
+        rng = np.random.RandomState(6)
+        dense = MatrixDataset(ma.masked_values(
+            rng.randint(0, 4, size=(20, 15)), 0
+        ))
+        sparse = MatrixDataset(ma.masked_values(
+            rng.randint(0, 4, size=(300, 250)), 0
+        ))
+        for i, data in enumerate((dense, sparse)):
+            forward, transpose = RowBlocks.from_dataset(data)
+            fwd = DiskCSRMatrix.write(
+                forward, str(tmpdir.join("fwd{}".format(i))), chunk_nnz=100
+            )
+            trans = DiskCSRMatrix.write(
+                transpose, str(tmpdir.join("trans{}".format(i))),
+                chunk_nnz=100
+            )
+            assert fwd.shape == data.sc.shape
+            assert trans.shape == data.sc.T.shape
+            assert trans.num_chunks == -(-data.sc.nnz // 100)
+            vec = rng.rand(data.num_claims)
+            tvec = rng.rand(data.num_sources)
+            assert np.array_equal(fwd @ vec, data.sc @ vec)
+            assert np.array_equal(trans @ tvec, data.sc.T @ tvec)
+            # Temporary files for the transpose should be removed
+            assert tmpdir.join("trans{}".format(i)).listdir(
+                lambda f: f.basename.startswith("transpose")
+            ) == []
+
+        # Matrices are only reused with a matching key
+        directory = str(tmpdir.join("fwd1"))
+        assert DiskCSRMatrix.open(directory, "other") is None
+        assert DiskCSRMatrix.open(str(tmpdir.join("none")), None) is None
+        assert DiskCSRMatrix.open(directory, None).shape == sparse.sc.shape
+
+    def test_out_of_core(self, monkeypatch, tmpdir):
+        data_path = path.join(
+            path.abspath(path.dirname(__file__)), "regression", "data.csv"
+        )
+        with open(data_path) as csv_file:
+            data = MatrixDataset.from_csv(csv_file)
+        monkeypatch.setattr(
+            "truthdiscovery.utils.out_of_core.DEFAULT_CHUNK_NNZ", 50
+        )
+        for cls in (Sums, Investment, TruthFinder, CRH):
+            serial = cls(iterator=FixedIterator(10),
+                         backend=SparseBackend).run(data)
+            alg = cls(iterator=FixedIterator(10), out_of_core=True)
+            res = alg.run(data)
+            assert res.trust == serial.trust
+            assert res.belief == serial.belief
+            assert alg.io_stats[-1].iteration == 10
+            for stats in alg.io_stats:
+                if stats.iteration == 0:
+                    continue
+                assert stats.bytes_read > 0
+                assert stats.bandwidth > 0
+
+        # Files should be left in place if a directory is given, and reused
+        # by later runs on the same dataset
+        alg = Sums(iterator=FixedIterator(3), out_of_core=str(tmpdir))
+        first = alg.run(data)
+        assert len(tmpdir.listdir()) == 2
+        assert [s.iteration for s in alg.io_stats] == [0, 1, 2, 3]
+
+        def fail(*args, **kwargs):
+            raise AssertionError("Matrix should not be written again")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(DiskCSRMatrix, "write", fail)
+            assert alg.run(data).trust == first.trust
+        other = MatrixDataset(ma.masked_values([[1, 2], [0, 2]], 0))
+        other_res = alg.run(other)
+        assert other_res.trust == Sums(iterator=FixedIterator(3),
+                                       backend=SparseBackend).run(other).trust
+
+        # Matrices already on disk may be given to the engine directly
+        disk_mat = DiskCSRMatrix(str(tmpdir.join("matrix0")))
+        with OutOfCoreEngine([disk_mat]) as engine:
+            assert engine.operators[0] is disk_mat
+        assert tmpdir.join("matrix0").check(dir=True)
+
+        # Temporary directory should be removed
+        engine = OutOfCoreEngine([data.sc])
+        directory = engine.operators[0].directory
+        assert path.isdir(directory)
+        engine.close()
+        assert not path.exists(directory)
 
 
 class TestOnLargeData:
@@ -626,7 +1771,8 @@ class TestIteratorsForAlgorithms:
 class TestLoggingAlgorithm(BaseTest):
     @pytest.fixture
     def alg_classes(self):
-        return [AverageLog, Investment, PooledInvestment, Sums, TruthFinder]
+        return [AverageLog, Investment, PooledInvestment, Sums, TruthFinder,
+                CRH]
 
     @pytest.fixture
     def algs(self, alg_classes):
@@ -652,6 +1798,100 @@ class TestLoggingAlgorithm(BaseTest):
             _res = alg.run(data)
             assert alg.results_log is None
 
+    def test_results_log(self, algs, data):
+        for alg in algs:
+            # States are only kept if requested
+            partial = list(alg.run_iter(data))
+            assert alg.results_log is None
+            assert alg.last_context.results_history is None
+
+            partial = list(alg.run_iter(data, keep_log=True))
+            log = alg.results_log
+            assert len(log) == len(partial)
+            for exp, got in zip(partial, log):
+                assert got.iterations == exp.iterations
+                assert got.trust == exp.trust
+                assert got.belief == exp.belief
+
+    def test_streaming(self, alg_classes, data):
+        for cls in alg_classes:
+            alg = cls(iterator=FixedIterator(10))
+            # Results should be produced as each iteration is computed, not
+            # after the run has finished
+            results = alg.run_iter(data)
+            initial = next(results)
+            assert initial.iterations == 0
+            assert alg.last_context.iterator.it_count == 0
+            first = next(results)
+            assert first.iterations == 1
+            assert alg.last_context.iterator.it_count == 1
+            # Stopping early should release the backend
+            results.close()
+            assert alg.last_context.backend is None
+
+            # Final state returned by iterate() should be that of run()
+            steps = alg.iterate(data)
+            states = []
+            while True:
+                try:
+                    trust, belief = next(steps)
+                    states.append((trust.copy(), belief.copy()))
+                except StopIteration as stop:
+                    final_trust, final_belief = stop.value
+                    break
+            assert np.array_equal(states[-1][0], final_trust)
+            assert np.array_equal(states[-1][1], final_belief)
+            res = alg.run(data)
+            assert res.trust == data.get_source_trust_dict(final_trust)
+            assert res.iterations == len(states) - 1
+
+    def test_timings(self, alg_classes, data):
+        for cls in alg_classes:
+            alg = cls(iterator=FixedIterator(10))
+            res = alg.run(data)
+            assert set(res.timings.keys()) == set(alg.PHASES)
+            assert all(t >= 0 for t in res.timings.values())
+            phases = sum(t for phase, t in res.timings.items()
+                         if phase != "total")
+            assert phases <= res.timings["total"]
+            assert res.timings["iterations"] > 0
+
+            partial = list(alg.run_iter(data))
+            assert partial[0].timings["iterations"] == 0
+            assert partial[-1].timings["iterations"] > 0
+            assert (partial[-1].timings["total"]
+                    >= partial[-1].timings["iterations"])
+
+    def test_stop_reason(self, alg_classes, data):
+        for cls in alg_classes:
+            res = cls(iterator=FixedIterator(5)).run(data)
+            assert res.stop_reason == StopReason.LIMIT
+
+            conv_it = ConvergenceIterator(DistanceMeasures.L2, 0.01,
+                                          limit=1000)
+            conv_res = cls(iterator=conv_it).run(data)
+            assert conv_res.stop_reason == StopReason.CONVERGED
+
+            stopped_alg = cls(iterator=FixedIterator(5))
+            stopped_alg.add_hook(lambda info: info.iteration == 2)
+            assert stopped_alg.run(data).stop_reason == StopReason.STOPPED
+
+        # A deadline should return the latest scores instead of raising
+        # ConvergenceError
+        deadline_it = CombinedIterator(
+            ConvergenceIterator(DistanceMeasures.L2, 0, limit=10 ** 9),
+            DeadlineIterator(0.01)
+        )
+        deadline_res = Sums(iterator=deadline_it).run(data)
+        assert deadline_res.stop_reason == StopReason.DEADLINE
+        assert deadline_res.iterations > 0
+        assert set(deadline_res.trust.keys()) == {"s1", "s2", "s3"}
+
+        # Eigensolver should report convergence too
+        sums = Sums(iterator=ConvergenceIterator(DistanceMeasures.L2, 0.01),
+                    solver=SolverMode.EIGEN)
+        assert sums.run(data).stop_reason == StopReason.CONVERGED
+
     def test_partial_results(self, alg_classes, data):
         it = FixedIterator(3)
         for cls in alg_classes:
@@ -690,3 +1930,581 @@ class TestLoggingAlgorithm(BaseTest):
             "y": {"nine": 3 / 5, "eight": 2 / 5},
             "z": {"seven": 4 / 5}
         }
+
+
+class TestHooks(BaseTest):
+    def test_hook_info(self, data):
+        alg = Sums(iterator=ConvergenceIterator(DistanceMeasures.L1, 1e-5),
+                   solver=SolverMode.POWER)
+        infos = []
+        arrays = []
+        alg.add_hook(infos.append)
+        alg.add_hook(
+            lambda info: arrays.append((info.trust.copy(),
+                                        info.belief.copy())),
+            arrays=True
+        )
+        res = alg.run(data)
+        assert [info.iteration for info in infos] == list(
+            range(res.iterations + 1)
+        )
+        assert infos[0].distance is None
+        assert all(info.distance is not None for info in infos[1:])
+        assert infos[-1].distance < 1e-5
+        assert all(info.trust is None for info in infos)
+        times = [info.time_taken for info in infos]
+        assert times == sorted(times)
+        assert data.get_source_trust_dict(arrays[-1][0]) == res.trust
+        assert data.get_belief_dict(arrays[-1][1]) == res.belief
+
+    def test_read_only_views(self, data):
+        alg = Sums(iterator=FixedIterator(2))
+
+        def modify(info):
+            info.trust[0] = 100
+
+        alg.add_hook(modify, arrays=True)
+        with pytest.raises(ValueError):
+            alg.run(data)
+
+    def test_early_termination(self, data):
+        alg = Sums(iterator=FixedIterator(100))
+        alg.add_hook(lambda info: info.iteration == 3)
+        res = alg.run(data)
+        assert res.iterations == 3
+        assert list(alg.run_iter(data))[-1].trust == res.trust
+        assert len(list(alg.run_iter(data))) == 4
+
+        history = History(every=2)
+        alg.run(data, history=history)
+        assert list(history.iterations) == [0, 2, 3]
+
+    def test_remove_hook(self, data):
+        alg = Sums(iterator=FixedIterator(3))
+        calls = []
+
+        def hook(info):
+            calls.append(info)
+
+        alg.add_hook(hook)
+        alg.remove_hook(hook)
+        alg.run(data)
+        assert calls == []
+        with pytest.raises(ValueError):
+            alg.remove_hook(hook)
+
+
+class TestCancellation(BaseTest):
+    def test_cancel_before_run(self, data):
+        token = CancellationToken()
+        token.cancel()
+        alg = Sums(iterator=FixedIterator(5))
+        with pytest.raises(RunCancelledError):
+            alg.run(data, cancel=token)
+        assert alg.last_context.backend is None
+        # Token should not affect later runs
+        assert alg.run(data).iterations == 5
+
+    def test_cancel_between_iterations(self, data):
+        for cls in (AverageLog, Investment, PooledInvestment, Sums,
+                    TruthFinder, CRH):
+            token = CancellationToken()
+            accelerator = None
+            if cls.supports_acceleration:
+                accelerator = AndersonAccelerator()
+            alg = cls(iterator=FixedIterator(100), accelerator=accelerator)
+            alg.add_hook(
+                lambda info: info.iteration == 3 and token.cancel()
+            )
+            history = History()
+            with pytest.raises(RunCancelledError):
+                alg.run(data, history=history, cancel=token)
+            assert alg.last_context.iterator.it_count == 3
+            # States up to the cancellation should have been recorded
+            assert history.iterations[-1] == 3
+            # Backend and accelerator buffers should be released
+            assert alg.last_context.backend is None
+            assert alg.last_context.accel_input is None
+
+        token = CancellationToken()
+        results = Sums(iterator=FixedIterator(10)).run_iter(data,
+                                                            cancel=token)
+        assert next(results).iterations == 0
+        token.cancel()
+        with pytest.raises(RunCancelledError):
+            next(results)
+
+    def test_cancel_from_thread(self, data):
+        token = CancellationToken()
+        timer = threading.Timer(0.05, token.cancel)
+        alg = Sums(iterator=ConvergenceIterator(DistanceMeasures.L2, 0,
+                                                limit=10 ** 9))
+        timer.start()
+        with pytest.raises(RunCancelledError):
+            alg.run(data, cancel=token)
+        timer.join()
+        assert token.cancelled
+
+    def test_cancel_eigensolver(self, data):
+        token = CancellationToken()
+        alg = Sums(iterator=ConvergenceIterator(DistanceMeasures.L2, 1e-8),
+                   solver=SolverMode.EIGEN)
+        calls = []
+
+        def cancelling_backend(dataset):
+            # Cancel once setup has finished, so that the cancellation is
+            # seen by the eigensolver
+            backend = SparseBackend(dataset)
+            forward = backend.forward
+
+            def cancelling_forward(*args, **kwargs):
+                calls.append(1)
+                token.cancel()
+                return forward(*args, **kwargs)
+
+            backend.forward = cancelling_forward
+            return backend
+
+        alg.backend = cancelling_backend
+        with pytest.raises(RunCancelledError):
+            alg.run(data, cancel=token)
+        assert alg.last_context.backend is None
+        # Only the starting vector should be computed: the eigensolver should
+        # stop before its first product
+        assert len(calls) == 1
+
+
+class TestAsync(BaseTest):
+    def test_run_async(self, data):
+        alg = Sums(iterator=FixedIterator(10))
+        exp = alg.run(data)
+        res = asyncio.run(alg.run_async(data))
+        assert res.trust == exp.trust
+        assert res.belief == exp.belief
+        assert res.iterations == 10
+
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            res = asyncio.run(alg.run_async(data, executor=executor))
+        assert res.trust == exp.trust
+
+    def test_run_iter_async(self, data):
+        alg = Sums(iterator=FixedIterator(5))
+        exp = list(alg.run_iter(data))
+
+        async def collect():
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                return [res async for res in alg.run_iter_async(data,
+                                                                executor)]
+
+        got = asyncio.run(collect())
+        assert [r.iterations for r in got] == [r.iterations for r in exp]
+        assert [r.trust for r in got] == [r.trust for r in exp]
+
+    def test_event_loop_not_blocked(self, data):
+        alg = Sums(iterator=ConvergenceIterator(DistanceMeasures.L2, 0,
+                                                limit=10 ** 9))
+
+        async def main():
+            task = asyncio.create_task(alg.run_async(data))
+            ticks = 0
+            for _ in range(5):
+                await asyncio.sleep(0.01)
+                ticks += 1
+            assert not task.done()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return ticks
+
+        assert asyncio.run(main()) == 5
+        # Backend should have been released when the task finished
+        assert alg.last_context.backend is None
+
+    def test_cancel_run_iter_async(self, data):
+        alg = Sums(iterator=ConvergenceIterator(DistanceMeasures.L2, 0,
+                                                limit=10 ** 9))
+        seen = []
+
+        async def consume():
+            async for res in alg.run_iter_async(data):
+                seen.append(res.iterations)
+
+        async def main():
+            task = asyncio.create_task(consume())
+            while len(seen) < 3:
+                await asyncio.sleep(0.001)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+        assert seen[:3] == [0, 1, 2]
+        assert alg.last_context.backend is None
+
+
+class TestConcurrency:
+    def test_context_clones(self):
+        it = CombinedIterator(FixedIterator(5), DeadlineIterator(10))
+        accelerator = AndersonAccelerator()
+        alg = Sums(iterator=it, accelerator=accelerator)
+        ctx1 = alg.create_context()
+        ctx2 = alg.create_context()
+        assert alg.last_context is ctx2
+        assert ctx1.iterator is not it
+        assert ctx1.iterator is not ctx2.iterator
+        assert ctx1.iterator.iterators[0] is not ctx2.iterator.iterators[0]
+        assert ctx1.accelerator is not ctx2.accelerator
+        ctx1.iterator.compare(None, None)
+        assert ctx1.iterator.it_count == 1
+        assert ctx2.iterator.it_count == 0
+        assert it.it_count == 0
+
+    def test_shared_algorithm_stress(self):
+        rng = np.random.RandomState(1234)
+        datasets = []
+        for i in range(6):
+            sv = rng.randint(0, 4, size=(20 + i, 15))
+            datasets.append(MatrixDataset(ma.masked_values(sv, 0)))
+
+        algs = [
+            Sums(iterator=ConvergenceIterator(DistanceMeasures.L2, 1e-6,
+                                              limit=1000),
+                 accelerator=AndersonAccelerator(), solver=SolverMode.POWER),
+            TruthFinder(iterator=FixedIterator(15)),
+            CRH(iterator=FixedIterator(10)),
+            UnboundedSums(iterator=OrdinalConvergenceIterator(threshold=5))
+        ]
+
+        def task(job, partial):
+            alg, data = algs[job[0]], datasets[job[1]]
+            if partial:
+                return list(alg.run_iter(data))[-1]
+            return alg.run(data)
+
+        all_jobs = [(a, d) for a in range(len(algs))
+                    for d in range(len(datasets))]
+        expected = {job: task(job, False) for job in all_jobs}
+        expected_partial = {job: task(job, True) for job in all_jobs}
+
+        calls = []
+        for alg in algs:
+            alg.add_hook(calls.append)
+
+        jobs = all_jobs * 8
+        rng.shuffle(jobs)
+        partial = [i % 3 == 0 for i in range(len(jobs))]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(task, jobs, partial))
+
+        for job, is_partial, res in zip(jobs, partial, results):
+            exp = (expected_partial if is_partial else expected)[job]
+            assert res.trust == exp.trust
+            assert res.belief == exp.belief
+            assert res.iterations == exp.iterations
+        # Hooks should have been called for every iteration of every run, and
+        # for the initial state
+        assert len(calls) == sum(expected[job].iterations + 1 for job in jobs)
+
+
+class TestCheckpoint:
+    @pytest.fixture
+    def data(self):
+        sv = np.random.RandomState(99).randint(0, 5, size=(30, 20))
+        return MatrixDataset(ma.masked_values(sv, 0))
+
+    def interrupt(self, alg, data, checkpointer, iteration):
+        """
+        Run an algorithm with a checkpointer, and cancel the run at the given
+        iteration
+        """
+        token = CancellationToken()
+
+        def hook(info):
+            if info.iteration == iteration:
+                token.cancel()
+
+        alg.add_hook(hook)
+        with pytest.raises(RunCancelledError):
+            alg.run(data, cancel=token, checkpointer=checkpointer)
+        alg.remove_hook(hook)
+
+    def test_resume(self, data, tmpdir):
+        path = str(tmpdir.join("checkpoint.npz"))
+        conv_it = ConvergenceIterator(DistanceMeasures.L2, 1e-14, limit=1000)
+        configs = [
+            (cls, {"iterator": FixedIterator(20)})
+            for cls in (AverageLog, Investment, PooledInvestment, Sums,
+                        TruthFinder, UnboundedSums, CRH)
+        ] + [
+            (Sums, {"iterator": conv_it, "solver": SolverMode.POWER,
+                    "accelerator": AndersonAccelerator()}),
+            (TruthFinder, {"iterator": FixedIterator(20),
+                           "accelerator": AitkenAccelerator()}),
+            (Sums, {"iterator": CombinedIterator(FixedIterator(20),
+                                                 DeadlineIterator(100))}),
+        ]
+        for cls, kwargs in configs:
+            exp = cls(**kwargs).run(data)
+            self.interrupt(cls(**kwargs), data, Checkpointer(path, every=5),
+                           12)
+            checkpoint = Checkpoint.load(path)
+            assert checkpoint.iterations == 10
+
+            # Resume with a fresh algorithm object
+            history = History()
+            res = cls(**kwargs).resume(path, data, history=history)
+            assert res.trust == exp.trust
+            assert res.belief == exp.belief
+            assert res.iterations == exp.iterations
+            assert res.stop_reason == exp.stop_reason
+            if "accelerator" in kwargs:
+                assert (res.metadata["acceleration"]
+                        == exp.metadata["acceleration"])
+            # Only iterations after the checkpoint are run
+            assert min(history.iterations) >= 10
+            assert history.iterations[-1] == exp.iterations
+
+        assert os.listdir(str(tmpdir)) == ["checkpoint.npz"]
+
+    def test_interval(self, data, tmpdir):
+        path = str(tmpdir.join("checkpoint.npz"))
+        alg = Sums(iterator=FixedIterator(7))
+        # Tiny interval: checkpoint should be saved at every iteration
+        alg.run(data, checkpointer=Checkpointer(path, interval=1e-9))
+        assert Checkpoint.load(path).iterations == 7
+
+        # Long interval: only iterations are taken into account
+        checkpointer = Checkpointer(path, every=3, interval=1000)
+        alg.run(data, checkpointer=checkpointer)
+        assert Checkpoint.load(path).iterations == 6
+
+        with pytest.raises(ValueError):
+            Checkpointer(path)
+        with pytest.raises(ValueError):
+            Checkpointer(path, every=0)
+        with pytest.raises(ValueError):
+            Checkpointer(path, interval=-1)
+
+    def test_validation(self, data, tmpdir):
+        path = str(tmpdir.join("checkpoint.npz"))
+        alg = Sums(iterator=FixedIterator(10), priors=PriorBelief.VOTED)
+        alg.run(data, checkpointer=Checkpointer(path, every=5))
+        checkpoint = Checkpoint.load(path)
+        assert checkpoint.params == {"compress_duplicates": False,
+                                     "priors": "voted", "solver": "power"}
+        # Execution parameters may change between runs
+        Sums(iterator=FixedIterator(10), priors=PriorBelief.VOTED,
+             threads=2).resume(checkpoint, data)
+
+        other_data = MatrixDataset(ma.masked_values(data.sv + 1, 0))
+        invalid = [
+            (Sums(iterator=FixedIterator(10), priors=PriorBelief.VOTED),
+             other_data),
+            (Sums(iterator=FixedIterator(10)), data),
+            (AverageLog(iterator=FixedIterator(10),
+                        priors=PriorBelief.VOTED), data),
+            (Sums(iterator=FixedIterator(10), priors=PriorBelief.VOTED,
+                  accelerator=AitkenAccelerator()), data),
+            (Sums(iterator=ConvergenceIterator(DistanceMeasures.L1, 0.1),
+                  priors=PriorBelief.VOTED), data),
+        ]
+        for alg, dataset in invalid:
+            with pytest.raises(ValueError):
+                alg.resume(checkpoint, dataset)
+
+        not_checkpoint = str(tmpdir.join("other.npz"))
+        np.savez(not_checkpoint, trust=np.ones(3))
+        with pytest.raises(ValueError):
+            Checkpoint.load(not_checkpoint)
+
+
+class TestInference:
+    @pytest.fixture
+    def data(self):
+        sv = np.random.RandomState(7).randint(0, 4, size=(12, 8))
+        return MatrixDataset(ma.masked_values(sv, 0))
+
+    def test_same_data(self, data):
+        """
+        Inference on the dataset used to learn trust should reproduce the
+        belief from the run
+        """
+        for cls in (AverageLog, Investment, PooledInvestment, Sums):
+            alg = cls(iterator=FixedIterator(15))
+            res = alg.run(data)
+            inferred = alg.infer(alg.get_trust_model(res), data)
+            assert inferred.trust == res.trust
+            assert inferred.iterations is None
+            for var, beliefs in res.belief.items():
+                for val, belief in beliefs.items():
+                    assert inferred.belief[var][val] == pytest.approx(belief)
+
+        # TruthFinder computes belief from the trust of the previous iteration
+        alg = TruthFinder(iterator=FixedIterator(15))
+        model = alg.get_trust_model(alg.run(data))
+        exp = TruthFinder(iterator=FixedIterator(16)).run(data)
+        inferred = alg.infer(model, data)
+        for var, beliefs in exp.belief.items():
+            for val, belief in beliefs.items():
+                assert inferred.belief[var][val] == pytest.approx(belief)
+
+    def test_new_data(self):
+        model = TrustModel("Sums", Sums().get_result_params(),
+                           {"s1": 1, "s2": 0.5, "s3": 0.3})
+        new_data = Dataset([
+            ("s1", "x", "a"), ("s2", "x", "a"), ("s3", "x", "b"),
+            ("s4", "y", "c"), ("s2", "y", "d")
+        ])
+        res = Sums().infer(model, new_data)
+        assert res.trust == {"s1": 1, "s2": 0.5, "s3": 0.3, "s4": 0.6}
+        assert res.belief == {
+            "x": {"a": 1, "b": pytest.approx(0.2)},
+            "y": {"c": pytest.approx(0.4), "d": pytest.approx(1 / 3)}
+        }
+
+        res = Sums().infer(model, new_data, unknown_trust=0)
+        assert res.trust["s4"] == 0
+        assert res.belief["y"]["c"] == 0
+
+        with pytest.raises(EmptyDatasetError):
+            Sums().infer(model, Dataset([]))
+
+    def test_invalid_model(self, data):
+        model = Sums().get_trust_model(Sums().run(data))
+        with pytest.raises(ValueError):
+            Investment().infer(model, data)
+        with pytest.raises(ValueError):
+            Sums(priors=PriorBelief.VOTED).infer(model, data)
+        # Execution parameters may differ
+        Sums(threads=2).infer(model, data)
+
+        for alg in (UnboundedSums(), CRH()):
+            model = alg.get_trust_model(alg.run(data))
+            with pytest.raises(NotImplementedError):
+                alg.infer(model, data)
+
+    def test_save_load(self, data, tmpdir):
+        alg = PooledInvestment()
+        model = alg.get_trust_model(alg.run(data))
+        path = str(tmpdir.join("model.json"))
+        model.save(path)
+
+        loaded = TrustModel.load(path)
+        assert loaded.algorithm == "PooledInvestment"
+        assert loaded.params == model.params
+        assert loaded.trust == model.trust
+        exp = alg.infer(model, data)
+        assert alg.infer(path, data).belief == exp.belief
+
+        with open(path, "w") as fileobj:
+            json.dump([1, 2, 3], fileobj)
+        with pytest.raises(ValueError):
+            TrustModel.load(path)
+
+
+class TestCompression:
+    @pytest.fixture
+    def data(self):
+        rs = np.random.RandomState(3)
+        sv = rs.randint(0, 4, size=(15, 10))
+        # Add mirrors of some sources, and shuffle
+        sv = np.vstack([sv, sv[[0, 0, 0, 2, 5, 5, 7]]])
+        sv = sv[rs.permutation(len(sv))]
+        return MatrixDataset(ma.masked_values(sv, 0))
+
+    def check_results(self, res, exp):
+        assert res.trust == pytest.approx(exp.trust, rel=1e-9, abs=1e-12)
+        for var, beliefs in exp.belief.items():
+            assert res.belief[var] == pytest.approx(beliefs, rel=1e-9,
+                                                    abs=1e-12)
+
+    def test_matches_uncompressed(self, data):
+        conv_it = ConvergenceIterator(DistanceMeasures.L2, 1e-8, limit=1000)
+        configs = [
+            (AverageLog, {"iterator": conv_it, "solver": SolverMode.POWER}),
+            (Investment, {"iterator": FixedIterator(30)}),
+            (PooledInvestment, {}),
+            (Sums, {"iterator": conv_it, "solver": SolverMode.POWER,
+                    "priors": PriorBelief.VOTED}),
+            (TruthFinder, {"iterator": FixedIterator(20)}),
+            (UnboundedSums, {"iterator": FixedIterator(20)}),
+            # Extrapolation amplifies rounding errors close to convergence, so
+            # only run for a few iterations with an accelerator
+            (Sums, {"iterator": FixedIterator(8),
+                    "accelerator": AitkenAccelerator()}),
+        ]
+        for cls, kwargs in configs:
+            exp = cls(**kwargs).run(data)
+            res = cls(compress_duplicates=True, **kwargs).run(data)
+            self.check_results(res, exp)
+            assert res.iterations == exp.iterations
+            assert res.metadata["compressed_sources"] == 15
+            assert "compressed_sources" not in exp.metadata
+
+        # Eigensolver iterations count operator products, so only the
+        # results should match
+        for cls in (AverageLog, Sums):
+            exp = cls(iterator=conv_it, solver=SolverMode.EIGEN).run(data)
+            res = cls(iterator=conv_it, solver=SolverMode.EIGEN,
+                      compress_duplicates=True).run(data)
+            self.check_results(res, exp)
+
+    def test_no_reallocation(self, data, monkeypatch):
+        allocations = []
+        workspace = BaseBackend.workspace
+
+        def counting_workspace(backend, name, size):
+            buf = backend._workspace.get(name)
+            if buf is None or buf.shape != (size,):
+                allocations.append(name)
+            return workspace(backend, name, size)
+        monkeypatch.setattr(BaseBackend, "workspace", counting_workspace)
+
+        # Workspace buffers are allocated once, however many iterations run
+        for cls in (Investment, PooledInvestment, Sums, TruthFinder):
+            counts = []
+            for iterations in (5, 50):
+                del allocations[:]
+                cls(iterator=FixedIterator(iterations),
+                    compress_duplicates=True).run(data)
+                counts.append(len(allocations))
+            assert counts[0] == counts[1], cls.__name__
+
+    def test_iteration_state(self, data):
+        """
+        Hooks, history and partial results should see trust for all sources
+        """
+        alg = Sums(iterator=FixedIterator(5), compress_duplicates=True)
+        trust_sizes = []
+        alg.add_hook(lambda info: trust_sizes.append(len(info.trust)),
+                     arrays=True)
+        history = History()
+        alg.run(data, history=history)
+        assert trust_sizes == [22] * 6
+        assert history.trust.shape == (6, 22)
+        for res in alg.run_iter(data):
+            assert len(res.trust) == 22
+
+    def test_checkpoint(self, data, tmpdir):
+        path = str(tmpdir.join("checkpoint.npz"))
+        alg = Sums(iterator=FixedIterator(10), compress_duplicates=True)
+        exp = alg.run(data)
+        alg.run(data, checkpointer=Checkpointer(path, every=5))
+        assert len(Checkpoint.load(path).trust) == 15
+        with pytest.raises(ValueError):
+            Sums(iterator=FixedIterator(10)).resume(path, data)
+        assert alg.resume(path, data).trust == exp.trust
+
+    def test_trust_model(self, data):
+        alg = Sums(iterator=FixedIterator(10), compress_duplicates=True)
+        model = alg.get_trust_model(alg.run(data))
+        assert "compress_duplicates" not in model.params
+        res = Sums().infer(model, data)
+        exp = Sums(iterator=FixedIterator(10)).infer(model, data)
+        assert res.belief == exp.belief
+        assert alg.infer(model, data).belief == exp.belief
+
+    def test_unsupported(self):
+        with pytest.raises(ValueError):
+            CRH(compress_duplicates=True)
+        CRH(compress_duplicates=False)
@@ -7,17 +7,26 @@ import yaml
 
 from truthdiscovery.algorithm import (
     AverageLog,
+    DenseBackend,
     MajorityVoting,
+    MemoryMappedBackend,
+    Planner,
     PooledInvestment,
     PriorBelief,
+    SparseBackend,
     Sums,
+    ThreadedBackend,
     TruthFinder
 )
 from truthdiscovery.client import BaseClient, CommandLineClient, OutputFields
 from truthdiscovery.client.web import get_flask_app, route
-from truthdiscovery.input import MatrixDataset, SupervisedData
+from truthdiscovery.input import Dataset, MatrixDataset, SupervisedData
 from truthdiscovery.utils import (
+    AitkenAccelerator,
+    AndersonAccelerator,
+    CombinedIterator,
     ConvergenceIterator,
+    DeadlineIterator,
     DistanceMeasures,
     FixedIterator
 )
@@ -64,6 +73,24 @@ class TestBaseClient(ClientTestsBase):
         assert l2_with_limit.threshold == 0.234
         assert l2_with_limit.limit == 9
 
+        deadline = BaseClient().get_iterator("deadline-0.5", max_limit=300)
+        assert isinstance(deadline, CombinedIterator)
+        deadline_it, limit_it = deadline.iterators
+        assert isinstance(deadline_it, DeadlineIterator)
+        assert deadline_it.budget == 0.5
+        assert isinstance(limit_it, FixedIterator)
+        assert limit_it.limit == 300
+
+        combined = BaseClient().get_iterator(
+            "l2-convergence-0.001+deadline-2"
+        )
+        assert isinstance(combined, CombinedIterator)
+        conv_it, deadline_it = combined.iterators
+        assert isinstance(conv_it, ConvergenceIterator)
+        assert conv_it.threshold == 0.001
+        assert isinstance(deadline_it, DeadlineIterator)
+        assert deadline_it.budget == 2
+
         # Should be too many iterations
         with pytest.raises(ValueError):
             fixed_2000 = BaseClient().get_iterator(
@@ -87,12 +114,52 @@ class TestBaseClient(ClientTestsBase):
             "blah-convergence-0.03",
             "l1-convergence-0.03-limit",
             "l1-convergence-0.03-limit-",
-            "l1-convergence-0.03-limit-45.0"
+            "l1-convergence-0.03-limit-45.0",
+            "deadline",
+            "deadline-",
+            "deadline-soon",
+            "deadline-1+",
+            "fixed-10++deadline-1"
         )
         for it_string in invalid_it_strings:
             with pytest.raises(ValueError):
                 BaseClient().get_iterator(it_string)
 
+    def test_get_accelerator(self):
+        aitken = BaseClient().get_accelerator("aitken")
+        assert isinstance(aitken, AitkenAccelerator)
+
+        anderson = BaseClient().get_accelerator("anderson")
+        assert isinstance(anderson, AndersonAccelerator)
+        assert anderson.depth == AndersonAccelerator.depth
+
+        anderson_3 = BaseClient().get_accelerator("anderson-3")
+        assert isinstance(anderson_3, AndersonAccelerator)
+        assert anderson_3.depth == 3
+
+        invalid_acc_strings = (
+            "anderson-", "anderson-0", "anderson-x", "aitken-3", "blah"
+        )
+        for acc_string in invalid_acc_strings:
+            with pytest.raises(ValueError):
+                BaseClient().get_accelerator(acc_string)
+
+    def test_get_backend(self):
+        assert BaseClient().get_backend("sparse") is SparseBackend
+        assert BaseClient().get_backend("dense") is DenseBackend
+        assert BaseClient().get_backend("mmap") is MemoryMappedBackend
+        assert BaseClient().get_backend("threaded") is ThreadedBackend
+        assert isinstance(BaseClient().get_backend("auto"), Planner)
+
+        data = Dataset([("s1", "x", 1), ("s2", "x", 2)])
+        threaded = BaseClient().get_backend("threaded-3")(data)
+        assert isinstance(threaded, ThreadedBackend)
+        assert threaded.sc.threads == 3
+
+        for backend_string in ("threaded-0", "threaded-", "blah"):
+            with pytest.raises(ValueError):
+                BaseClient().get_backend(backend_string)
+
     def test_get_algorithm_parameter(self):
         # Iterator param
         name1, val1 = BaseClient().algorithm_parameter("iterator=fixed-99")
@@ -105,6 +172,12 @@ class TestBaseClient(ClientTestsBase):
         assert name2 == "priors"
         assert val2 == PriorBelief.VOTED
 
+        # Thread count
+        name_t, val_t = BaseClient().algorithm_parameter("threads=4")
+        assert name_t == "threads"
+        assert val_t == 4
+        assert isinstance(val_t, int)
+
         # Anything else should be a float
         name3, val3 = BaseClient().algorithm_parameter("g=1.4")
         assert name3 == "g"
@@ -126,6 +199,7 @@ class TestBaseClient(ClientTestsBase):
             f.value for f in OutputFields if f != OutputFields.ACCURACY
         }
         assert set(out1.keys()) == exp_keys
+        assert out1["stop_reason"] == "limit"
 
         sup_data = SupervisedData.from_csv(csv_fileobj)
         sup_results = alg.run(sup_data.data)
@@ -411,6 +485,14 @@ class TestCommandLineClient(ClientTestsBase):
             "mean": exp_mean, "stddev": exp_stddev
         }
 
+    def test_timings_output(self, csv_dataset, capsys):
+        self.run("run", "-a", "sums", "-f", csv_dataset, "-o", "timings")
+        results = yaml.safe_load(capsys.readouterr().out)["sums"]
+        assert set(results.keys()) == {"timings"}
+        assert set(results["timings"].keys()) == {
+            "setup", "iterations", "convergence", "materialise", "total"
+        }
+
     def test_show_most_believed_values(self, csv_dataset, capsys):
         self.run(
             "run", "-a", "voting", "-f", csv_dataset, "--output",
@@ -662,6 +744,13 @@ class TestWebClient(ClientTestsBase):
         output = resp.json["data"]
         assert set(output.keys()) == {"investment"}
         assert output["investment"]["iterations"] == 13
+        # Timings are only included when requested
+        assert "timings" not in output["investment"]
+
+        data["timings"] = "1"
+        resp = test_client.get("/run/", query_string=data)
+        timings = resp.json["data"]["investment"]["timings"]
+        assert timings["total"] >= timings["iterations"] > 0
 
     def test_run_multiple_algorithms(self, test_client, dataset):
         algorithms = ["investment", "sums", "voting"]
@@ -3,6 +3,7 @@ import numpy.ma as ma
 import pytest
 
 from truthdiscovery.algorithm import MajorityVoting
+from truthdiscovery.exceptions import RunCancelledError
 from truthdiscovery.input import (
     Dataset,
     FileDataset,
@@ -13,6 +14,7 @@ from truthdiscovery.input import (
     SyntheticData
 )
 from truthdiscovery.output import Result
+from truthdiscovery.utils import CancellationToken
 
 
 class TestDataset:
@@ -63,6 +65,27 @@ class TestDataset:
         ])
         assert np.array_equal(data.mut_ex.toarray(), expected_mut_ex)
 
+    def test_variable_sums(self, data):
+        assert np.array_equal(data.claim_var_ids, [0, 0, 0, 1, 1, 2, 2])
+        claim_vec = np.array([1, 2, 3, 4, 5, 6, 7])
+        got = data.variable_sums(claim_vec)
+        assert np.array_equal(got, [6, 6, 6, 9, 9, 13, 13])
+        assert np.array_equal(got, data.mut_ex @ claim_vec)
+
+    def test_get_claim_values(self, data):
+        with pytest.raises(ValueError):
+            data.get_claim_values()
+        numeric = Dataset([("s1", "x", 4), ("s2", "x", "5.5"), ("s1", "y", 4)])
+        values = numeric.get_claim_values()
+        assert np.array_equal(values, [4, 5.5, 4])
+        # Values are cached, so must not be modified
+        assert numeric.get_claim_values() is values
+        assert not values.flags.writeable
+        # Values only seen in skipped claims should not be converted
+        skipped = Dataset([("s1", "x", 4), ("s1", "x", "four")],
+                          allow_multiple=True)
+        assert np.array_equal(skipped.get_claim_values(), [4])
+
     def test_source_multiple_claims_for_a_single_variable(self):
         with pytest.raises(ValueError) as excinfo:
             Dataset((
@@ -106,6 +129,172 @@ class TestDataset:
         ])
         assert ds2.num_connected_components() == 3
 
+        # A source may join components that were previously separate
+        ds3 = Dataset([
+            ("s1", "x", "a"),
+            ("s2", "y", "a"),
+            ("s3", "x", "b"),
+            ("s3", "y", "b"),
+        ])
+        assert ds3.num_connected_components() == 1
+        assert Dataset([]).num_connected_components() == 0
+
+    def test_get_connected_components(self):
+        data = Dataset([
+            ("s1", "x", "a"),
+            ("s2", "y", "a"),
+            ("s3", "x", "b"),
+            ("s4", "z", "a"),
+            ("s5", "z", "b"),
+            ("s6", "w", "a"),
+        ])
+        comps = data.get_connected_components()
+        got = sorted(
+            sorted(data.source_ids.inverse[s_id] for s_id in comp)
+            for comp in comps
+        )
+        assert got == [["s1", "s3"], ["s2"], ["s4", "s5"], ["s6"]]
+
+    def test_get_sub_dataset(self):
+        data = Dataset([
+            ("s1", "x", "a"),
+            ("s2", "y", "a"),
+            ("s3", "x", "b"),
+            ("s4", "z", "a"),
+            ("s3", "z", "c"),
+        ], implication_function=lambda var, v1, v2: 0.5)
+        sub = data.get_sub_dataset([
+            data.source_ids["s1"], data.source_ids["s3"],
+            data.source_ids["s4"]
+        ])
+        assert sub.num_sources == 3
+        assert sub.num_variables == 2
+        assert sub.num_claims == 4
+        assert set(sub.source_ids) == {"s1", "s3", "s4"}
+        assert set(sub.var_ids) == {"x", "z"}
+
+        # Check source/claim structure is preserved, in terms of labels
+        def labelled_claims(dataset):
+            claims = set()
+            for s_id, claim_id in zip(*dataset.sc.nonzero()):
+                var_id, val_hash = dataset.claim_ids.inverse[claim_id]
+                claims.add((
+                    dataset.source_ids.inverse[s_id],
+                    dataset.var_ids.inverse[var_id],
+                    dataset.val_hashes.inverse[val_hash]
+                ))
+            return claims
+        assert labelled_claims(sub) == {
+            ("s1", "x", "a"), ("s3", "x", "b"), ("s4", "z", "a"),
+            ("s3", "z", "c")
+        }
+        for claim_id, var_id in enumerate(sub.claim_var_ids):
+            assert sub.claim_ids.inverse[claim_id][0] == var_id
+        assert sub.mut_ex.shape == (4, 4)
+        assert sub.imp.nnz == 4
+
+    def test_cancel_implication(self, monkeypatch):
+        triples = [("s1", "x", 1), ("s2", "x", 2), ("s3", "x", 3)]
+        calls = []
+
+        def imp(var, val1, val2):
+            calls.append((val1, val2))
+            token.cancel()
+            return 0.5
+
+        # Check both dense and sparse matrix construction
+        for threshold in (Dataset.dense_threshold, 0):
+            monkeypatch.setattr(Dataset, "dense_threshold", threshold)
+            calls.clear()
+            token = CancellationToken()
+            with pytest.raises(RunCancelledError):
+                Dataset(triples, implication_function=imp, cancel=token)
+            assert len(calls) == 1
+
+    def test_fingerprint(self):
+        triples = [("s1", "x", 1), ("s2", "x", 2), ("s3", "y", 3)]
+        data = Dataset(triples)
+        assert data.fingerprint() == Dataset(triples).fingerprint()
+        assert data.fingerprint() == Dataset(list(triples)).fingerprint()
+
+        changed_value = Dataset(triples[:2] + [("s3", "y", 4)])
+        changed_source = Dataset(triples[:2] + [("s4", "y", 3)])
+        for other in (changed_value, changed_source, Dataset(triples[:2])):
+            assert other.fingerprint() != data.fingerprint()
+
+        sub = data.get_sub_dataset([data.source_ids["s1"],
+                                    data.source_ids["s2"]])
+        assert sub.fingerprint() == Dataset(triples[:2]).fingerprint()
+
+    def test_compress_sources(self, monkeypatch):
+        triples = [
+            ("s1", "x", 1), ("s1", "y", 2),
+            ("s2", "x", 2),
+            ("s3", "x", 1), ("s3", "y", 2),
+            ("s4", "x", 2),
+            ("s5", "x", 1), ("s5", "y", 2),
+            ("s6", "x", 1),
+        ]
+        for threshold in (Dataset.dense_threshold, 0):
+            monkeypatch.setattr(Dataset, "dense_threshold", threshold)
+            data = Dataset(triples)
+            compressed, source_map = data.compress_sources()
+            assert compressed.num_sources == 3
+            assert set(compressed.source_ids) == {"s1", "s2", "s6"}
+            assert list(source_map) == [0, 1, 0, 1, 0, 2]
+            assert list(compressed.source_weights) == [3, 2, 1]
+            # Claims and variables should keep their IDs
+            assert compressed.claim_ids == data.claim_ids
+            assert compressed.var_ids == data.var_ids
+            assert np.array_equal(compressed.sc.toarray(),
+                                  data.sc.toarray()[[0, 1, 5]])
+
+            # Datasets without duplicates are not copied
+            unique = Dataset(triples[:3])
+            uncompressed, source_map = unique.compress_sources()
+            assert uncompressed is unique
+            assert uncompressed.source_weights is None
+            assert list(source_map) == [0, 1]
+
+    def test_dense_storage(self, monkeypatch):
+        triples = [
+            ("s1", "x", 1), ("s1", "y", 2), ("s2", "x", 2), ("s2", "y", 2),
+            ("s3", "x", 3), ("s3", "z", 1)
+        ]
+
+        def imp_func(var, val1, val2):
+            return (val1 - val2) / 4
+
+        dense = Dataset(triples, implication_function=imp_func)
+        assert isinstance(dense.sc_dense, np.ndarray)
+        assert dense.sc_dense.flags.c_contiguous
+        # Sparse matrices are created when first accessed
+        assert "sc" not in dense.__dict__
+        assert dense.sc.nnz == 6
+        assert "sc" in dense.__dict__
+
+        monkeypatch.setattr(Dataset, "dense_threshold", 0)
+        sparse = Dataset(triples, implication_function=imp_func)
+        assert sparse.sc_dense is None
+        assert sparse.mut_ex_dense is None
+        assert sparse.imp_dense is None
+
+        for name in ("sc", "mut_ex", "imp"):
+            dense_mat = getattr(dense, "{}_dense".format(name))
+            assert np.array_equal(dense_mat, getattr(sparse, name).toarray())
+            assert np.array_equal(getattr(dense, name).toarray(),
+                                  getattr(sparse, name).toarray())
+
+        # Sub-datasets should be stored in the same way as the original
+        source_ids = [0, 2]
+        dense_sub = dense.get_sub_dataset(source_ids)
+        sparse_sub = sparse.get_sub_dataset(source_ids)
+        assert dense_sub.sc_dense is not None
+        assert sparse_sub.sc_dense is None
+        for name in ("sc", "mut_ex", "imp"):
+            assert np.array_equal(getattr(dense_sub, name).toarray(),
+                                  getattr(sparse_sub, name).toarray())
+
 
 class TestIDMapping:
     def test_insert(self):
@@ -1,13 +1,18 @@
+import time
+
 import pytest
 
 import numpy as np
 
 from truthdiscovery.utils import (
+    CombinedIterator,
     ConvergenceIterator,
+    DeadlineIterator,
     DistanceMeasures,
     FixedIterator,
     Iterator,
-    OrdinalConvergenceIterator
+    OrdinalConvergenceIterator,
+    StopReason
 )
 from truthdiscovery.exceptions import ConvergenceError
 
@@ -114,6 +119,12 @@ class TestDistanceMeasures:
             measure, np.array(obj1), np.array(obj2)
         )
         assert got == exp_distance
+        # Result should be the same when using a buffer
+        buf = np.empty((len(obj1),))
+        got_buf = ConvergenceIterator.get_distance(
+            measure, np.array(obj1), np.array(obj2), out=buf
+        )
+        assert got_buf == exp_distance
 
     def test_l1(self):
         self.check(DistanceMeasures.L1, [1, 2, 3, 4], [0, 3, -4, 1], 12)
@@ -158,3 +169,134 @@ class TestOrdinalConvergenceIterator:
         exp = np.array([0, 2, 1, 0])
         got = OrdinalConvergenceIterator.get_ranking_vector(v)
         assert np.all(got == exp)
+
+    def test_matches_reference(self):
+        def reference(v):
+            # Previous (loop-based) implementation
+            sorted_scores = v[np.argsort(v)]
+            rank = 0
+            rank_mapping = {}
+            for i, sc in enumerate(sorted_scores):
+                if i > 0 and sc > sorted_scores[i - 1]:
+                    rank += 1
+                rank_mapping[sc] = rank
+            return np.array([rank_mapping[sc] for sc in v])
+
+        rng = np.random.RandomState(0)
+        for size in (0, 1, 2, 50, 1000):
+            # Include ties
+            v = rng.randint(0, max(size // 3, 1), size=size).astype(float)
+            got = OrdinalConvergenceIterator.get_ranking_vector(v)
+            assert np.array_equal(got, reference(v))
+
+    def test_top_k(self):
+        v = np.array([0.5, 0.9, 0.1, 0.9, 0.7, 0.5])
+        top = OrdinalConvergenceIterator.get_top_k
+        assert list(top(v, 1)) == [1]
+        assert list(top(v, 3)) == [1, 3, 4]
+        # Ties at the boundary are broken by index
+        assert list(top(v, 4)) == [1, 3, 4, 0]
+        assert list(top(v, 6)) == [1, 3, 4, 0, 5, 2]
+        assert list(top(v, 100)) == [1, 3, 4, 0, 5, 2]
+
+        with pytest.raises(ValueError):
+            OrdinalConvergenceIterator(top_k=0)
+
+    def test_top_k_convergence(self):
+        # Top 2 entries stay the same, but the order of the others changes
+        vectors = [
+            np.array([5, 4, 1, 2, 3]),
+            np.array([5, 4, 3, 2, 1]),
+            np.array([5, 4, 2, 3, 1]),
+            np.array([5, 4, 1, 2, 3]),
+        ]
+        full = OrdinalConvergenceIterator(threshold=3)
+        top = OrdinalConvergenceIterator(threshold=3, top_k=2)
+        for it in (full, top):
+            for old, new in zip(vectors[:-1], vectors[1:]):
+                it.compare(old, new)
+        assert not full.finished()
+        assert top.finished()
+
+        top.compare(vectors[0], np.array([4, 5, 1, 2, 3]))
+        assert not top.finished()
+        top.reset()
+        assert top.current_count == 0
+
+
+class TestDeadlineIterator:
+    def test_invalid_budget(self):
+        with pytest.raises(ValueError):
+            DeadlineIterator(-0.1)
+
+    def test_finish_condition(self):
+        it = DeadlineIterator(0.05)
+        assert not it.finished()
+        assert it.get_stop_reason() is None
+        assert 0 < it.time_remaining() <= 0.05
+        time.sleep(0.06)
+        assert it.finished()
+        assert it.get_stop_reason() == StopReason.DEADLINE
+
+        # Budget should be measured from the last reset
+        it.reset()
+        assert not it.finished()
+        assert it.get_stop_reason() is None
+
+        assert DeadlineIterator(0).finished()
+
+
+class TestCombinedIterator:
+    def test_no_iterators(self):
+        with pytest.raises(ValueError):
+            CombinedIterator()
+
+    def test_finish_condition(self):
+        conv = ConvergenceIterator(DistanceMeasures.L1, 0.5)
+        it = CombinedIterator(conv, FixedIterator(10))
+        assert it.current_distance is None
+        it_count = 0
+        while not it.finished():
+            it_count += 1
+            it.compare(np.array([1]), np.array([2]))
+        assert it_count == 10
+        assert it.it_count == 10
+        assert it.current_distance == 1
+        assert it.get_stop_reason() == StopReason.LIMIT
+
+        # Reset should reset all iterators
+        it.reset()
+        assert it.it_count == 0
+        assert conv.it_count == 0
+        assert not it.finished()
+        assert it.get_stop_reason() is None
+        it.compare(np.array([1]), np.array([1.1]))
+        assert it.finished()
+        assert it.get_stop_reason() == StopReason.CONVERGED
+
+        deadline = CombinedIterator(FixedIterator(10), DeadlineIterator(0))
+        assert deadline.finished()
+        assert deadline.get_stop_reason() == StopReason.DEADLINE
+
+    def test_state(self):
+        conv = ConvergenceIterator(DistanceMeasures.L1, 0.5)
+        it = CombinedIterator(conv, FixedIterator(10), DeadlineIterator(100))
+        for _ in range(3):
+            it.compare(np.array([1]), np.array([2]))
+        state = it.get_state()
+
+        new_conv = ConvergenceIterator(DistanceMeasures.L1, 0.5)
+        new_deadline = DeadlineIterator(100)
+        new = CombinedIterator(new_conv, FixedIterator(10), new_deadline)
+        new.set_state(state)
+        assert new.it_count == 3
+        assert new_conv.it_count == 3
+        assert new_conv.current_distance == 1
+        # Time already spent should count towards the budget
+        elapsed = state["iterators"][2]["elapsed"]
+        assert new_deadline.time_remaining() <= 100 - elapsed
+
+        with pytest.raises(ValueError):
+            FixedIterator(10).set_state(state)
+        with pytest.raises(ValueError):
+            CombinedIterator(FixedIterator(10)).set_state(state)
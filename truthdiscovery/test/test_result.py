@@ -1,12 +1,13 @@
+import os
 from unittest.mock import Mock, patch
 
 import numpy as np
 import pytest
 
-from truthdiscovery.algorithm import MajorityVoting, Sums
+from truthdiscovery.algorithm import CRH, MajorityVoting, Sums, TruthFinder
 from truthdiscovery.input import Dataset
-from truthdiscovery.output import Result, ResultDiff
-from truthdiscovery.utils import FixedIterator
+from truthdiscovery.output import History, Result, ResultDiff
+from truthdiscovery.utils import FixedIterator, StopReason
 
 
 # Make a mocked time.time() function that returns increasing multiples of 5
@@ -26,7 +27,10 @@ class TestResult:
             "y": {"red": 0.1, "blue": 0.8, "green": 0},
             "z": {"red": 0.7, "blue": 0.7, "green": 1},
         }
-        return Result(trust, belief, time_taken=0.5, iterations=100)
+        return Result(trust, belief, time_taken=0.5, iterations=100,
+                      metadata={"backend": "SparseBackend"},
+                      timings={"setup": 0.1, "total": 0.5},
+                      stop_reason=StopReason.CONVERGED)
 
     def test_most_believed_values(self):
         test_data = (
@@ -68,6 +72,9 @@ class TestResult:
         assert set(source_filtered.trust.keys()) == {"s1", "s3"}
         assert source_filtered.iterations == res.iterations
         assert source_filtered.time_taken == res.time_taken
+        assert source_filtered.metadata == res.metadata
+        assert source_filtered.timings == res.timings
+        assert source_filtered.stop_reason == StopReason.CONVERGED
         # belief should not be affected when only filtering on sources
         assert source_filtered.belief == res.belief
         # trust/belief dicts should be copies
@@ -215,3 +222,112 @@ class TestResultDiff:
         )
         diff = ResultDiff(res1, res2)
         assert diff.iterations is None
+
+
+class TestHistory:
+    @pytest.fixture
+    def data(self):
+        return Dataset([
+            ("s1", "x", 1), ("s1", "y", 4), ("s1", "z", 7),
+            ("s2", "x", 1), ("s2", "y", 5),
+            ("s3", "x", 2), ("s3", "z", 7), ("s3", "w", 3),
+            ("s4", "y", 6),
+        ])
+
+    def test_full_history(self, data):
+        alg = Sums(iterator=FixedIterator(40))
+        history = History()
+        # Small capacity so that arrays are resized during the run
+        history.initial_capacity = 4
+        res = alg.run(data, history=history)
+        partial = list(alg.run_iter(data))
+        assert len(history) == len(partial) == 41
+        assert np.array_equal(history.iterations, np.arange(41))
+        assert history.trust.shape == (41, data.num_sources)
+        assert history.belief.shape == (41, data.num_claims)
+        assert history.trust_ids is None
+        assert np.all(np.diff(history.times) >= 0)
+        for exp, got in zip(partial, history.results()):
+            assert got.iterations == exp.iterations
+            assert got.trust == exp.trust
+            assert got.belief == exp.belief
+        assert history.get_result(-1).trust == res.trust
+        with pytest.raises(IndexError):
+            history.get_result(41)
+
+    def test_initial_state(self, data):
+        for cls in (Sums, TruthFinder, CRH):
+            history = History()
+            cls(iterator=FixedIterator(3)).run(data, history=history)
+            assert list(history.iterations) == [0, 1, 2, 3]
+
+    def test_subsampling(self, data):
+        history = History(every=3, belief=False)
+        Sums(iterator=FixedIterator(10)).run(data, history=history)
+        # Final iteration is always recorded
+        assert list(history.iterations) == [0, 3, 6, 9, 10]
+        assert history.belief is None
+        assert history.get_result(1).belief == {}
+
+        with pytest.raises(ValueError):
+            History(every=0)
+        with pytest.raises(ValueError):
+            History(top=0)
+
+    def test_final_state(self, data):
+        history = History()
+        history.start(data)
+        trust = np.zeros(data.num_sources)
+        belief = np.zeros(data.num_claims)
+        history.record(0, 0, trust, belief)
+        history.record(1, 0.5, trust, belief)
+        # The final state replaces the last row if it is for the same
+        # iteration
+        history.record(1, 0.75, trust + 1, belief + 2, final=True)
+        assert list(history.iterations) == [0, 1]
+        assert list(history.times) == [0, 0.75]
+        assert np.all(history.trust[1] == 1)
+        assert np.all(history.belief[1] == 2)
+        # Other records for the same iteration are ignored
+        history.record(1, 1, trust, belief)
+        assert len(history) == 2
+        assert np.all(history.trust[1] == 1)
+
+    def test_top(self, data):
+        alg = Sums(iterator=FixedIterator(5))
+        history = History(top=2)
+        res = alg.run(data, history=history)
+        assert history.trust.shape == (6, 2)
+        assert history.trust_ids.shape == (6, 2)
+        final = history.get_result(-1)
+        exp_trust = sorted(res.trust.items(), key=lambda x: -x[1])[:2]
+        assert sorted(final.trust.items(), key=lambda x: -x[1]) == exp_trust
+        # Scores are in decreasing order
+        assert np.all(np.diff(history.belief, axis=1) <= 0)
+        for var, beliefs in final.belief.items():
+            for val, belief in beliefs.items():
+                assert res.belief[var][val] == belief
+
+        # Top larger than the number of sources
+        history = History(top=100)
+        alg.run(data, history=history)
+        assert history.trust.shape == (6, data.num_sources)
+
+    def test_memory_mapped(self, data, tmpdir):
+        alg = Sums(iterator=FixedIterator(10))
+        in_memory = History()
+        alg.run(data, history=in_memory)
+        for directory in (str(tmpdir), True):
+            history = History(directory=directory)
+            history.initial_capacity = 2
+            alg.run(data, history=history)
+            assert isinstance(history.trust, np.memmap)
+            assert np.array_equal(history.trust, in_memory.trust)
+            assert np.array_equal(history.belief, in_memory.belief)
+            temp_dir = history._temp_dir
+            history.close()
+            assert len(history) == 0
+            if directory is True:
+                assert not os.path.exists(temp_dir)
+        saved = np.load(os.path.join(str(tmpdir), "trust.npy"))
+        assert np.array_equal(saved[:len(in_memory)], in_memory.trust)
@@ -1,9 +1,19 @@
+from truthdiscovery.utils.acceleration import (
+    Accelerator,
+    AitkenAccelerator,
+    AndersonAccelerator
+)
+from truthdiscovery.utils.cancellation import CancellationToken
+from truthdiscovery.utils.checkpoint import Checkpoint, Checkpointer
 from truthdiscovery.utils.iterator import (
+    CombinedIterator,
     ConvergenceIterator,
+    DeadlineIterator,
     DistanceMeasures,
     FixedIterator,
     Iterator,
-    OrdinalConvergenceIterator
+    OrdinalConvergenceIterator,
+    StopReason
 )
 
 
@@ -0,0 +1,137 @@
+import copy
+
+import numpy as np
+
+
+class Accelerator:
+    """
+    Base class for convergence accelerators, which extrapolate from the
+    sequence of iterates produced by a fixed-point algorithm to reach the fixed
+    point in fewer iterations
+    """
+    #: Names of attributes holding lists of previous iterates
+    state_attributes = ()
+
+    def extrapolate(self, x, gx):
+        """
+        Compute the next iterate
+
+        :param x:  the input to the most recent iteration
+        :param gx: the output of the most recent iteration, i.e. the result of
+                   applying the fixed-point map to ``x``
+        :return:   the iterate to use as input to the next iteration
+        """
+        raise NotImplementedError("Must be implemented in child classes")
+
+    def reset(self):
+        """
+        Discard any history kept from previous iterations
+        """
+
+    def clone(self):
+        """
+        :return: a copy of this accelerator with no history, for use in a
+                 separate run
+        """
+        new = copy.copy(self)
+        new.reset()
+        return new
+
+    def get_state(self):
+        """
+        :return: a dict mapping the name of each list of previous iterates
+                 kept by the accelerator to a copy of the list, for use in
+                 checkpoints
+        """
+        return {name: [np.copy(vec) for vec in getattr(self, name)]
+                for name in self.state_attributes}
+
+    def set_state(self, state):
+        """
+        Restore the history of iterates from a dict returned by
+        :meth:`get_state`
+        """
+        for name in self.state_attributes:
+            setattr(self, name, [np.copy(vec) for vec in state[name]])
+
+
+class AitkenAccelerator(Accelerator):
+    """
+    Entry-wise Aitken delta-squared extrapolation, applied in the style of
+    Steffensen's method: after every two plain iterations, the sequence is
+    restarted from the extrapolated point
+    """
+    state_attributes = ("history",)
+
+    def __init__(self):
+        self.history = []
+
+    def extrapolate(self, x, gx):
+        if not self.history:
+            self.history.append(x)
+        self.history.append(gx)
+        if len(self.history) < 3:
+            return gx
+
+        x0, x1, x2 = self.history
+        denom = x2 - 2 * x1 + x0
+        # Fall back to the plain iterate where the denominator vanishes (this
+        # happens for entries that have already converged)
+        safe = np.abs(denom) > np.finfo(float).eps * np.maximum(np.abs(x2), 1)
+        result = np.copy(x2)
+        result[safe] = x0[safe] - (x1[safe] - x0[safe]) ** 2 / denom[safe]
+        self.history = []
+        return result
+
+    def reset(self):
+        self.history = []
+
+
+class AndersonAccelerator(Accelerator):
+    """
+    Anderson mixing (type II). The next iterate is an affine combination of the
+    most recent outputs of the fixed-point map, with coefficients chosen to
+    minimise the norm of the combined residual
+    """
+    depth = 5
+    state_attributes = ("outputs", "residuals")
+
+    def __init__(self, depth=None):
+        """
+        :param depth: the number of previous iterations to use in the
+                      extrapolation (the 'memory depth')
+        :raises ValueError: if ``depth`` is not positive
+        """
+        if depth is not None:
+            if depth < 1:
+                raise ValueError("Memory depth must be positive")
+            self.depth = depth
+        self.outputs = []
+        self.residuals = []
+
+    def extrapolate(self, x, gx):
+        self.outputs.append(gx)
+        self.residuals.append(gx - x)
+        if len(self.outputs) > self.depth + 1:
+            self.outputs.pop(0)
+            self.residuals.pop(0)
+        if len(self.outputs) < 2:
+            return gx
+
+        # Solve min || f_k - dF gamma || for gamma by least squares, where the
+        # columns of dF are differences between successive residuals
+        d_res = np.diff(np.array(self.residuals), axis=0).T
+        d_out = np.diff(np.array(self.outputs), axis=0).T
+        if not np.all(np.isfinite(d_res)):
+            self.reset()
+            return gx
+        try:
+            gamma, *_ = np.linalg.lstsq(d_res, self.residuals[-1], rcond=None)
+        except np.linalg.LinAlgError:  # pragma: no cover
+            self.reset()
+            return gx
+        return gx - d_out @ gamma
+
+    def reset(self):
+        self.outputs = []
+        self.residuals = []
@@ -0,0 +1,45 @@
+import threading
+
+from truthdiscovery.exceptions import RunCancelledError
+
+
+class CancellationToken:
+    """
+    Token used to cancel a run that is in progress, possibly from another
+    thread. The token is passed to :meth:`BaseIterativeAlgorithm.run` (or
+    :meth:`BaseIterativeAlgorithm.run_iter`), which checks it between
+    iterations and during long setup phases, and raises
+    :any:`RunCancelledError` once :meth:`cancel` has been called: ::
+
+        token = CancellationToken()
+        threading.Timer(5, token.cancel).start()
+        try:
+            results = alg.run(mydata, cancel=token)
+        except RunCancelledError:
+            print("run took too long")
+
+    Cancellation is cooperative, so an iteration that is in progress is
+    completed before the run stops.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """
+        Request that runs using this token stop
+        """
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        """
+        True if :meth:`cancel` has been called
+        """
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        """
+        :raises RunCancelledError: if :meth:`cancel` has been called
+        """
+        if self._event.is_set():
+            raise RunCancelledError("Run was cancelled")
@@ -0,0 +1,215 @@
+import json
+import os
+import time
+
+import numpy as np
+
+
+class Checkpoint:
+    """
+    The state of an iterative algorithm part way through a run: trust, belief,
+    the progress of the iterator and accelerator, and the parameters of the
+    algorithm. Checkpoints are created by a :any:`Checkpointer` and used to
+    continue a run with :meth:`BaseIterativeAlgorithm.resume`.
+
+    Checkpoints are stored as uncompressed ``.npz`` files, with the
+    description of the run stored as JSON alongside the arrays.
+    """
+    #: Version of the file format
+    VERSION = 1
+
+    def __init__(self, algorithm, params, fingerprint, trust, belief,
+                 iterator_state, accelerator=None, accelerator_state=None,
+                 accel_input=None, accel_state=None):
+        """
+        :param algorithm:         name of the algorithm class
+        :param params:            dict of algorithm parameters, as returned
+                                  by ``get_result_params``
+        :param fingerprint:       fingerprint of the dataset (see
+                                  :meth:`Dataset.fingerprint`)
+        :param trust:             numpy array of trust values
+        :param belief:            numpy array of belief values
+        :param iterator_state:    dict returned by :meth:`Iterator.get_state`
+        :param accelerator:       name of the accelerator class, or None
+        :param accelerator_state: dict returned by
+                                  :meth:`Accelerator.get_state` (optional)
+        :param accel_input:       numpy array of the input to the accelerator
+                                  at the latest iteration (optional)
+        :param accel_state:       dict returned by
+                                  :meth:`RunContext.get_accel_state`
+                                  (optional)
+        """
+        self.algorithm = algorithm
+        self.params = params
+        self.fingerprint = fingerprint
+        self.trust = trust
+        self.belief = belief
+        self.iterator_state = iterator_state
+        self.accelerator = accelerator
+        self.accelerator_state = accelerator_state or {}
+        self.accel_input = accel_input
+        self.accel_state = accel_state or {}
+
+    @property
+    def iterations(self):
+        """
+        The number of iterations completed when the checkpoint was created
+        """
+        return self.iterator_state["it_count"]
+
+    def save(self, path):
+        """
+        Write the checkpoint to a file. The file is written under a temporary
+        name and then renamed, so an existing checkpoint at ``path`` is only
+        replaced once the new one is complete
+
+        :param path: path of the file to write
+        """
+        meta = {
+            "version": self.VERSION,
+            "algorithm": self.algorithm,
+            "params": self.params,
+            "fingerprint": self.fingerprint,
+            "iterator": self.iterator_state,
+            "accelerator": self.accelerator,
+            # The fallback array is stored separately from the other
+            # (scalar) safeguard state
+            "accel_state": {key: val for key, val in self.accel_state.items()
+                            if key != "fallback"},
+        }
+        arrays = {
+            "meta": np.array(json.dumps(meta)),
+            "trust": self.trust,
+            "belief": self.belief,
+        }
+        if self.accel_input is not None:
+            arrays["accel_input"] = self.accel_input
+        if self.accel_state.get("fallback") is not None:
+            arrays["accel_fallback"] = self.accel_state["fallback"]
+        for name, vectors in self.accelerator_state.items():
+            arrays["accelerator_" + name] = np.array(vectors)
+
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            with open(temp_path, "wb") as fileobj:
+                np.savez(fileobj, **arrays)
+                fileobj.flush()
+                os.fsync(fileobj.fileno())
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a checkpoint written by :meth:`save`
+
+        :param path: path of the file to read
+        :return:     a :any:`Checkpoint` object
+        :raises ValueError: if the file is not a checkpoint in a supported
+                            format
+        """
+        with np.load(path, allow_pickle=False) as npz:
+            if "meta" not in npz:
+                raise ValueError("File is not a checkpoint")
+            meta = json.loads(str(npz["meta"]))
+            if meta.get("version") != cls.VERSION:
+                raise ValueError(
+                    "Unsupported checkpoint version: {}".format(
+                        meta.get("version")
+                    )
+                )
+            prefix = "accelerator_"
+            accelerator_state = {
+                key[len(prefix):]: list(npz[key])
+                for key in npz.files if key.startswith(prefix)
+            }
+            accel_input = None
+            if "accel_input" in npz:
+                accel_input = npz["accel_input"]
+            accel_state = meta.get("accel_state") or {}
+            if accel_state:
+                accel_state["fallback"] = (npz["accel_fallback"]
+                                           if "accel_fallback" in npz
+                                           else None)
+            return cls(
+                algorithm=meta["algorithm"],
+                params=meta["params"],
+                fingerprint=meta["fingerprint"],
+                trust=npz["trust"],
+                belief=npz["belief"],
+                iterator_state=meta["iterator"],
+                accelerator=meta["accelerator"],
+                accelerator_state=accelerator_state,
+                accel_input=accel_input,
+                accel_state=accel_state
+            )
+
+
+class Checkpointer:
+    """
+    Periodically save a :any:`Checkpoint` during a run, so that the run can be
+    continued with :meth:`BaseIterativeAlgorithm.resume` if it is interrupted:
+    ::
+
+        checkpointer = Checkpointer("run.npz", every=100, interval=600)
+        alg.run(mydata, checkpointer=checkpointer)
+        # after an interruption...
+        alg.resume("run.npz", mydata)
+
+    Each checkpoint replaces the previous one.
+    """
+    def __init__(self, path, every=None, interval=None):
+        """
+        :param path:     path of the checkpoint file
+        :param every:    save a checkpoint every ``every`` iterations
+                         (optional)
+        :param interval: save a checkpoint when at least ``interval`` seconds
+                         have passed since the last one (optional)
+        :raises ValueError: if neither ``every`` nor ``interval`` is given, or
+                            if either is not positive
+        """
+        if every is None and interval is None:
+            raise ValueError("One of 'every' or 'interval' must be given")
+        if every is not None and every < 1:
+            raise ValueError("'every' must be positive")
+        if interval is not None and interval <= 0:
+            raise ValueError("'interval' must be positive")
+        self.path = path
+        self.every = every
+        self.interval = interval
+        self._last_iteration = 0
+        self._last_time = None
+
+    def start(self, iteration):
+        """
+        Prepare to save checkpoints for a run
+
+        :param iteration: the number of iterations already completed (non-zero
+                          when resuming)
+        """
+        self._last_iteration = iteration
+        self._last_time = time.perf_counter()
+
+    def is_due(self, iteration):
+        """
+        :param iteration: the number of iterations completed
+        :return: True if a checkpoint should be saved at this iteration
+        """
+        if iteration == self._last_iteration:
+            return False
+        if self.every is not None and iteration % self.every == 0:
+            return True
+        return (self.interval is not None
+                and time.perf_counter() - self._last_time >= self.interval)
+
+    def save(self, checkpoint):
+        """
+        Save a checkpoint, replacing the previous one
+
+        :param checkpoint: :any:`Checkpoint` object
+        """
+        checkpoint.save(self.path)
+        self._last_iteration = checkpoint.iterations
+        self._last_time = time.perf_counter()
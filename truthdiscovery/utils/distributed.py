@@ -0,0 +1,487 @@
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import socket
+import struct
+
+import numpy as np
+import scipy.sparse
+
+from truthdiscovery.utils.spmv import get_row_bounds, RowBlocks
+
+#: Message commands. Each message consists of a header (command, argument,
+#: number of arrays) followed by the arrays
+SETUP = 1
+MULTIPLY = 2
+RESULT = 3
+END_SESSION = 4
+SHUTDOWN = 5
+ERROR = 6
+
+_HEADER = struct.Struct("!iiI")
+_ARRAY_HEADER = struct.Struct("!16sIQ")
+
+#: Environment variable holding the secret shared by workers and coordinators
+#: if none is given explicitly
+SECRET_ENV = "TRUTHDISCOVERY_WORKER_SECRET"
+#: Default limit on the total size in bytes of the arrays in a message
+MAX_MESSAGE_BYTES = 2 ** 31
+#: Limits on the number of arrays in a message and dimensions of an array
+MAX_ARRAYS = 4096
+MAX_NDIM = 32
+#: Kinds of numpy dtype which may be sent (bool, int, unsigned int, float)
+_ARRAY_KINDS = "biuf"
+
+_NONCE_SIZE = 32
+_DIGEST = hashlib.sha256
+
+
+class AuthenticationError(ConnectionError):
+    """
+    Raised when a peer fails to prove that it knows the shared secret
+    """
+
+
+def get_secret(secret=None):
+    """
+    :param secret: shared secret as bytes or str (optional)
+    :return: ``secret`` as bytes, or the value of the environment variable
+             named by :data:`SECRET_ENV` if ``secret`` is None
+    :raises ValueError: if no secret is given and the environment variable is
+                        not set
+    """
+    if secret is None:
+        secret = os.environ.get(SECRET_ENV)
+        if not secret:
+            raise ValueError(
+                "A shared secret must be given, or set in the environment "
+                "variable {}".format(SECRET_ENV)
+            )
+    if isinstance(secret, str):
+        secret = secret.encode()
+    return secret
+
+
+def _prove(sock, secret):
+    """
+    Answer a challenge from the peer: receive a random nonce and reply with
+    its HMAC under the shared secret
+    """
+    nonce = _recv_exact(sock, _NONCE_SIZE)
+    sock.sendall(hmac.new(secret, nonce, _DIGEST).digest())
+
+
+def _verify(sock, secret):
+    """
+    Challenge the peer to prove that it knows the shared secret
+
+    :raises AuthenticationError: if the peer's reply is wrong
+    """
+    nonce = secrets.token_bytes(_NONCE_SIZE)
+    sock.sendall(nonce)
+    expected = hmac.new(secret, nonce, _DIGEST).digest()
+    if not hmac.compare_digest(_recv_exact(sock, len(expected)), expected):
+        raise AuthenticationError("Peer failed authentication")
+
+
+def authenticate(sock, secret, server):
+    """
+    Perform mutual challenge-response authentication with a shared secret.
+    Each side sends a random nonce and checks that the other replies with the
+    HMAC-SHA256 of the nonce under the secret, so the secret itself is never
+    sent. The server challenges first, so that a client which does not know
+    the secret learns nothing before being disconnected
+
+    :param sock:   connected socket
+    :param secret: shared secret as bytes
+    :param server: True for the worker end of the connection, and False for
+                   the coordinator
+    :raises AuthenticationError: if the peer does not know the secret, or
+                                 closes the connection during authentication
+    """
+    try:
+        if server:
+            _verify(sock, secret)
+            _prove(sock, secret)
+        else:
+            _prove(sock, secret)
+            _verify(sock, secret)
+    except AuthenticationError:
+        raise
+    except ConnectionError as ex:
+        # Peers close the connection when authentication fails
+        raise AuthenticationError(
+            "Connection closed during authentication"
+        ) from ex
+
+
+def _recv_exact(sock, num_bytes):
+    buf = bytearray(num_bytes)
+    view = memoryview(buf)
+    received = 0
+    while received < num_bytes:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Connection closed unexpectedly")
+        received += count
+    return buf
+
+
+def send_message(sock, command, arg=0, arrays=()):
+    """
+    Send a command and a sequence of numpy arrays over a socket. Arrays are
+    sent as raw bytes with their dtype and shape, so that no pickling is
+    required
+
+    :param sock:    connected socket
+    :param command: integer command code
+    :param arg:     integer argument for the command
+    :param arrays:  sequence of numpy arrays
+    """
+    parts = [_HEADER.pack(command, arg, len(arrays))]
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        parts.append(_ARRAY_HEADER.pack(
+            arr.dtype.str.encode(), arr.ndim, arr.nbytes
+        ))
+        parts.append(struct.pack("!{}Q".format(arr.ndim), *arr.shape))
+        parts.append(arr.tobytes())
+    sock.sendall(b"".join(parts))
+
+
+def recv_message(sock, max_bytes=MAX_MESSAGE_BYTES):
+    """
+    Receive a message sent with :func:`send_message`. Array headers are
+    checked before any space is allocated for the arrays, so a peer cannot
+    cause arbitrarily large allocations
+
+    :param sock:      connected socket
+    :param max_bytes: limit on the total size of the arrays in the message
+    :return:          a tuple ``(command, arg, arrays)``
+    :raises ValueError: if the message exceeds the size limits or describes
+                        an invalid array
+    """
+    command, arg, num_arrays = _HEADER.unpack(
+        _recv_exact(sock, _HEADER.size)
+    )
+    if num_arrays > MAX_ARRAYS:
+        raise ValueError("Too many arrays in message: {}".format(num_arrays))
+    arrays = []
+    remaining = max_bytes
+    for _ in range(num_arrays):
+        dtype, ndim, nbytes = _ARRAY_HEADER.unpack(
+            _recv_exact(sock, _ARRAY_HEADER.size)
+        )
+        if ndim > MAX_NDIM:
+            raise ValueError("Too many array dimensions: {}".format(ndim))
+        shape = struct.unpack(
+            "!{}Q".format(ndim), _recv_exact(sock, 8 * ndim)
+        )
+        try:
+            dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise ValueError("Invalid array dtype")
+        if dtype.kind not in _ARRAY_KINDS:
+            raise ValueError("Unsupported array dtype '{}'".format(dtype))
+        if nbytes > remaining:
+            raise ValueError(
+                "Message exceeds size limit of {} bytes".format(max_bytes)
+            )
+        if nbytes != dtype.itemsize * int(np.prod(shape, dtype=object)):
+            raise ValueError("Array size does not match its shape")
+        remaining -= nbytes
+        data = _recv_exact(sock, nbytes)
+        arrays.append(np.frombuffer(data, dtype=dtype).reshape(shape))
+    return command, arg, arrays
+
+
+def _serve_session(conn, max_bytes):
+    """
+    Handle requests from one coordinator until it ends the session
+
+    :return: False if the worker should shut down, and True otherwise
+    """
+    blocks = []
+    while True:
+        command, arg, arrays = recv_message(conn, max_bytes)
+        if command == SHUTDOWN:
+            return False
+        if command == END_SESSION:
+            return True
+        try:
+            if command == SETUP:
+                blocks = []
+                for i in range(arg):
+                    data, indices, indptr, shape = arrays[4 * i:4 * i + 4]
+                    blocks.append(scipy.sparse.csr_matrix(
+                        (data, indices, indptr), shape=tuple(shape)
+                    ))
+                send_message(conn, RESULT)
+            elif command == MULTIPLY:
+                send_message(conn, RESULT, arg, [blocks[arg] @ arrays[0]])
+            else:
+                raise ValueError("Unknown command {}".format(command))
+        except Exception as ex:
+            msg = np.frombuffer(repr(ex).encode(), dtype=np.uint8)
+            send_message(conn, ERROR, 0, [msg])
+
+
+def run_worker(host, port, ready=None, secret=None,
+               max_bytes=MAX_MESSAGE_BYTES):
+    """
+    Run a worker that listens for coordinators on the given address. The
+    worker serves one coordinator at a time, and runs until it receives a
+    shutdown command. Coordinators must authenticate with the shared secret
+    (see :func:`authenticate`) before sending any commands; connections that
+    fail to authenticate or send malformed or oversized messages are closed.
+
+    :param host:      host name or IP address to listen on
+    :param port:      port to listen on (0 to choose a free port)
+    :param ready:     connection object (optional). If given, the port the
+                      worker is listening on is sent to it once the worker is
+                      ready
+    :param secret:    secret shared with coordinators (see
+                      :func:`get_secret`)
+    :param max_bytes: limit on the total size of the arrays in a message
+                      (optional)
+    :raises ValueError: if no secret is given or set in the environment
+    """
+    secret = get_secret(secret)
+    with socket.create_server((host, port)) as server:
+        if ready is not None:
+            ready.send(server.getsockname()[1])
+            ready.close()
+        running = True
+        while running:
+            conn, _ = server.accept()
+            with conn:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                try:
+                    authenticate(conn, secret, server=True)
+                    running = _serve_session(conn, max_bytes)
+                except (ConnectionError, ValueError):
+                    # Coordinator went away, failed to authenticate or sent
+                    # an invalid message: wait for the next one
+                    pass
+
+
+class DistributedOperator:
+    """
+    Stand-in for a sparse matrix whose products are evaluated by the workers
+    of a :any:`DistributedEngine`
+    """
+    def __init__(self, engine, index, shape):
+        self.engine = engine
+        self.index = index
+        self.shape = shape
+
+    def __matmul__(self, vec):
+        return self.engine.multiply(self.index, vec)
+
+
+class DistributedEngine:
+    """
+    Evaluate products with a fixed set of sparse matrices using worker
+    processes reached over TCP (see :func:`run_worker`).
+
+    The rows of each matrix are partitioned into contiguous blocks, one per
+    worker, and each block is sent to its worker once when the engine is
+    created. Since a block generally refers to only some of the columns of the
+    matrix, its column indices are renumbered, and for each product the
+    coordinator sends a worker only the entries of the vector in the columns
+    its block uses. The worker replies with its rows of the result.
+
+    The coordinator (the process using the engine) runs the algorithm itself,
+    including normalisation and convergence checks. Each entry of a product is
+    computed by one worker in the same order as a serial product, so results
+    are identical to those from scipy.
+
+    Blocks are created and sent one worker at a time, so the coordinator only
+    holds one worker's blocks at once in addition to the matrices it was
+    given; with :meth:`RowBlocks.from_dataset`, the transpose of the
+    source-claim matrix is never built in full.
+    """
+    def __init__(self, matrices, addresses, secret=None,
+                 max_bytes=MAX_MESSAGE_BYTES):
+        """
+        :param matrices:  list of scipy sparse matrices or :any:`RowBlocks`
+                          objects
+        :param addresses: list of ``(host, port)`` tuples for workers
+        :param secret:    secret shared with the workers (see
+                          :func:`get_secret`)
+        :param max_bytes: limit on the total size of the arrays in a reply
+                          from a worker (optional)
+        :raises ValueError: if no addresses are given, or no secret is given
+                            or set in the environment
+        :raises AuthenticationError: if a worker does not know the secret
+        """
+        if not addresses:
+            raise ValueError("At least one worker address is required")
+        secret = get_secret(secret)
+        self.max_bytes = max_bytes
+        self.sockets = []
+        self.operators = []
+        # For each matrix, a list of (start_row, end_row, columns) tuples for
+        # each worker
+        self.partitions = []
+        try:
+            for address in addresses:
+                sock = socket.create_connection(address)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.sockets.append(sock)
+                authenticate(sock, secret, server=False)
+
+            sources = [mat if isinstance(mat, RowBlocks)
+                       else RowBlocks.from_matrix(mat) for mat in matrices]
+            all_bounds = []
+            for index, source in enumerate(sources):
+                indptr = np.concatenate(([0], np.cumsum(source.row_nnz)))
+                all_bounds.append(get_row_bounds(indptr, len(addresses)))
+                self.partitions.append([])
+                self.operators.append(
+                    DistributedOperator(self, index, source.shape)
+                )
+
+            for worker, sock in enumerate(self.sockets):
+                arrays = []
+                for source, bounds, partition in zip(sources, all_bounds,
+                                                     self.partitions):
+                    num_rows = source.shape[0]
+                    if worker + 1 < len(bounds):
+                        start, end = bounds[worker], bounds[worker + 1]
+                    else:
+                        start, end = num_rows, num_rows
+                    block = source.get_rows(start, end)
+                    # Renumbering columns with a sorted array of the columns
+                    # used preserves the order of entries in each row
+                    columns = np.unique(block.indices)
+                    local_indices = np.searchsorted(columns, block.indices)
+                    arrays.extend([
+                        block.data, local_indices, block.indptr,
+                        np.array([end - start, len(columns)], dtype=np.int64)
+                    ])
+                    partition.append((start, end, columns))
+                send_message(sock, SETUP, len(sources), arrays)
+                del arrays
+            for sock in self.sockets:
+                self._receive(sock)
+        except BaseException:
+            self.close()
+            raise
+
+    def _receive(self, sock):
+        """
+        Receive a reply from a worker
+
+        :return: the list of arrays in the reply
+        :raises RuntimeError: if the worker reports an error
+        """
+        command, _, arrays = recv_message(sock, self.max_bytes)
+        if command == ERROR:
+            raise RuntimeError(
+                "Worker error: {}".format(arrays[0].tobytes().decode())
+            )
+        return arrays
+
+    def multiply(self, index, vec):
+        """
+        Compute the product of a matrix with a vector
+
+        :param index: the index of the matrix in the list given to the
+                      constructor
+        :param vec:   numpy array
+        :return:      the product as a new numpy array
+        :raises RuntimeError: if a worker reports an error
+        """
+        vec = np.asarray(vec, dtype=np.float64)
+        partition = self.partitions[index]
+        # Send all requests before waiting for any replies, so that workers
+        # compute concurrently
+        for sock, (_, _, columns) in zip(self.sockets, partition):
+            send_message(sock, MULTIPLY, index, [vec[columns]])
+        out = np.empty((self.operators[index].shape[0],))
+        for sock, (start, end, _) in zip(self.sockets, partition):
+            out[start:end] = self._receive(sock)[0]
+        return out
+
+    def close(self):
+        """
+        End the session with each worker. The workers keep running, and may
+        be used by another engine
+        """
+        for sock in self.sockets:
+            try:
+                send_message(sock, END_SESSION)
+            except OSError:  # pragma: no cover
+                pass
+            sock.close()
+        self.sockets = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class LocalCluster:
+    """
+    Start workers for a :any:`DistributedEngine` as processes on this machine,
+    listening on free localhost ports. This stands in for a multi-node
+    deployment, e.g. for testing.
+
+    If no secret is given and none is set in the environment, a random secret
+    is generated and stored in the environment variable :data:`SECRET_ENV` of
+    the current process, so that algorithms run in this process can connect
+    to the workers.
+    """
+    def __init__(self, num_workers, host="127.0.0.1", secret=None):
+        """
+        :param num_workers: the number of worker processes to start
+        :param host:        the address for workers to listen on
+        :param secret:      secret shared with coordinators (optional)
+        """
+        if secret is None and not os.environ.get(SECRET_ENV):
+            os.environ[SECRET_ENV] = secrets.token_hex(32)
+        self.secret = get_secret(secret)
+        ctx = multiprocessing.get_context()
+        self.addresses = []
+        self.processes = []
+        try:
+            for _ in range(num_workers):
+                receiver, sender = ctx.Pipe(duplex=False)
+                proc = ctx.Process(
+                    target=run_worker, args=(host, 0, sender, self.secret),
+                    daemon=True
+                )
+                proc.start()
+                self.processes.append(proc)
+                self.addresses.append((host, receiver.recv()))
+                receiver.close()
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        """
+        Shut down all workers
+        """
+        for address in self.addresses:
+            try:
+                with socket.create_connection(address) as sock:
+                    authenticate(sock, self.secret, server=False)
+                    send_message(sock, SHUTDOWN)
+            except OSError:  # pragma: no cover
+                pass
+        for proc in self.processes:
+            proc.join()
+        self.addresses = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,4 +1,6 @@
+import copy
 from enum import Enum
+import time
 
 import numpy as np
 
@@ -21,11 +23,28 @@ class DistanceMeasures(Enum):
     COSINE = "cosine"
 
 
+class StopReason(Enum):
+    """
+    Enumeration of the reasons an iterative algorithm stopped iterating
+    """
+    #: The convergence criterion of the iterator was met
+    CONVERGED = "converged"
+    #: The number of iterations reached the iterator's limit
+    LIMIT = "limit"
+    #: The time budget of a :any:`DeadlineIterator` was used up
+    DEADLINE = "deadline"
+    #: Iteration was stopped before the iterator finished, e.g. by a hook
+    STOPPED = "stopped"
+
+
 class Iterator:
     """
     Base class for iterators
     """
     it_count = 0
+    #: True if the iterator compares the rankings of scores, so that scores
+    #: which should be equal must be computed exactly the same
+    uses_ranking = False
 
     def compare(self, _obj1, _obj2):
         """
@@ -47,6 +66,45 @@ class Iterator:
         """
         self.it_count = 0
 
+    def clone(self):
+        """
+        :return: a copy of this iterator in its initial state, so that the
+                 iterator given to an algorithm can be used for several runs
+                 at once
+        """
+        new = copy.copy(self)
+        new.reset()
+        return new
+
+    def get_state(self):
+        """
+        :return: a JSON-serialisable dict describing the progress of
+                 iteration, for use in checkpoints
+        """
+        return {"type": type(self).__name__, "it_count": self.it_count}
+
+    def set_state(self, state):
+        """
+        Restore the progress of iteration from a dict returned by
+        :meth:`get_state`
+
+        :raises ValueError: if the state is for a different type of iterator
+        """
+        if state["type"] != type(self).__name__:
+            raise ValueError(
+                "Cannot restore state of {} to {}".format(
+                    state["type"], type(self).__name__
+                )
+            )
+        self.it_count = state["it_count"]
+
+    def get_stop_reason(self):
+        """
+        :return: the :any:`StopReason` for which iteration finished, or None
+                 if it has not finished (or the reason is not known)
+        """
+        return None
+
 
 class FixedIterator(Iterator):
     """
@@ -67,6 +125,11 @@ class FixedIterator(Iterator):
     def finished(self):
         return self.it_count >= self.limit
 
+    def get_stop_reason(self):
+        if self.finished():
+            return StopReason.LIMIT
+        return None
+
 
 class ConvergenceIterator(Iterator):
     """
@@ -78,6 +141,7 @@ class ConvergenceIterator(Iterator):
     current_distance = None
     limit = 1000000
     debug = False
+    _buffer = None
 
     def __init__(self, distance_measure, threshold, limit=None, debug=False):
         """
@@ -99,14 +163,28 @@ class ConvergenceIterator(Iterator):
     def reset(self):
         super().reset()
         self.current_distance = None
+        self._buffer = None
+
+    def get_state(self):
+        state = super().get_state()
+        state["current_distance"] = self.current_distance
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.current_distance = state["current_distance"]
 
     def compare(self, obj1, obj2):
         """
         Update the most recent distance between objects
         """
         super().compare(obj1, obj2)
+        # Re-use a buffer for the difference between vectors, so that no
+        # arrays are allocated at each iteration
+        if self._buffer is None or self._buffer.shape != np.shape(obj1):
+            self._buffer = np.empty(np.shape(obj1))
         self.current_distance = self.get_distance(
-            self.distance_measure, obj1, obj2
+            self.distance_measure, obj1, obj2, out=self._buffer
         )
         if self.debug:  # pragma: no cover
             print("{},{}".format(self.it_count, self.current_distance))
@@ -125,23 +203,35 @@ class ConvergenceIterator(Iterator):
             )
         return False
 
+    def get_stop_reason(self):
+        if (self.current_distance is not None
+                and self.current_distance < self.threshold):
+            return StopReason.CONVERGED
+        return None
+
     @classmethod
-    def get_distance(cls, distance_measure, obj1, obj2):
+    def get_distance(cls, distance_measure, obj1, obj2, out=None):
         """
         Calculate distance between vectors using the given measure
 
         :param distance_measure: value from :any:`DistanceMeasures` enumeration
         :param obj1:             first object to be compared
         :param obj2:             second object to be compared
+        :param out:              numpy array of floats of the same shape as
+                                 the vectors, to use as a buffer for the
+                                 difference between them (optional)
         :raises ValueError: if ``distance_measure`` is not an item from the
                             :any:`DistanceMeasures` enumeration
         """
-        if distance_measure == DistanceMeasures.L1:
-            return np.linalg.norm(obj1 - obj2, ord=1)
-        if distance_measure == DistanceMeasures.L2:
-            return np.linalg.norm(obj1 - obj2)
-        if distance_measure == DistanceMeasures.L_INF:
-            return np.linalg.norm(obj1 - obj2, ord=np.inf)
+        if distance_measure in (DistanceMeasures.L1, DistanceMeasures.L2,
+                                DistanceMeasures.L_INF):
+            diff = np.subtract(obj1, obj2, out=out)
+            if distance_measure == DistanceMeasures.L2:
+                return np.sqrt(np.dot(diff, diff))
+            diff = np.abs(diff, out=diff)
+            if distance_measure == DistanceMeasures.L1:
+                return np.sum(diff)
+            return np.max(diff, initial=0)
         if distance_measure == DistanceMeasures.COSINE:
             norm1 = np.linalg.norm(obj1)
             norm2 = np.linalg.norm(obj2)
@@ -156,47 +246,221 @@ class ConvergenceIterator(Iterator):
 class OrdinalConvergenceIterator(Iterator):
     """
     Iterator that runs until the ranking associated with a vector remains
-    unchanged for a specified number of iterations
+    unchanged for a specified number of iterations. If ``top_k`` is set, only
+    the ranking of the ``k`` largest entries is considered
     """
     threshold = 20
     current_count = 0
+    top_k = None
+    uses_ranking = True
 
-    def __init__(self, threshold=None):
+    def __init__(self, threshold=None, top_k=None):
+        """
+        :param threshold: number of consecutive iterations for which the
+                          ranking must be unchanged (optional)
+        :param top_k:     if not None, only compare the identities and order
+                          of the ``top_k`` largest entries (optional)
+        :raises ValueError: if ``top_k`` is not positive
+        """
         super().__init__()
         if threshold is not None:
             self.threshold = threshold
+        if top_k is not None:
+            if top_k < 1:
+                raise ValueError("top_k must be positive")
+            self.top_k = top_k
 
     def compare(self, obj1, obj2):
         super().compare(obj1, obj2)
-        r1 = self.get_ranking_vector(obj1)
-        r2 = self.get_ranking_vector(obj2)
-        if np.all(r1 == r2):
+        if self.top_k is None:
+            same = np.array_equal(self.get_ranking_vector(obj1),
+                                  self.get_ranking_vector(obj2))
+        else:
+            same = np.array_equal(self.get_top_k(obj1, self.top_k),
+                                  self.get_top_k(obj2, self.top_k))
+        if same:
             self.current_count += 1
-            # print(f"ranking is the same; count is now {self.current_count}")
         else:
             self.current_count = 0
-            # print("ranking changed")
 
     def finished(self):
         return self.current_count >= self.threshold
 
+    def get_stop_reason(self):
+        if self.finished():
+            return StopReason.CONVERGED
+        return None
+
     @classmethod
     def get_ranking_vector(cls, v):
         """
-        Return the ranking associated with a vector
-        """
-        sorted_scores = v[np.argsort(v)]
-        rank = 0
-        rank_mapping = {}
-        for i, sc in enumerate(sorted_scores):
-            if i > 0 and sc > sorted_scores[i - 1]:
-                rank += 1
-            rank_mapping[sc] = rank
-        rv = np.zeros(v.shape)
-        for i, sc in enumerate(v):
-            rv[i] = rank_mapping[sc]
+        Return the ranking associated with a vector: the entry for each index
+        is the number of distinct values in ``v`` smaller than ``v[i]``, so
+        equal entries have equal rank
+        """
+        order = np.argsort(v, kind="stable")
+        sorted_scores = v[order]
+        ranks = np.zeros(v.shape)
+        if len(v) > 1:
+            # Rank increases by one each time the sorted scores increase
+            np.cumsum(sorted_scores[1:] > sorted_scores[:-1], out=ranks[1:])
+        rv = np.empty(v.shape)
+        rv[order] = ranks
         return rv
 
+    @classmethod
+    def get_top_k(cls, v, k):
+        """
+        Return the indices of the ``k`` largest entries of a vector, from
+        largest to smallest. Ties are broken by index. This takes time linear
+        in the length of ``v`` (plus ``k log k``), so is cheaper than computing
+        a full ranking when ``k`` is small
+        """
+        n = len(v)
+        if k >= n:
+            return np.lexsort((np.arange(n), -v))
+        kth = np.partition(v, n - k)[n - k]
+        above = np.flatnonzero(v > kth)
+        equal = np.flatnonzero(v == kth)[:k - len(above)]
+        top = np.concatenate((above, equal))
+        return top[np.lexsort((top, -v[top]))]
+
     def reset(self):
         super().reset()
         self.current_count = 0
+
+    def get_state(self):
+        state = super().get_state()
+        state["current_count"] = self.current_count
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.current_count = state["current_count"]
+
+
+class DeadlineIterator(Iterator):
+    """
+    Iterator that runs until a time budget, measured from when the iterator is
+    reset at the start of a run, is used up. The algorithm then returns the
+    latest trust and belief scores instead of raising an error. Use
+    :any:`CombinedIterator` to also stop when another iterator finishes
+    """
+    def __init__(self, budget):
+        """
+        :param budget: the time budget in seconds
+        :raises ValueError: if ``budget`` is negative
+        """
+        if budget < 0:
+            raise ValueError("Time budget cannot be negative")
+        self.budget = budget
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.start_time = time.perf_counter()
+        self.expired = False
+
+    def time_remaining(self):
+        """
+        :return: the number of seconds of the budget remaining (negative if
+                 the deadline has passed)
+        """
+        return self.budget - (time.perf_counter() - self.start_time)
+
+    def finished(self):
+        # Remember that the deadline has passed, so that the stop reason is
+        # only reported as the deadline if this caused iteration to finish
+        self.expired = self.expired or self.time_remaining() <= 0
+        return self.expired
+
+    def get_stop_reason(self):
+        if self.expired:
+            return StopReason.DEADLINE
+        return None
+
+    def get_state(self):
+        state = super().get_state()
+        state["elapsed"] = time.perf_counter() - self.start_time
+        return state
+
+    def set_state(self, state):
+        """
+        Restore progress, so that only the remainder of the budget is
+        available
+        """
+        super().set_state(state)
+        self.start_time = time.perf_counter() - state["elapsed"]
+
+
+class CombinedIterator(Iterator):
+    """
+    Iterator which combines other iterators, and finishes as soon as any of
+    them finishes. For example, to iterate until convergence but for at most
+    50 milliseconds: ::
+
+        CombinedIterator(
+            ConvergenceIterator(DistanceMeasures.L2, 0.001),
+            DeadlineIterator(0.05)
+        )
+    """
+    def __init__(self, *iterators):
+        """
+        :param iterators: :any:`Iterator` objects to combine
+        :raises ValueError: if no iterators are given
+        """
+        if not iterators:
+            raise ValueError("At least one iterator must be given")
+        self.iterators = iterators
+        self.reset()
+
+    @property
+    def uses_ranking(self):
+        return any(it.uses_ranking for it in self.iterators)
+
+    def compare(self, obj1, obj2):
+        super().compare(obj1, obj2)
+        for it in self.iterators:
+            it.compare(obj1, obj2)
+
+    def finished(self):
+        return any(it.finished() for it in self.iterators)
+
+    def reset(self):
+        super().reset()
+        for it in self.iterators:
+            it.reset()
+
+    def clone(self):
+        return CombinedIterator(*(it.clone() for it in self.iterators))
+
+    def get_state(self):
+        state = super().get_state()
+        state["iterators"] = [it.get_state() for it in self.iterators]
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        if len(state["iterators"]) != len(self.iterators):
+            raise ValueError("Number of combined iterators does not match")
+        for it, it_state in zip(self.iterators, state["iterators"]):
+            it.set_state(it_state)
+
+    def get_stop_reason(self):
+        for it in self.iterators:
+            reason = it.get_stop_reason()
+            if reason is not None:
+                return reason
+        return None
+
+    @property
+    def current_distance(self):
+        """
+        The most recent distance measured by a combined
+        :any:`ConvergenceIterator`, or None if there is no such iterator
+        """
+        for it in self.iterators:
+            distance = getattr(it, "current_distance", None)
+            if distance is not None:
+                return distance
+        return None
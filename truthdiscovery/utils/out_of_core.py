@@ -0,0 +1,414 @@
+from collections import namedtuple
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import scipy.sparse
+
+from truthdiscovery.utils.spmv import get_row_bounds, RowBlocks
+
+#: The default number of stored entries in each chunk read from disk
+DEFAULT_CHUNK_NNZ = 1 << 22
+
+#: Input/output statistics for one iteration of an algorithm, as recorded by
+#: :any:`OutOfCoreEngine`. ``bytes_read`` is the number of bytes read from
+#: disk, ``read_time`` the time in seconds spent reading, and ``bandwidth``
+#: the achieved read bandwidth in bytes per second
+IOStats = namedtuple("IOStats", ["iteration", "bytes_read", "read_time",
+                                 "bandwidth"])
+
+
+class DiskCSRMatrix:
+    """
+    A CSR matrix stored on disk, whose products with vectors are computed by
+    streaming blocks of rows ('chunks') from disk in order. Only the row
+    pointer array and the chunks currently being read and multiplied are held
+    in memory.
+
+    Chunks are read by a background thread while earlier chunks are being
+    multiplied, so that reading overlaps with computation.
+    """
+    META_FILENAME = "meta.json"
+    DATA_FILENAME = "data.bin"
+    INDICES_FILENAME = "indices.bin"
+    INDPTR_FILENAME = "indptr.npy"
+
+    #: The maximum number of chunks read ahead of the one being multiplied
+    prefetch = 2
+
+    def __init__(self, directory):
+        """
+        :param directory: directory containing a matrix saved with
+                          :meth:`write`
+        """
+        self.directory = directory
+        with open(self._path(self.META_FILENAME)) as meta_file:
+            meta = json.load(meta_file)
+        self.shape = tuple(meta["shape"])
+        self.data_dtype = np.dtype(meta["data_dtype"])
+        self.indices_dtype = np.dtype(meta["indices_dtype"])
+        self.chunk_bounds = meta["chunk_bounds"]
+        self.indptr = np.load(self._path(self.INDPTR_FILENAME))
+        #: Total bytes read and seconds spent reading over all products
+        self.bytes_read = 0
+        self.read_time = 0
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def write(cls, mat, directory, chunk_nnz=None, key=None):
+        """
+        Save a sparse matrix to disk. The matrix is written one chunk at a
+        time, so only one chunk is held in memory in addition to ``mat``.
+
+        If ``mat`` is a :any:`RowBlocks` object for the transpose of another
+        matrix (see ``transpose_of``), the transpose is written with a single
+        pass over blocks of rows of the original: entries are appended to a
+        temporary file for the chunk of the transpose they belong to, and each
+        chunk is then sorted into CSR order. The transpose is therefore never
+        held in memory in full.
+
+        :param mat:       scipy sparse matrix or :any:`RowBlocks` object
+        :param directory: directory to write files to (created if it does not
+                          exist)
+        :param chunk_nnz: the approximate number of stored entries per chunk
+                          (optional)
+        :param key:       string identifying the contents of the matrix, which
+                          is stored with it (optional). See :meth:`open`
+        :return:          a :any:`DiskCSRMatrix` for the saved matrix
+        """
+        if not isinstance(mat, RowBlocks):
+            mat = RowBlocks.from_matrix(mat)
+        chunk_nnz = chunk_nnz or DEFAULT_CHUNK_NNZ
+        nnz = int(np.sum(mat.row_nnz))
+        # Use 32-bit indices where possible, as scipy does
+        index_dtype = np.dtype(
+            np.int32 if max(nnz, *mat.shape) < 2 ** 31 else np.int64
+        )
+        indptr = np.zeros((mat.shape[0] + 1,), dtype=index_dtype)
+        np.cumsum(mat.row_nnz, out=indptr[1:])
+        num_chunks = max(1, -(-nnz // chunk_nnz))
+        chunk_bounds = get_row_bounds(indptr, num_chunks)
+        os.makedirs(directory, exist_ok=True)
+
+        data_path = os.path.join(directory, cls.DATA_FILENAME)
+        indices_path = os.path.join(directory, cls.INDICES_FILENAME)
+        with open(data_path, "wb") as data_file:
+            with open(indices_path, "wb") as indices_file:
+                if mat.transpose_of is not None:
+                    chunks = cls._transposed_chunks(
+                        mat.transpose_of, chunk_bounds, chunk_nnz, directory
+                    )
+                else:
+                    chunks = (
+                        mat.get_rows(start, end) for start, end
+                        in zip(chunk_bounds[:-1], chunk_bounds[1:])
+                    )
+                for start, block in zip(chunk_bounds[:-1], chunks):
+                    expected = indptr[start + block.shape[0]] - indptr[start]
+                    if block.nnz != expected:
+                        raise ValueError(
+                            "Block does not match the number of entries "
+                            "per row"
+                        )
+                    np.asarray(block.data, dtype=np.float64).tofile(
+                        data_file
+                    )
+                    np.asarray(block.indices, dtype=index_dtype).tofile(
+                        indices_file
+                    )
+
+        np.save(os.path.join(directory, cls.INDPTR_FILENAME), indptr)
+        meta = {
+            "shape": list(mat.shape),
+            "data_dtype": np.dtype(np.float64).str,
+            "indices_dtype": index_dtype.str,
+            "chunk_bounds": chunk_bounds.tolist(),
+            "key": key
+        }
+        with open(os.path.join(directory, cls.META_FILENAME), "w") as f:
+            json.dump(meta, f)
+        return cls(directory)
+
+    @staticmethod
+    def _transposed_chunks(original, chunk_bounds, chunk_nnz, directory):
+        """
+        Generator of chunks of the transpose of a matrix, as CSR matrices
+
+        :param original:     :any:`RowBlocks` object for the matrix to
+                             transpose
+        :param chunk_bounds: numpy array of the bounds of the chunks of rows
+                             of the transpose
+        :param chunk_nnz:    the approximate number of stored entries to read
+                             from ``original`` at a time
+        :param directory:    directory in which to create temporary files
+        """
+        num_chunks = len(chunk_bounds) - 1
+        num_cols = original.shape[0]
+        entry = np.dtype([("row", np.int64), ("col", np.int64),
+                          ("val", np.float64)])
+        temp_dir = tempfile.mkdtemp(prefix="transpose-", dir=directory)
+        paths = [os.path.join(temp_dir, "chunk{}".format(i))
+                 for i in range(num_chunks)]
+        try:
+            orig_indptr = np.zeros((original.shape[0] + 1,), dtype=np.int64)
+            np.cumsum(original.row_nnz, out=orig_indptr[1:])
+            num_blocks = max(1, -(-int(orig_indptr[-1]) // chunk_nnz))
+            block_bounds = get_row_bounds(orig_indptr, num_blocks)
+            for start, end in zip(block_bounds[:-1], block_bounds[1:]):
+                block = original.get_rows(start, end)
+                entries = np.empty((block.nnz,), dtype=entry)
+                entries["row"] = block.indices
+                entries["col"] = np.repeat(np.arange(start, end),
+                                           np.diff(block.indptr))
+                entries["val"] = block.data
+                chunk_ids = np.searchsorted(chunk_bounds, entries["row"],
+                                            side="right") - 1
+                order = np.argsort(chunk_ids, kind="stable")
+                entries, chunk_ids = entries[order], chunk_ids[order]
+                splits = np.searchsorted(chunk_ids, np.arange(num_chunks + 1))
+                for chunk, (first, last) in enumerate(zip(splits[:-1],
+                                                          splits[1:])):
+                    if last > first:
+                        with open(paths[chunk], "ab") as chunk_file:
+                            entries[first:last].tofile(chunk_file)
+                del block, entries
+
+            for chunk, (start, end) in enumerate(zip(chunk_bounds[:-1],
+                                                     chunk_bounds[1:])):
+                entries = np.empty((0,), dtype=entry)
+                if os.path.exists(paths[chunk]):
+                    entries = np.fromfile(paths[chunk], dtype=entry)
+                    os.remove(paths[chunk])
+                # Sort by row and then by column, as in a canonical CSR
+                # matrix
+                order = np.lexsort((entries["col"], entries["row"]))
+                entries = entries[order]
+                counts = np.bincount(entries["row"] - start,
+                                     minlength=end - start)
+                indptr = np.zeros((end - start + 1,), dtype=np.int64)
+                np.cumsum(counts, out=indptr[1:])
+                yield scipy.sparse.csr_matrix(
+                    (entries["val"], entries["col"], indptr),
+                    shape=(end - start, num_cols)
+                )
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    @classmethod
+    def open(cls, directory, key):
+        """
+        Open a matrix previously saved with :meth:`write`, if it was saved
+        with the given key
+
+        :param directory: directory the matrix was written to
+        :param key:       the ``key`` the matrix must have been written with
+        :return:          a :any:`DiskCSRMatrix`, or None if there is no
+                          matrix in ``directory`` or it has a different key
+        """
+        try:
+            with open(os.path.join(directory, cls.META_FILENAME)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("key") != key:
+            return None
+        return cls(directory)
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def memory_map(self):
+        """
+        :return: a scipy CSR matrix whose data and indices arrays are
+                 memory-mapped from the files of this matrix, so that the
+                 operating system pages entries into memory as products need
+                 them
+        """
+        nnz = int(self.indptr[-1])
+        arrays = []
+        for filename, dtype in ((self.DATA_FILENAME, self.data_dtype),
+                                (self.INDICES_FILENAME, self.indices_dtype)):
+            if nnz == 0:
+                # Empty files cannot be memory-mapped
+                arrays.append(np.empty((0,), dtype=dtype))
+            else:
+                arrays.append(np.memmap(self._path(filename), dtype=dtype,
+                                        mode="r", shape=(nnz,)))
+        return scipy.sparse.csr_matrix(
+            (arrays[0], arrays[1], self.indptr), shape=self.shape, copy=False
+        )
+
+    @property
+    def num_chunks(self):
+        return len(self.chunk_bounds) - 1
+
+    def read_chunk(self, index, data_file, indices_file):
+        """
+        Read a chunk from disk
+
+        :param index:        the index of the chunk
+        :param data_file:    binary file object for the data array
+        :param indices_file: binary file object for the indices array
+        :return: a tuple ``(start_row, end_row, block)`` where ``block`` is a
+                 CSR matrix of the rows in the chunk
+        """
+        start, end = self.chunk_bounds[index], self.chunk_bounds[index + 1]
+        first, last = int(self.indptr[start]), int(self.indptr[end])
+        count = last - first
+
+        begin = time.perf_counter()
+        data_file.seek(first * self.data_dtype.itemsize)
+        data = np.fromfile(data_file, dtype=self.data_dtype, count=count)
+        indices_file.seek(first * self.indices_dtype.itemsize)
+        indices = np.fromfile(indices_file, dtype=self.indices_dtype,
+                              count=count)
+        elapsed = time.perf_counter() - begin
+
+        with self._stats_lock:
+            self.bytes_read += data.nbytes + indices.nbytes
+            self.read_time += elapsed
+        block = scipy.sparse.csr_matrix(
+            (data, indices, self.indptr[start:end + 1] - first),
+            shape=(end - start, self.shape[1]),
+            copy=False
+        )
+        return start, end, block
+
+    def iter_chunks(self):
+        """
+        Generator of chunks as returned by :meth:`read_chunk`, in order. Chunks
+        are read by a background thread up to ``self.prefetch`` chunks ahead
+        """
+        chunks = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def reader():
+            data_path = self._path(self.DATA_FILENAME)
+            indices_path = self._path(self.INDICES_FILENAME)
+            try:
+                with open(data_path, "rb") as data_file:
+                    with open(indices_path, "rb") as indices_file:
+                        for index in range(self.num_chunks):
+                            chunk = self.read_chunk(index, data_file,
+                                                    indices_file)
+                            if not put(chunk):
+                                return
+                put(None)
+            except Exception as ex:
+                put(ex)
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    def __matmul__(self, vec):
+        vec = np.asarray(vec)
+        dtype = np.result_type(self.data_dtype, vec)
+        out = np.empty((self.shape[0],), dtype=dtype)
+        for start, end, block in self.iter_chunks():
+            out[start:end] = block @ vec
+        return out
+
+
+class OutOfCoreEngine:
+    """
+    Evaluate products with a fixed set of sparse matrices by streaming them
+    from disk (see :any:`DiskCSRMatrix`). Vectors are held in memory.
+
+    The engine records the bytes read and the achieved read bandwidth for
+    each iteration of an algorithm in :attr:`io_stats`, as a list of
+    :any:`IOStats` tuples.
+    """
+    def __init__(self, matrices, directory=None, chunk_nnz=None, key=None):
+        """
+        :param matrices:  list of scipy sparse matrices, :any:`RowBlocks`
+                          objects, or :any:`DiskCSRMatrix` objects. Matrices
+                          already on disk are used in place
+        :param directory: directory to write matrices to (optional). If not
+                          given, a temporary directory is used and removed
+                          when the engine is closed
+        :param chunk_nnz: the approximate number of stored entries per chunk
+                          (optional)
+        :param key:       string identifying the contents of ``matrices``
+                          (optional). If ``directory`` already holds matrices
+                          written with the same key, e.g. by an earlier run on
+                          the same dataset, they are reused instead of being
+                          written again
+        """
+        self._temp_dir = None
+        if directory is None:
+            self._temp_dir = tempfile.mkdtemp(prefix="truthdiscovery-")
+            directory = self._temp_dir
+        self.operators = []
+        for i, mat in enumerate(matrices):
+            if not isinstance(mat, DiskCSRMatrix):
+                mat_dir = os.path.join(directory, "matrix{}".format(i))
+                existing = None
+                if key is not None:
+                    existing = DiskCSRMatrix.open(mat_dir, key)
+                mat = existing or DiskCSRMatrix.write(mat, mat_dir,
+                                                      chunk_nnz, key)
+            self.operators.append(mat)
+        self.io_stats = []
+        self._last_totals = (0, 0)
+
+    def end_iteration(self, iteration):
+        """
+        Record statistics for reads since the previous call
+
+        :param iteration: the number of the iteration that has finished. Reads
+                          before the first iteration are counted as iteration
+                          0
+        """
+        bytes_read = sum(op.bytes_read for op in self.operators)
+        read_time = sum(op.read_time for op in self.operators)
+        prev_bytes, prev_time = self._last_totals
+        self._last_totals = (bytes_read, read_time)
+
+        bytes_read -= prev_bytes
+        read_time -= prev_time
+        bandwidth = bytes_read / read_time if read_time > 0 else 0
+        self.io_stats.append(IOStats(
+            iteration=iteration,
+            bytes_read=bytes_read,
+            read_time=read_time,
+            bandwidth=bandwidth
+        ))
+
+    def close(self):
+        """
+        Remove files written by the engine, if a temporary directory was used
+        """
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,227 @@
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from threading import BrokenBarrierError
+
+import numpy as np
+import scipy.sparse
+
+from truthdiscovery.utils.spmv import get_row_bounds
+
+#: Value of the shared command that tells workers to exit
+STOP_COMMAND = -1
+
+
+def _attach(spec, handles):
+    """
+    Return a numpy array backed by an existing shared memory block
+
+    :param spec:    tuple ``(name, shape, dtype)`` describing the array
+    :param handles: list to which the ``SharedMemory`` object is appended, so
+                    that the mapping is kept alive as long as the array is
+    """
+    name, shape, dtype = spec
+    shm = SharedMemory(name=name)
+    handles.append(shm)
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker_main(specs, bounds, barrier, command):
+    """
+    Entry point for worker processes. Each worker owns a block of rows of every
+    matrix, and on each command computes its rows of the product of one matrix
+    with the shared input vector
+    """
+    handles = []
+    try:
+        blocks = []
+        for mat_specs, (start, end) in zip(specs, bounds):
+            data, indices, indptr, vec_in, vec_out = (
+                _attach(spec, handles) for spec in mat_specs
+            )
+            first, last = indptr[start], indptr[end]
+            block = scipy.sparse.csr_matrix(
+                (
+                    data[first:last],
+                    indices[first:last],
+                    indptr[start:end + 1] - first
+                ),
+                shape=(end - start, len(vec_in)),
+                copy=False
+            )
+            blocks.append((block, vec_in, vec_out[start:end]))
+
+        while True:
+            barrier.wait()
+            if command.value == STOP_COMMAND:
+                break
+            block, vec_in, out = blocks[command.value]
+            out[:] = block @ vec_in
+            barrier.wait()
+    except BaseException:
+        # Wake up the coordinator and other workers instead of leaving them
+        # waiting forever
+        barrier.abort()
+        raise
+    # Note: the shared memory blocks are not closed explicitly here, since
+    # numpy arrays still refer to them; the mappings are released when the
+    # process exits
+
+
+class SharedMemoryOperator:
+    """
+    Stand-in for a sparse matrix whose products are evaluated by the worker
+    processes of a :any:`SharedMemoryEngine`
+    """
+    def __init__(self, engine, index, shape):
+        self.engine = engine
+        self.index = index
+        self.shape = shape
+
+    def __matmul__(self, vec):
+        return self.engine.multiply(self.index, vec)
+
+
+class SharedMemoryEngine:
+    """
+    Evaluate products with a fixed set of sparse matrices using a pool of
+    worker processes.
+
+    The CSR arrays of each matrix, and input and output vectors for products,
+    are placed in shared memory when the engine is created. Each worker owns a
+    block of rows of each matrix. To compute a product the coordinator (the
+    process that created the engine) writes the input vector to shared memory
+    and meets the workers at a barrier; the workers then write their rows of
+    the result and meet the coordinator at the barrier again. Only the index of
+    the matrix is communicated, so no arrays are pickled after start-up.
+
+    Since each entry of a product is computed by one worker in the same order
+    as a serial product, results are identical to those from scipy.
+
+    The engine must be closed with :meth:`close` (or used as a context manager)
+    to stop the workers and free shared memory.
+    """
+    def __init__(self, matrices, processes):
+        """
+        :param matrices:  list of scipy sparse matrices
+        :param processes: the number of worker processes
+        :raises ValueError: if ``processes`` is not positive
+        """
+        if processes < 1:
+            raise ValueError("Number of processes must be positive")
+        self.processes = processes
+        self._handles = []
+        self._inputs = []
+        self._outputs = []
+        self.workers = []
+        self.operators = []
+
+        ctx = multiprocessing.get_context()
+        self.barrier = ctx.Barrier(processes + 1)
+        self.command = ctx.RawValue("i", 0)
+
+        specs = []
+        worker_bounds = [[] for _ in range(processes)]
+        try:
+            for index, mat in enumerate(matrices):
+                mat = scipy.sparse.csr_matrix(mat, dtype=np.float64)
+                num_rows, num_cols = mat.shape
+                vec_in = np.zeros((num_cols,))
+                vec_out = np.zeros((num_rows,))
+                mat_specs = [
+                    self._share(arr)
+                    for arr in (mat.data, mat.indices, mat.indptr, vec_in,
+                                vec_out)
+                ]
+                specs.append([spec for spec, _ in mat_specs])
+                self._inputs.append(mat_specs[3][1])
+                self._outputs.append(mat_specs[4][1])
+                self.operators.append(
+                    SharedMemoryOperator(self, index, mat.shape)
+                )
+
+                # Workers left without rows (for matrices with fewer rows than
+                # there are workers) get an empty block
+                bounds = get_row_bounds(mat.indptr, processes)
+                for worker in range(processes):
+                    if worker + 1 < len(bounds):
+                        row_range = (bounds[worker], bounds[worker + 1])
+                    else:
+                        row_range = (num_rows, num_rows)
+                    worker_bounds[worker].append(row_range)
+
+            for bounds in worker_bounds:
+                proc = ctx.Process(
+                    target=_worker_main,
+                    args=(specs, bounds, self.barrier, self.command),
+                    daemon=True
+                )
+                proc.start()
+                self.workers.append(proc)
+        except BaseException:
+            self.close()
+            raise
+
+    def _share(self, arr):
+        """
+        Copy a numpy array into a new shared memory block
+
+        :return: a tuple ``(spec, shared_arr)``, where ``spec`` describes the
+                 block so that workers can attach to it, and ``shared_arr`` is
+                 a numpy array backed by the block
+        """
+        shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+        self._handles.append(shm)
+        shared_arr = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+        shared_arr[:] = arr
+        return (shm.name, arr.shape, arr.dtype.str), shared_arr
+
+    def multiply(self, index, vec):
+        """
+        Compute the product of a matrix with a vector
+
+        :param index: the index of the matrix in the list given to the
+                      constructor
+        :param vec:   numpy array
+        :return:      the product as a new numpy array
+        :raises RuntimeError: if a worker process has failed
+        """
+        self._inputs[index][:] = vec
+        self.command.value = index
+        try:
+            self.barrier.wait()
+            self.barrier.wait()
+        except BrokenBarrierError:
+            raise RuntimeError("A shared memory worker process has failed")
+        return self._outputs[index].copy()
+
+    def close(self):
+        """
+        Stop the worker processes and free shared memory
+        """
+        if self.workers and not self.barrier.broken:
+            self.command.value = STOP_COMMAND
+            try:
+                self.barrier.wait()
+            except BrokenBarrierError:  # pragma: no cover
+                pass
+        for proc in self.workers:
+            proc.join()
+        self.workers = []
+
+        # Arrays must be released before the blocks backing them are closed
+        self._inputs = []
+        self._outputs = []
+        for shm in self._handles:
+            try:
+                shm.close()
+            except BufferError:  # pragma: no cover
+                # Only possible if construction failed part way through
+                pass
+            shm.unlink()
+        self._handles = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,274 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import numpy as np
+import scipy.sparse
+
+try:
+    from scipy.sparse._sparsetools import csc_matvec, csr_matvec
+except ImportError:  # pragma: no cover
+    csc_matvec = csr_matvec = None
+
+#: Matrices with fewer stored entries than this are multiplied on the calling
+#: thread, since the overhead of dispatching to a thread pool outweighs the
+#: gain for small products
+PARALLEL_NNZ_THRESHOLD = 200000
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(threads):
+    """
+    Return a thread pool with the given number of workers. Pools are shared
+    between matrices and kept for the lifetime of the process, so that
+    repeated runs do not pay the cost of starting threads
+
+    :param threads: the number of worker threads
+    :return:        a ``ThreadPoolExecutor`` object
+    """
+    with _executors_lock:
+        if threads not in _executors:
+            _executors[threads] = ThreadPoolExecutor(
+                max_workers=threads, thread_name_prefix="spmv"
+            )
+        return _executors[threads]
+
+
+def get_row_bounds(indptr, num_blocks):
+    """
+    Partition the rows of a CSR matrix into contiguous blocks with roughly
+    equal numbers of stored entries
+
+    :param indptr:     the ``indptr`` array of the matrix
+    :param num_blocks: the maximum number of blocks
+    :return: a numpy array ``bounds`` such that the blocks are rows
+             ``bounds[i]`` up to (but not including) ``bounds[i + 1]``. Empty
+             blocks are removed, so there may be fewer than ``num_blocks``
+    """
+    num_rows = len(indptr) - 1
+    targets = np.linspace(0, indptr[-1], num_blocks + 1)
+    bounds = np.searchsorted(indptr, targets, side="left")
+    bounds[0], bounds[-1] = 0, num_rows
+    return np.unique(np.clip(bounds, 0, num_rows))
+
+
+def matvec(mat, vec, out):
+    """
+    Compute the product of a matrix and a vector into an existing array,
+    without allocating a new array for the result where possible.
+
+    Products of CSR and CSC matrices of floats use scipy's compiled kernels
+    directly, which accumulate into ``out``; the result is identical to
+    ``mat @ vec``. Other objects are multiplied with ``@`` and the result
+    copied into ``out``
+
+    :param mat: numpy array, scipy sparse matrix, :any:`ParallelSparseMatrix`,
+                or any object supporting ``@`` with numpy arrays
+    :param vec: numpy array
+    :param out: contiguous numpy array of floats to write the product to
+    :return:    ``out``
+    """
+    if isinstance(mat, ParallelSparseMatrix):
+        return mat.matvec(vec, out)
+    if isinstance(mat, np.ndarray):
+        return np.matmul(mat, vec, out=out)
+    if (csr_matvec is not None and scipy.sparse.issparse(mat)
+            and mat.format in ("csr", "csc") and mat.dtype == np.float64
+            and vec.dtype == np.float64 and out.flags.c_contiguous):
+        kernel = csr_matvec if mat.format == "csr" else csc_matvec
+        out.fill(0)
+        kernel(mat.shape[0], mat.shape[1], mat.indptr, mat.indices, mat.data,
+               vec, out)
+        return out
+    out[...] = mat @ vec
+    return out
+
+
+class ParallelSparseMatrix:
+    """
+    Wrapper around a CSR matrix that evaluates matrix-vector products on a
+    thread pool.
+
+    Rows are partitioned into contiguous blocks containing roughly equal
+    numbers of stored entries, and each block is multiplied by scipy's compiled
+    kernel, which releases the GIL. Each entry of the result is computed by
+    exactly one thread in the same order as a serial product, so results are
+    identical to ``mat @ x`` regardless of the number of threads.
+    """
+    def __init__(self, mat, threads):
+        """
+        :param mat:     scipy sparse matrix (converted to CSR if necessary)
+        :param threads: the number of threads to use for products
+        :raises ValueError: if ``threads`` is not positive
+        """
+        if threads < 1:
+            raise ValueError("Number of threads must be positive")
+        self.mat = scipy.sparse.csr_matrix(mat)
+        self.threads = threads
+        self.shape = self.mat.shape
+        self.dtype = self.mat.dtype
+        self.blocks = self.get_row_blocks(self.mat, threads)
+        self._transpose = None
+
+    @classmethod
+    def get_row_blocks(cls, mat, num_blocks):
+        """
+        Split a CSR matrix into blocks of contiguous rows with roughly equal
+        numbers of stored entries. The blocks share their data and indices
+        arrays with ``mat``, so no entries are copied
+
+        :return: a list of tuples ``(start_row, end_row, block)``
+        """
+        bounds = get_row_bounds(mat.indptr, num_blocks)
+        blocks = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            first, last = mat.indptr[start], mat.indptr[end]
+            block = scipy.sparse.csr_matrix(
+                (
+                    mat.data[first:last],
+                    mat.indices[first:last],
+                    mat.indptr[start:end + 1] - first
+                ),
+                shape=(end - start, mat.shape[1]),
+                copy=False
+            )
+            blocks.append((start, end, block))
+        return blocks
+
+    @property
+    def T(self):
+        """
+        The transpose of this matrix, stored in CSR format so that products
+        with it can also be partitioned by rows. It is computed on first use
+        and kept for subsequent products
+        """
+        if self._transpose is None:
+            self._transpose = ParallelSparseMatrix(
+                self.mat.T.tocsr(), self.threads
+            )
+            self._transpose._transpose = self
+        return self._transpose
+
+    def __matmul__(self, vec):
+        vec = np.asarray(vec)
+        if vec.ndim != 1 or len(self.blocks) <= 1:
+            return self.mat @ vec
+        out = np.empty((self.shape[0],), dtype=np.result_type(self.dtype, vec))
+        return self.matvec(vec, out)
+
+    def matvec(self, vec, out):
+        """
+        Compute the product with a vector into an existing array (see
+        :func:`matvec`)
+
+        :return: ``out``
+        """
+        if len(self.blocks) <= 1:
+            return matvec(self.mat, vec, out)
+
+        def multiply_block(block_info):
+            start, end, block = block_info
+            matvec(block, vec, out[start:end])
+
+        executor = get_executor(self.threads)
+        # Consume the iterator so that exceptions in workers are raised here
+        list(executor.map(multiply_block, self.blocks))
+        return out
+
+
+def parallel_operator(mat, threads):
+    """
+    Return an object to use in place of ``mat`` for matrix-vector products
+    with the given number of threads
+
+    :param mat:     scipy sparse matrix
+    :param threads: the number of threads to use, or None for a single thread
+    :return:        a :any:`ParallelSparseMatrix` if ``threads`` is greater
+                    than 1 and ``mat`` is large enough to benefit, or ``mat``
+                    itself otherwise
+    """
+    if threads is None or threads <= 1 or mat.nnz < PARALLEL_NNZ_THRESHOLD:
+        return mat
+    return ParallelSparseMatrix(mat, threads)
+
+
+class RowBlocks:
+    """
+    A sparse matrix from which blocks of rows are created on demand. This lets
+    execution engines distribute or write out a matrix block by block, without
+    holding the whole matrix in the required orientation (e.g. the transpose
+    of the source-claim matrix) in memory
+    """
+    def __init__(self, shape, row_nnz, get_rows, transpose_of=None):
+        """
+        :param shape:        ``(rows, columns)`` tuple
+        :param row_nnz:      numpy array of the number of stored entries in
+                             each row, used to balance blocks
+        :param get_rows:     function taking ``(start, end)`` and returning
+                             rows ``start`` up to (but not including) ``end``
+                             as a scipy CSR matrix of floats
+        :param transpose_of: :any:`RowBlocks` object for the transpose of this
+                             matrix, if this matrix is a transpose (optional).
+                             Taking many small blocks of rows of a transpose
+                             is slow, since each takes a pass over the
+                             original matrix, so consumers which need many
+                             blocks may use the original instead
+        """
+        self.shape = tuple(shape)
+        self.row_nnz = row_nnz
+        self.get_rows = get_rows
+        self.transpose_of = transpose_of
+
+    @classmethod
+    def from_matrix(cls, mat):
+        """
+        :param mat: scipy sparse matrix
+        :return:    a :any:`RowBlocks` object for ``mat``
+        """
+        mat = scipy.sparse.csr_matrix(mat, dtype=np.float64)
+        return cls(mat.shape, np.diff(mat.indptr),
+                   lambda start, end: mat[start:end])
+
+    @classmethod
+    def from_dataset(cls, data):
+        """
+        :param data: :any:`Dataset` object
+        :return:     a list of :any:`RowBlocks` objects for the source-claim
+                     matrix and its transpose. Blocks are sliced from the
+                     dataset's own matrix, so no copy of either matrix is made
+        """
+        shape = (data.num_sources, data.num_claims)
+        if data.sc_dense is not None:
+            dense = data.sc_dense
+            forward = cls(
+                shape, np.count_nonzero(dense, axis=1),
+                lambda start, end: scipy.sparse.csr_matrix(
+                    dense[start:end], dtype=np.float64
+                )
+            )
+            transpose = cls(
+                shape[::-1], np.count_nonzero(dense, axis=0),
+                lambda start, end: scipy.sparse.csr_matrix(
+                    dense[:, start:end].T, dtype=np.float64
+                ),
+                transpose_of=forward
+            )
+            return [forward, transpose]
+
+        sc = data.sc
+
+        def forward_rows(start, end):
+            return scipy.sparse.csr_matrix(sc[start:end], dtype=np.float64)
+
+        def transpose_rows(start, end):
+            # Converting the transposed column slice back to CSR sorts the
+            # indices in each row
+            block = sc[:, start:end].T.tocsr()
+            return scipy.sparse.csr_matrix(block, dtype=np.float64)
+
+        forward = cls(shape, np.diff(sc.indptr), forward_rows)
+        transpose = cls(shape[::-1],
+                        np.bincount(sc.indices, minlength=data.num_claims),
+                        transpose_rows, transpose_of=forward)
+        return [forward, transpose]